@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+
+class AlertBroker:
+    """In-process pub/sub for alert changes, delivered to clients as server-sent events.
+
+    Every event gets an id of the form ``<epoch>-<seq>``. The most recent
+    events are kept in a ring buffer so a client reconnecting with
+    ``Last-Event-ID`` only receives what it missed. When the id is from a
+    previous process or has fallen out of the buffer the client is sent a
+    ``reset`` event and should refetch the full alert list.
+    """
+
+    def __init__(self, buffer_size: int = 1000, queue_size: int = 256, heartbeat_seconds: float = 15.0):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.heartbeat_seconds = heartbeat_seconds
+        self.queue_size = queue_size
+        self._seq = 0
+        self._buffer: Deque[Tuple[int, str, str]] = deque(maxlen=buffer_size)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Dict[str, Any]) -> str:
+        """Record an event and fan it out to every connected client"""
+        self._seq += 1
+        payload = json.dumps(jsonable_encoder(data))
+        entry = (self._seq, event, payload)
+        self._buffer.append(entry)
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                # A client that cannot keep up is disconnected; its EventSource
+                # reconnects with Last-Event-ID and replays from the buffer.
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                logger.warning("Dropped slow alert stream subscriber")
+        return self._format_id(self._seq)
+
+    def _format_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _parse_id(self, event_id: Optional[str]) -> Optional[int]:
+        """Return the sequence number of an event id from this process, if any"""
+        if not event_id:
+            return None
+        epoch, _, seq = event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return -1
+        return int(seq)
+
+    def _replay(self, last_seq: Optional[int]):
+        if last_seq is None:
+            return []
+        oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+        if last_seq < 0 or last_seq > self._seq or last_seq < oldest - 1:
+            return None
+        return [entry for entry in self._buffer if entry[0] > last_seq]
+
+    def _message(self, entry: Tuple[int, str, str]) -> str:
+        seq, event, payload = entry
+        return f"id: {self._format_id(seq)}\nevent: {event}\ndata: {payload}\n\n"
+
+    async def stream(self, last_event_id: Optional[str], is_disconnected) -> AsyncIterator[str]:
+        """Yield SSE messages for one client until it disconnects"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            replay = self._replay(self._parse_id(last_event_id))
+            if replay is None:
+                yield f"id: {self._format_id(self._seq)}\nevent: reset\ndata: {{}}\n\n"
+            else:
+                for entry in replay:
+                    yield self._message(entry)
+
+            while not await is_disconnected():
+                try:
+                    entry = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if entry is None:
+                    break
+                yield self._message(entry)
+        finally:
+            self._subscribers.discard(queue)
@@ -0,0 +1,200 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+# An encoded response body and the extra headers sent with it
+CachedResponse = Tuple[bytes, Dict[str, str]]
+
+
+def cache_key(route: str, **params: Any) -> str:
+    """Build a cache key from a route name and its query parameters"""
+    present = sorted((name, str(value)) for name, value in params.items() if value is not None)
+    return f"{route}?{urlencode(present)}" if present else route
+
+
+class CacheBackend:
+    """Interface for the read-through cache used by the API routes.
+
+    Entries are tagged (e.g. ``villages`` or ``village:<id>``) so the write
+    routes can invalidate exactly the reads they affect. Values are encoded
+    responses, so a hit is sent without building or serializing anything.
+    """
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str]):
+        raise NotImplementedError
+
+    async def invalidate(self, *tags: str):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Cache that stores nothing, used when caching is turned off"""
+
+    def __init__(self):
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str]):
+        pass
+
+    async def invalidate(self, *tags: str):
+        pass
+
+    async def clear(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "none", "hits": 0, "misses": self.misses}
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU cache with a TTL and a bounded number of entries"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key: str):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str]):
+        if key in self._entries:
+            self._drop(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    async def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by all workers through Redis.
+
+    Tags are invalidated by bumping a per-tag generation counter that is part
+    of every stored key, so invalidation is O(1) and stale entries simply
+    expire. Requires the ``redis`` package.
+    """
+
+    def __init__(self, url: str, ttl_seconds: float = 30.0, prefix: str = "sarpanch:cache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_URL points at Redis but the 'redis' package is not installed") from e
+        self._redis = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    async def _versioned_key(self, key: str, tags: Tuple[str, ...]) -> str:
+        versions = await self._redis.mget([f"{self.prefix}tag:{tag}" for tag in tags]) if tags else []
+        generation = ".".join((version or b"0").decode() for version in versions)
+        return f"{self.prefix}{key}#{generation}"
+
+    async def _tags_for(self, key: str) -> Tuple[str, ...]:
+        tags = await self._redis.get(f"{self.prefix}tags:{key}")
+        return tuple(json.loads(tags)) if tags else ()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        value = await self._redis.get(await self._versioned_key(key, await self._tags_for(key)))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Stored as the JSON-encoded headers, a newline, then the body
+        headers, body = value.split(b"\n", 1)
+        return body, json.loads(headers)
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str]):
+        tags = tuple(tags)
+        ttl = max(1, int(self.ttl_seconds))
+        body, headers = value
+        await self._redis.set(f"{self.prefix}tags:{key}", json.dumps(tags), ex=ttl)
+        await self._redis.set(await self._versioned_key(key, tags), json.dumps(headers).encode() + b"\n" + body, ex=ttl)
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            await self._redis.incr(f"{self.prefix}tag:{tag}")
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(f"{self.prefix}*"):
+            await self._redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl_seconds}
+
+
+def create_cache(url: str, max_entries: int, ttl_seconds: float) -> CacheBackend:
+    """Create the cache backend selected by a CACHE_URL value"""
+    if url in ("", "none", "off"):
+        return NullCache()
+    if url.startswith("memory"):
+        return MemoryCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
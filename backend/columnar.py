@@ -0,0 +1,51 @@
+import importlib.util
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from compression import negotiate
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# MessagePack is only offered when the optional package is installed
+MSGPACK_AVAILABLE = importlib.util.find_spec("msgpack") is not None
+
+
+def history_columns(history: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """One array per reading field instead of one object per reading, so field names are sent once"""
+    # Ordered union of the field names; only the keys are used
+    fields = {}
+    for reading in history:
+        fields.update(reading)
+    return {field: [reading.get(field) for reading in history] for field in fields}
+
+
+def with_history_columns(village: Dict[str, Any]) -> Dict[str, Any]:
+    if "history" not in village:
+        return village
+    return {**village, "history": history_columns(village["history"])}
+
+
+def prefers_msgpack(accept: str) -> bool:
+    """Whether the client weighs MessagePack above JSON in its Accept header"""
+    if not MSGPACK_AVAILABLE:
+        return False
+    # JSON goes first so that it wins ties, such as Accept: */*
+    offered = ["application/json", MSGPACK_MEDIA_TYPE, "application/x-msgpack"]
+    return negotiate(accept, offered, wildcard="*/*") in offered[1:]
+
+
+def _msgpack_default(value: Any) -> Any:
+    # Datetimes are written as strings, the way encode_json writes them
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    return str(value)
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    try:
+        import msgpack
+    except ImportError as e:
+        raise RuntimeError("MessagePack responses need the 'msgpack' package") from e
+    return msgpack.packb(payload, default=_msgpack_default)
@@ -0,0 +1,162 @@
+import zlib
+from typing import Callable, Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+
+def parse_qvalues(header: str) -> Dict[str, float]:
+    """Parse an Accept or Accept-Encoding header into lowercase values and their q weights"""
+    weights = {}
+    for part in header.split(","):
+        value, _, params = part.partition(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, raw = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(raw)
+                except ValueError:
+                    weight = 0.0
+        weights[value] = weight
+    return weights
+
+
+def negotiate(header: str, offered: Iterable[str], wildcard: str = "*") -> Optional[str]:
+    """The offered value the client weighs highest, ties going to the earlier one; None if it accepts none"""
+    weights = parse_qvalues(header)
+    best, best_weight = None, 0.0
+    for value in offered:
+        weight = weights.get(value, weights.get(wildcard, 0.0))
+        if weight > best_weight:
+            best, best_weight = value, weight
+    return best
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Flushed so that every streamed chunk reaches the client right away
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, brotli, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def compressors(encodings: Optional[Iterable[str]] = None, gzip_level: int = 6,
+                brotli_quality: int = 4) -> Dict[str, Callable[[], object]]:
+    """Compressor factories by content coding, in order of preference.
+
+    By default brotli is offered when the ``brotli`` package is installed,
+    and gzip always. Listing "br" explicitly requires the package.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    if encodings is None:
+        encodings = ["br", "gzip"] if brotli else ["gzip"]
+    factories = {}
+    for encoding in encodings:
+        if encoding == "gzip":
+            factories["gzip"] = lambda: GzipCompressor(gzip_level)
+        elif encoding == "br":
+            if brotli is None:
+                raise RuntimeError("COMPRESSION_ENCODINGS includes br but the 'brotli' package is not installed")
+            factories["br"] = lambda: BrotliCompressor(brotli, brotli_quality)
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+    return factories
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the content coding the client prefers.
+
+    Whole responses shorter than ``minimum_size`` are sent as they are, as
+    compressing them saves less than the headers cost. Streamed responses
+    (exports) are compressed chunk by chunk without being buffered, while
+    the alert stream is left alone so events are not held back. A
+    compressed response carries a weak ETag, which conditional GETs still
+    match.
+    """
+
+    def __init__(self, app, factories: Dict[str, Callable[[], object]], minimum_size: int = 1024,
+                 excluded_media_types=("text/event-stream",)):
+        self.app = app
+        self.factories = factories
+        self.minimum_size = minimum_size
+        self.excluded_media_types = tuple(excluded_media_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.factories:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.factories, wildcard="*")
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "")
+                passthrough = "content-encoding" in headers or media_type.startswith(self.excluded_media_types)
+                if not passthrough:
+                    MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+                    passthrough = encoding is None
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(scope=start_message)
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = self.factories[encoding]()
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    start_message = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+                start_message = None
+
+            chunk = compressor.compress(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,257 @@
+import asyncio
+import gzip
+import logging
+import sqlite3
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL UNIQUE,
+    body BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def reading_key(reading: Dict[str, Any]) -> str:
+    """Dedup key of a buffered reading: a sensor sends one reading per village and timestamp"""
+    return f"reading:{reading['village_id']}:{reading['timestamp']}"
+
+
+def alert_key(alert: Dict[str, Any]) -> str:
+    return f"alert:{alert['id']}"
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+def gunzip(body: bytes, max_bytes: int) -> bytes:
+    """Decompress a gzip request body, raising ValueError when it is corrupt or BodyTooLarge past ``max_bytes``"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_bytes)
+    except zlib.error as e:
+        raise ValueError("Malformed gzip body") from e
+    if decompressor.unconsumed_tail:
+        raise BodyTooLarge(f"Decompressed body exceeds {max_bytes} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip body")
+    return data
+
+
+class EdgeLog:
+    """Durable append-only log of the writes an edge server still has to send upstream.
+
+    Entries are rows of a SQLite database in WAL mode, numbered by a seq
+    that is never reused. An entry whose dedup key is already in the log is
+    dropped, so a sensor resending a reading is buffered once. Entries stay
+    after the central server acknowledges them, to keep deduplicating
+    resends, and are pruned ``retention_seconds`` later. All SQLite calls run
+    on one dedicated thread, so the event loop never waits for an fsync.
+    """
+
+    def __init__(self, path: str, retention_seconds: float = 86400, synchronous: str = "FULL"):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.synchronous = synchronous
+        self.log_id: Optional[str] = None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="edge-log")
+
+    async def _run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _open(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        connection.executescript(SCHEMA)
+        with connection:
+            # Identifies this log to the central server, so a log recreated
+            # after being lost does not have its restarted seqs skipped
+            connection.execute("INSERT OR IGNORE INTO state VALUES ('log_id', ?)", (uuid.uuid4().hex,))
+        self.log_id = connection.execute("SELECT value FROM state WHERE name = 'log_id'").fetchone()[0]
+        self._connection = connection
+
+    def _append(self, rows: List[Tuple[str, str, bytes, float]]) -> int:
+        with self._connection:
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO entries (kind, key, body, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+        return cursor.rowcount
+
+    def _pending(self, limit: int) -> List[Tuple[int, str, bytes]]:
+        return self._connection.execute(
+            "SELECT seq, kind, body FROM entries WHERE seq > ? ORDER BY seq LIMIT ?", (self._acked(), limit)
+        ).fetchall()
+
+    def _acked(self) -> int:
+        row = self._connection.execute("SELECT value FROM state WHERE name = 'acked'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _ack(self, seq: int):
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO state VALUES ('acked', ?)", (str(max(seq, self._acked())),))
+            self._connection.execute(
+                "DELETE FROM entries WHERE seq <= ? AND created_at < ?", (seq, time.time() - self.retention_seconds)
+            )
+
+    def _backlog(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM entries WHERE seq > ?", (self._acked(),)).fetchone()[0]
+
+    async def open(self):
+        await self._run(self._open)
+
+    async def close(self):
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+    async def append(self, kind: str, records: List[Dict[str, Any]], key: Callable[[Dict[str, Any]], str]) -> int:
+        """Buffer records of one kind, returning how many were new"""
+        if not records:
+            return 0
+        now = time.time()
+        rows = [(kind, key(record), orjson.dumps(record, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z), now) for record in records]
+        return await self._run(self._append, rows)
+
+    async def append_readings(self, readings: List[Dict[str, Any]]) -> int:
+        return await self.append("reading", readings, reading_key)
+
+    async def append_alerts(self, alerts: List[Dict[str, Any]]) -> int:
+        return await self.append("alert", alerts, alert_key)
+
+    async def pending(self, limit: int) -> List[Tuple[int, str, bytes]]:
+        """The oldest unacknowledged entries as (seq, kind, JSON body)"""
+        return await self._run(self._pending, limit)
+
+    async def ack(self, seq: int):
+        """Record that the central server applied every entry up to ``seq``"""
+        await self._run(self._ack, seq)
+
+    async def acked(self) -> int:
+        return await self._run(self._acked)
+
+    async def backlog(self) -> int:
+        return await self._run(self._backlog)
+
+
+def encode_batch(stream_id: str, entries: List[Tuple[int, str, bytes]]) -> bytes:
+    """The JSON body of POST /api/sync/batch, reusing the stored entry bodies as they are"""
+    parts = [b'{"seq":%d,"kind":%s,"data":%s}' % (seq, orjson.dumps(kind), body) for seq, kind, body in entries]
+    return b'{"edge_id":%s,"entries":[%s]}' % (orjson.dumps(stream_id), b",".join(parts))
+
+
+class EdgeSyncer:
+    """Replays an edge log to the central server's POST /api/sync/batch, oldest entries first.
+
+    Each batch of up to ``batch_size`` entries is sent as gzip-compressed
+    JSON and acknowledged in the log only once the central server has
+    applied it. The central server skips entries at or below the last seq it
+    applied from this log, so resending a batch after a lost response
+    duplicates nothing. While the link is down, or the server answers with
+    an error, the syncer retries with exponential backoff.
+    """
+
+    def __init__(self, log: EdgeLog, central_url: str, edge_id: str, batch_size: int = 5000,
+                 interval_seconds: float = 5.0, max_backoff_seconds: float = 300.0,
+                 timeout_seconds: float = 30.0, compress_level: int = 6):
+        self.log = log
+        self.central_url = central_url.rstrip("/")
+        self.edge_id = edge_id
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.compress_level = compress_level
+        self.synced_entries = 0
+        self.sent_bytes = 0
+        self.last_sync_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def stream_id(self) -> str:
+        return f"{self.edge_id}:{self.log.log_id}"
+
+    async def sync_once(self, client) -> int:
+        """Send the next batch, returning how many entries the central server acknowledged"""
+        entries = await self.log.pending(self.batch_size)
+        if not entries:
+            return 0
+        body = gzip.compress(encode_batch(self.stream_id, entries), compresslevel=self.compress_level)
+        response = await client.post(
+            f"{self.central_url}/api/sync/batch",
+            content=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+        if response.status_code == 429:
+            raise RetryLater(float(response.headers.get("Retry-After", self.interval_seconds)))
+        response.raise_for_status()
+        result = response.json()
+        for reject in result.get("rejected", []):
+            logger.warning(f"Central server rejected buffered {reject.get('kind')} {reject.get('seq')}: {reject.get('error')}")
+        await self.log.ack(result["acked"])
+        self.synced_entries += len(entries)
+        self.sent_bytes += len(body)
+        self.last_sync_at = time.time()
+        self.last_error = None
+        return len(entries)
+
+    async def run(self):
+        """Sync until cancelled"""
+        try:
+            import httpx
+        except ImportError as e:
+            raise RuntimeError("EDGE_SYNC_URL is set but the 'httpx' package is not installed") from e
+
+        backoff = self.interval_seconds
+        async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
+            while True:
+                try:
+                    sent = await self.sync_once(client)
+                    backoff = self.interval_seconds
+                    if sent < self.batch_size:
+                        await asyncio.sleep(self.interval_seconds)
+                except RetryLater as e:
+                    await asyncio.sleep(e.seconds)
+                except (httpx.HTTPError, ValueError, KeyError) as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    logger.warning(f"Edge sync failed, retrying in {backoff:.0f} s: {self.last_error}")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff_seconds)
+
+    async def status(self) -> Dict[str, Any]:
+        return {
+            "edge_id": self.stream_id,
+            "central_url": self.central_url,
+            "backlog": await self.log.backlog(),
+            "acked_seq": await self.log.acked(),
+            "synced_entries": self.synced_entries,
+            "sent_bytes": self.sent_bytes,
+            "last_sync_at": self.last_sync_at,
+            "last_error": self.last_error
+        }
+
+
+class RetryLater(Exception):
+    """The central server asked the syncer to back off"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"retry after {seconds} s")
+        self.seconds = seconds
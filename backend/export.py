@@ -0,0 +1,170 @@
+import base64
+import csv
+import io
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    """How one collection is exported.
+
+    Records are streamed in ``sort`` order, which must be served by an
+    index. The values of the sort keys of the last record of each batch form
+    the resume cursor.
+    """
+    collection: str
+    sort: List[Tuple[str, type]]
+    time_field: str
+    village_field: str
+    projection: Dict[str, Any]
+    csv_columns: List[str]
+    to_record: Callable[[Dict[str, Any]], Dict[str, Any]]
+    to_csv_row: Callable[[Dict[str, Any]], List[Any]]
+
+
+def _village_row(doc: Dict[str, Any]) -> List[Any]:
+    coords = doc.get("coords") or [None, None]
+    return [
+        doc.get("id"), doc.get("name"), doc.get("district"), doc.get("state"), doc.get("crop"),
+        coords[0], coords[1], doc.get("population"), doc.get("area_hectares"), doc.get("soil_type"),
+        doc.get("irrigation_type"), (doc.get("severity_summary") or {}).get("highest"), doc.get("last_updated")
+    ]
+
+
+def _without(*fields: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    def to_record(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in doc.items() if key not in fields}
+    return to_record
+
+
+EXPORTS = {
+    "villages": ExportSpec(
+        collection="villages",
+        sort=[("id", str)],
+        time_field="last_updated",
+        village_field="id",
+        # Sensor history is exported from the readings collection
+        projection={"_id": 0, "history": 0, "location": 0},
+        csv_columns=[
+            "id", "name", "district", "state", "crop", "latitude", "longitude", "population",
+            "area_hectares", "soil_type", "irrigation_type", "highest_severity", "last_updated"
+        ],
+        to_record=_without(),
+        to_csv_row=_village_row
+    ),
+    "alerts": ExportSpec(
+        collection="alerts",
+        sort=[("timestamp", datetime), ("id", str)],
+        time_field="timestamp",
+        village_field="village_id",
+        projection={"_id": 0, "effects_pending": 0},
+        csv_columns=["id", "village_id", "alert_type", "message", "severity", "timestamp", "is_active", "dismissed_at"],
+        to_record=_without(),
+        to_csv_row=lambda doc: [
+            doc.get("id"), doc.get("village_id"), doc.get("alert_type"), doc.get("message"),
+            doc.get("severity"), doc.get("timestamp"), doc.get("is_active"), doc.get("dismissed_at")
+        ]
+    ),
+    "readings": ExportSpec(
+        collection="readings",
+        sort=[("village_id", str), ("ts", datetime)],
+        time_field="ts",
+        village_field="village_id",
+        projection={"_id": 0},
+        csv_columns=["village_id", "timestamp", "day", "soil_moisture", "temperature", "humidity", "ph_level"],
+        to_record=_without("ts"),
+        to_csv_row=lambda doc: [
+            doc.get("village_id"), doc.get("timestamp"), doc.get("day"), doc.get("soil_moisture"),
+            doc.get("temperature"), doc.get("humidity"), doc.get("ph_level")
+        ]
+    ),
+}
+
+
+def encode_cursor(spec: ExportSpec, doc: Dict[str, Any]) -> str:
+    values = [doc[field].isoformat() if kind is datetime else doc[field] for field, kind in spec.sort]
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+
+def decode_cursor(spec: ExportSpec, token: str) -> List[Any]:
+    """Decode a resume cursor, raising ValueError when it is malformed"""
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, orjson.JSONDecodeError) as e:
+        raise ValueError("Malformed export cursor") from e
+    if not isinstance(values, list) or len(values) != len(spec.sort):
+        raise ValueError("Export cursor does not match this collection")
+    return [datetime.fromisoformat(value) if kind is datetime else value for value, (_, kind) in zip(values, spec.sort)]
+
+
+def sort_values(spec: ExportSpec, doc: Dict[str, Any]) -> Tuple[Any, ...]:
+    """The values of a record's sort keys, comparable with a decoded cursor"""
+    return tuple(doc[field] for field, _ in spec.sort)
+
+
+def resume_filter(spec: ExportSpec, values: List[Any]) -> Dict[str, Any]:
+    """Match the records that sort strictly after the given sort key values"""
+    branches = []
+    for depth, (field, _) in enumerate(spec.sort):
+        branch = {prior: value for (prior, _), value in zip(spec.sort[:depth], values[:depth])}
+        branch[field] = {"$gt": values[depth]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # Mongo returns naive datetimes that are stored as UTC
+        return value.isoformat() + "Z" if value.tzinfo is None else value.isoformat()
+    return value
+
+
+def _csv_line(row: List[Any]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([_csv_value(value) for value in row])
+    return buffer.getvalue().encode()
+
+
+async def stream_export(
+    docs: AsyncIterator[Dict[str, Any]],
+    spec: ExportSpec,
+    fmt: str,
+    batch_size: int,
+    encode: Callable[[Any], bytes]
+) -> AsyncIterator[bytes]:
+    """Stream records in ``spec.sort`` order as NDJSON or CSV, one chunk per batch.
+
+    Only one batch is held in memory at a time. The last record of each
+    batch carries a ``_cursor`` token (an extra field in NDJSON, the last
+    column in CSV) that resumes the export right after it.
+    """
+    if fmt == "csv":
+        yield _csv_line(spec.csv_columns + ["_cursor"])
+
+    batch: List[Dict[str, Any]] = []
+    async for doc in docs:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield _format_batch(spec, batch, fmt, encode)
+            batch = []
+    if batch:
+        yield _format_batch(spec, batch, fmt, encode)
+
+
+def _format_batch(spec: ExportSpec, batch: List[Dict[str, Any]], fmt: str, encode) -> bytes:
+    lines = [_format(spec, doc, fmt, None, encode) for doc in batch[:-1]]
+    lines.append(_format(spec, batch[-1], fmt, encode_cursor(spec, batch[-1]), encode))
+    return b"".join(lines)
+
+
+def _format(spec: ExportSpec, doc: Dict[str, Any], fmt: str, token: Optional[str], encode) -> bytes:
+    if fmt == "csv":
+        return _csv_line(spec.to_csv_row(doc) + [token or ""])
+    record = spec.to_record(doc)
+    if token:
+        record["_cursor"] = token
+    return encode(record) + b"\n"
@@ -0,0 +1,135 @@
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (min_lon, min_lat, max_lon, max_lat)
+BBox = Tuple[float, float, float, float]
+
+# Mean Earth radius used by MongoDB for spherical distances
+EARTH_RADIUS_KM = 6378.1
+
+# Approximate grid cells per 256px map tile when clustering, i.e. markers
+# closer than about 64px on screen are merged
+CLUSTER_CELLS_PER_TILE = 4
+
+
+def point(coords: List[float]) -> Dict[str, Any]:
+    """GeoJSON point for a village's [latitude, longitude] coords"""
+    latitude, longitude = coords[0], coords[1]
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def point_expression() -> Dict[str, Any]:
+    """Aggregation expression building the GeoJSON point from the coords field"""
+    return {"type": "Point", "coordinates": [{"$arrayElemAt": ["$coords", 1]}, {"$arrayElemAt": ["$coords", 0]}]}
+
+
+def parse_bbox(value: str) -> BBox:
+    """Parse a "min_lon,min_lat,max_lon,max_lat" bounding box, raising ValueError when invalid"""
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must have four values")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox is out of range or empty")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def within_bbox(bbox: BBox) -> Dict[str, Any]:
+    """Query matching villages located inside a bounding box.
+
+    The box is flat, like a map viewport and like in_bbox: its edges follow
+    parallels and meridians rather than great circles, and it may be of any
+    size up to the whole world. It is matched against the [latitude,
+    longitude] coords, served by their 2d index.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return {"coords": {"$geoWithin": {"$box": [[min_lat, min_lon], [max_lat, max_lon]]}}}
+
+
+def in_bbox(coords: List[float], bbox: BBox) -> bool:
+    """Whether [latitude, longitude] coords fall inside a bounding box"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lat <= coords[0] <= max_lat and min_lon <= coords[1] <= max_lon
+
+
+def distance_km(latitude: float, longitude: float, coords: List[float]) -> float:
+    """Great-circle distance from a point to [latitude, longitude] coords"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (latitude, longitude, coords[0], coords[1]))
+    haversine = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(haversine)))
+
+
+def cluster_size(zoom: int) -> float:
+    """Width in degrees of the clustering grid cells at a web map zoom level"""
+    return 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+
+
+def cluster_pipeline(bbox: BBox, zoom: int, severities: List[str], match: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Group the villages in a bounding box into grid clusters for a zoom level.
+
+    Each cluster reports its village count, the mean position of its
+    villages and the highest active alert severity among them. Single
+    village clusters also carry the village id and name so they can be drawn
+    as ordinary markers.
+    """
+    size = cluster_size(zoom)
+    rank = {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$severity_summary.highest", severity]}, "then": index}
+            for index, severity in enumerate(severities)
+        ],
+        "default": -1
+    }}
+    longitude = {"$arrayElemAt": ["$location.coordinates", 0]}
+    latitude = {"$arrayElemAt": ["$location.coordinates", 1]}
+    return [
+        {"$match": {**within_bbox(bbox), **(match or {})}},
+        {"$group": {
+            "_id": {"x": {"$floor": {"$divide": [longitude, size]}}, "y": {"$floor": {"$divide": [latitude, size]}}},
+            "count": {"$sum": 1},
+            "longitude": {"$avg": longitude},
+            "latitude": {"$avg": latitude},
+            "severity_rank": {"$max": rank},
+            "village_id": {"$first": "$id"},
+            "name": {"$first": "$name"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "count": 1,
+            "coords": ["$latitude", "$longitude"],
+            "highest": {"$arrayElemAt": [[None] + severities, {"$add": ["$severity_rank", 1]}]},
+            "village_id": {"$cond": [{"$eq": ["$count", 1]}, "$village_id", "$$REMOVE"]},
+            "name": {"$cond": [{"$eq": ["$count", 1]}, "$name", "$$REMOVE"]}
+        }}
+    ]
+
+
+def grid_clusters(villages: Iterable[Dict[str, Any]], zoom: int, severities: List[str]) -> List[Dict[str, Any]]:
+    """The clusters of cluster_pipeline computed in Python from village documents"""
+    size = cluster_size(zoom)
+    rank = {severity: index for index, severity in enumerate(severities)}
+    cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for village in villages:
+        latitude, longitude = village["coords"][0], village["coords"][1]
+        cell = cells.setdefault((math.floor(longitude / size), math.floor(latitude / size)), {
+            "count": 0, "latitude": 0.0, "longitude": 0.0, "rank": -1,
+            "village_id": village["id"], "name": village.get("name")
+        })
+        cell["count"] += 1
+        cell["latitude"] += latitude
+        cell["longitude"] += longitude
+        highest = (village.get("severity_summary") or {}).get("highest")
+        cell["rank"] = max(cell["rank"], rank.get(highest, -1))
+
+    clusters = []
+    for cell in cells.values():
+        cluster = {
+            "count": cell["count"],
+            "coords": [cell["latitude"] / cell["count"], cell["longitude"] / cell["count"]],
+            "highest": severities[cell["rank"]] if cell["rank"] >= 0 else None
+        }
+        if cell["count"] == 1:
+            cluster["village_id"] = cell["village_id"]
+            cluster["name"] = cell["name"]
+        clusters.append(cluster)
+    return clusters
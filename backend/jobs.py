@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from storage import JobRepository
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+# Job fields returned by GET /api/jobs/{id}
+JOB_STATUS_FIELDS = (
+    "id", "kind", "status", "attempts", "max_attempts", "created_at", "updated_at", "finished_at", "result", "error"
+)
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying the job cannot help"""
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: job.get(field) for field in JOB_STATUS_FIELDS}
+
+
+class JobQueue:
+    """Background jobs stored in the database and run off the request path.
+
+    A job is durable once ``enqueue`` returns. Every API process runs
+    ``concurrency`` workers that claim due jobs one at a time, so at most
+    that many handlers run per process. A claimed job is leased for
+    ``lease_seconds``: a handler still running then is cancelled, and a job
+    whose process died is claimed again once its lease runs out. Failed
+    attempts are retried with exponential backoff up to ``max_attempts``
+    times in all, so handlers must be idempotent. Finished jobs are kept
+    for ``retention_seconds``.
+    """
+
+    def __init__(self, jobs: Callable[[], JobRepository], concurrency: int = 4, max_attempts: int = 5,
+                 retry_seconds: float = 2.0, max_retry_seconds: float = 300.0, lease_seconds: float = 60.0,
+                 poll_seconds: float = 1.0, retention_seconds: float = 7 * 86400):
+        self._jobs = jobs
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.handlers: Dict[str, Handler] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        """Register the coroutine that runs jobs of a kind; it returns the job result or None"""
+        def register(function: Handler) -> Handler:
+            self.handlers[kind] = function
+            return function
+        return register
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a job to run as soon as a worker is free, and return it"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "due_at": now,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "expires_at": None,
+            "result": None,
+            "error": None
+        }
+        await self._jobs().insert(job)
+        if self._wakeup:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._jobs().get(job_id)
+
+    async def run_next(self) -> Optional[Dict[str, Any]]:
+        """Claim and run the job that has been due the longest, returning its outcome or None if none is due"""
+        now = datetime.now(timezone.utc)
+        job = await self._jobs().claim(now, now + timedelta(seconds=self.lease_seconds))
+        if job is None:
+            return None
+
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise PermanentJobError(f"No handler for jobs of kind {job['kind']}")
+            # Cancelled when the lease runs out and another worker may claim the job
+            result = await asyncio.wait_for(handler(job["payload"]), self.lease_seconds)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            finished = datetime.now(timezone.utc)
+            if isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                logger.error(f"Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+                update = {
+                    "status": "failed", "error": error, "updated_at": finished, "finished_at": finished,
+                    "expires_at": finished + timedelta(seconds=self.retention_seconds)
+                }
+            else:
+                delay = min(self.retry_seconds * 2 ** (job["attempts"] - 1), self.max_retry_seconds)
+                logger.warning(f"Job {job['id']} ({job['kind']}) failed, retrying in {delay:.0f} s: {error}")
+                update = {
+                    "status": "queued", "error": error, "updated_at": finished,
+                    "due_at": finished + timedelta(seconds=delay)
+                }
+        else:
+            finished = datetime.now(timezone.utc)
+            update = {
+                "status": "succeeded", "result": result, "error": None, "updated_at": finished,
+                "finished_at": finished, "expires_at": finished + timedelta(seconds=self.retention_seconds)
+            }
+        await self._jobs().finish(job["id"], job["attempts"], update)
+        return {**job, **update}
+
+    async def _work(self):
+        while not self._stopping:
+            # Cleared before looking for work, so a job enqueued meanwhile still wakes this worker
+            self._wakeup.clear()
+            try:
+                job = await self.run_next()
+            except Exception:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run(self):
+        """Run the workers until cancelled"""
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.wait(workers)
+        finally:
+            # wait_for can swallow a cancellation arriving just as a handler
+            # or the poll finishes, so the workers also check this flag
+            self._stopping = True
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
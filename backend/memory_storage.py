@@ -0,0 +1,495 @@
+import asyncio
+import copy
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from export import ExportSpec, sort_values
+from geo import BBox, distance_km, grid_clusters, in_bbox
+from storage import AlertRepository, JobRepository, ReadingRepository, Storage, TimeRange, VillageQuery, VillageRepository
+from timeseries import aggregate_readings
+
+# Village attributes with an index of the ids having each value
+INDEXED_FIELDS = ("state", "district", "crop")
+
+
+def in_range(value: Optional[datetime], time_range: TimeRange) -> bool:
+    since, until = time_range
+    if since is None and until is None:
+        return True
+    if value is None:
+        return False
+    return (since is None or value >= since) and (until is None or value < until)
+
+
+async def export_docs(docs: Iterable[Dict[str, Any]], spec: ExportSpec, after: Optional[List[Any]],
+                      batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    """Yield copies of documents in ``spec.sort`` order after a cursor, without the excluded fields"""
+    ordered = sorted(docs, key=lambda doc: sort_values(spec, doc))
+    start = tuple(after) if after is not None else None
+    excluded = {field for field, value in spec.projection.items() if not value}
+    for position, doc in enumerate(ordered):
+        if start is not None and sort_values(spec, doc) <= start:
+            continue
+        yield copy.deepcopy({key: value for key, value in doc.items() if key not in excluded})
+        if position % batch_size == batch_size - 1:
+            # Let other requests run between batches of a large export
+            await asyncio.sleep(0)
+
+
+class MemoryVillageRepository(VillageRepository):
+
+    def __init__(self, storage: "MemoryStorage"):
+        self.storage = storage
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.ids: List[str] = []
+        self.index: Dict[Tuple[str, Any], Set[str]] = {}
+
+    def _index(self, village: Dict[str, Any], add: bool):
+        keys = [(field, village.get(field)) for field in INDEXED_FIELDS]
+        keys.append(("highest", (village.get("severity_summary") or {}).get("highest")))
+        for key in keys:
+            if add:
+                self.index.setdefault(key, set()).add(village["id"])
+            else:
+                self.index.get(key, set()).discard(village["id"])
+
+    def _set_summary(self, village: Dict[str, Any], summary: Dict[str, Any]):
+        self._index(village, add=False)
+        village["severity_summary"] = summary
+        self._index(village, add=True)
+
+    def _matching(self, query: VillageQuery) -> Iterator[Dict[str, Any]]:
+        """Villages matching a query, ordered by id"""
+        candidates: Optional[Set[str]] = None
+        if query.ids is not None:
+            candidates = {village_id for village_id in query.ids if village_id in self.docs}
+        keys = [(field, getattr(query, field)) for field in INDEXED_FIELDS if getattr(query, field)]
+        if query.severity:
+            keys.append(("highest", query.severity))
+        for key in keys:
+            matching = self.index.get(key, set())
+            candidates = set(matching) if candidates is None else candidates & matching
+
+        if candidates is None:
+            start = bisect_right(self.ids, query.after) if query.after else 0
+            ordered: Iterable[str] = self.ids[start:]
+        else:
+            ordered = sorted(village_id for village_id in candidates if not query.after or village_id > query.after)
+        for village_id in ordered:
+            yield self.docs[village_id]
+
+    def _project(self, village: Dict[str, Any], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        # Only the most recent readings and alert messages are returned
+        if fields is None:
+            projected = dict(village)
+        else:
+            projected = {name: village[name] for name in ("id", *fields) if name in village}
+        if "history" in projected:
+            projected["history"] = projected["history"][-self.storage.history_size:]
+        if "alerts" in projected:
+            projected["alerts"] = projected["alerts"][-self.storage.alerts_size:]
+        return copy.deepcopy(projected)
+
+    def _marker(self, village: Dict[str, Any]) -> Dict[str, Any]:
+        marker = {name: village[name] for name in ("id", "name", "district", "state", "crop") if name in village}
+        marker["coords"] = list(village["coords"])
+        marker["severity_summary"] = {"highest": (village.get("severity_summary") or {}).get("highest")}
+        return marker
+
+    def _push(self, village: Dict[str, Any], readings: List[Dict[str, Any]], now: datetime):
+        history = sorted(village.get("history", []) + copy.deepcopy(readings), key=lambda reading: reading["timestamp"])
+        village["history"] = history[-self.storage.history_size:]
+        village["last_updated"] = now
+
+    async def count(self) -> int:
+        return len(self.docs)
+
+    async def count_with_highest(self, severity: str) -> int:
+        return len(self.index.get(("highest", severity), ()))
+
+    async def find(self, query: VillageQuery, fields: Optional[Iterable[str]] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        found = []
+        for village in self._matching(query):
+            found.append(self._project(village, fields))
+            if len(found) == limit:
+                break
+        return found
+
+    async def get(self, village_id: str) -> Optional[Dict[str, Any]]:
+        village = self.docs.get(village_id)
+        return None if village is None else self._project(village)
+
+    async def insert_many(self, villages: List[Dict[str, Any]]):
+        duplicates = [village["id"] for village in villages if village["id"] in self.docs]
+        if duplicates:
+            raise ValueError(f"Duplicate village id: {duplicates[0]}")
+        for village in villages:
+            self.docs[village["id"]] = copy.deepcopy(village)
+            insort(self.ids, village["id"])
+            self._index(village, add=True)
+
+    async def insert_missing(self, villages: List[Dict[str, Any]]) -> List[int]:
+        inserted = [index for index, village in enumerate(villages) if village["id"] not in self.docs]
+        await self.insert_many([villages[index] for index in inserted])
+        return inserted
+
+    async def push_reading(self, village_id: str, reading: Dict[str, Any], now: datetime,
+                           fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        village = self.docs.get(village_id)
+        if village is None:
+            return None
+        self._push(village, [reading], now)
+        return self._project(village, fields)
+
+    async def push_readings(self, readings: Dict[str, List[Dict[str, Any]]], now: datetime):
+        for village_id, village_readings in readings.items():
+            if village_id in self.docs:
+                self._push(self.docs[village_id], village_readings, now)
+
+    async def add_alerts(self, messages: Dict[str, List[str]], counts: Dict[str, Dict[str, int]], now: datetime):
+        for village_id, texts in messages.items():
+            village = self.docs.get(village_id)
+            if village is None:
+                continue
+            village["alerts"] = (village.get("alerts", []) + texts)[-self.storage.alerts_size:]
+            village["last_updated"] = now
+            summary = copy.deepcopy(village.get("severity_summary") or {})
+            summary.setdefault("counts", {})
+            for severity, count in counts[village_id].items():
+                summary["counts"][severity] = summary["counts"].get(severity, 0) + count
+            summary["highest"] = self.storage.highest(summary["counts"])
+            self._set_summary(village, summary)
+
+    async def adjust_severity(self, village_id: str, severity: str, delta: int) -> Optional[Dict[str, Any]]:
+        village = self.docs.get(village_id)
+        if village is None:
+            return None
+        previous = copy.deepcopy(village.get("severity_summary") or {})
+        summary = copy.deepcopy(previous)
+        counts = summary.setdefault("counts", {})
+        counts[severity] = max(0, counts.get(severity, 0) + delta)
+        summary["highest"] = self.storage.highest(counts)
+        self._set_summary(village, summary)
+        return previous
+
+    async def replace_severity_summaries(self, summaries: Dict[str, Dict[str, Any]], empty: Dict[str, Any]):
+        for village in self.docs.values():
+            if village["id"] in summaries:
+                self._set_summary(village, copy.deepcopy(summaries[village["id"]]))
+            elif (village.get("severity_summary") or {}).get("highest") is not None:
+                self._set_summary(village, copy.deepcopy(empty))
+
+    async def markers_in_bbox(self, bbox: BBox, query: VillageQuery, limit: int) -> List[Dict[str, Any]]:
+        markers = []
+        for village in self._matching(query):
+            if in_bbox(village["coords"], bbox):
+                markers.append(self._marker(village))
+                if len(markers) == limit:
+                    break
+        return markers
+
+    async def markers_near(self, latitude: float, longitude: float, radius_km: float,
+                           query: VillageQuery, limit: int) -> List[Dict[str, Any]]:
+        near = []
+        for village in self._matching(query):
+            distance = distance_km(latitude, longitude, village["coords"])
+            if distance <= radius_km:
+                near.append((distance, village["id"], village))
+        return [
+            {**self._marker(village), "distance_km": distance}
+            for distance, _, village in heapq.nsmallest(limit, near, key=lambda item: item[:2])
+        ]
+
+    async def clusters(self, bbox: BBox, zoom: int, query: VillageQuery) -> List[Dict[str, Any]]:
+        inside = (village for village in self._matching(query) if in_bbox(village["coords"], bbox))
+        return grid_clusters(inside, zoom, self.storage.severities)
+
+    async def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+                     after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        villages = self._matching(VillageQuery(ids=village_ids or None))
+        selected = [village for village in villages if in_range(village.get(spec.time_field), time_range)]
+        async for doc in export_docs(selected, spec, after, batch_size):
+            yield doc
+
+
+class MemoryAlertRepository(AlertRepository):
+
+    def __init__(self, storage: "MemoryStorage"):
+        self.storage = storage
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.by_village: Dict[str, List[str]] = {}
+        # Ids of the active alerts of each severity
+        self.active: Dict[Optional[str], Set[str]] = {}
+        # Ids of the alerts whose effects are not applied yet
+        self.pending: Set[str] = set()
+        self.archive: Dict[str, Dict[str, Any]] = {}
+
+    def _latest(self, alert_ids: Iterable[str], limit: int) -> List[Dict[str, Any]]:
+        latest = heapq.nlargest(limit, (self.docs[alert_id] for alert_id in alert_ids), key=lambda alert: alert["timestamp"])
+        return copy.deepcopy(latest)
+
+    async def insert_many(self, alerts: List[Dict[str, Any]]):
+        for alert in alerts:
+            if alert["id"] in self.docs:
+                raise ValueError(f"Duplicate alert id: {alert['id']}")
+        for alert in alerts:
+            self.docs[alert["id"]] = copy.deepcopy(alert)
+            self.by_village.setdefault(alert["village_id"], []).append(alert["id"])
+            self.pending.add(alert["id"])
+            if alert.get("is_active"):
+                self.active.setdefault(alert.get("severity"), set()).add(alert["id"])
+
+    async def find(self, active_only: bool, limit: int) -> List[Dict[str, Any]]:
+        if active_only:
+            return self._latest((alert_id for ids in self.active.values() for alert_id in ids), limit)
+        return self._latest(self.docs, limit)
+
+    async def for_village(self, village_id: str, limit: int) -> List[Dict[str, Any]]:
+        return self._latest(self.by_village.get(village_id, []), limit)
+
+    async def find_recent(self, village_ids: List[str], alert_types: List[str], since: datetime) -> List[Dict[str, Any]]:
+        types = set(alert_types)
+        recent = []
+        for village_id in village_ids:
+            for alert_id in self.by_village.get(village_id, []):
+                alert = self.docs[alert_id]
+                if alert["alert_type"] in types and (alert.get("is_active") or alert["timestamp"] >= since):
+                    recent.append({"village_id": village_id, "alert_type": alert["alert_type"], "severity": alert.get("severity")})
+        return recent
+
+    async def exists(self, alert_id: str) -> bool:
+        return alert_id in self.docs
+
+    async def existing_ids(self, alert_ids: List[str]) -> Set[str]:
+        return {alert_id for alert_id in alert_ids if alert_id in self.docs}
+
+    async def pending_effects(self, alert_ids: List[str]) -> Set[str]:
+        return self.pending.intersection(alert_ids)
+
+    async def effects_applied(self, alert_ids: List[str]):
+        self.pending.difference_update(alert_ids)
+
+    async def deactivate(self, alert_id: str, now: datetime) -> Optional[Dict[str, Any]]:
+        alert = self.docs.get(alert_id)
+        if alert is None or not alert.get("is_active"):
+            return None
+        alert["is_active"] = False
+        alert["dismissed_at"] = now
+        self.active[alert.get("severity")].discard(alert_id)
+        return {"village_id": alert["village_id"], "severity": alert.get("severity")}
+
+    async def active_before(self, before: datetime, limit: int) -> List[str]:
+        stale = [alert_id for ids in self.active.values() for alert_id in ids if self.docs[alert_id]["timestamp"] < before]
+        return stale[:limit]
+
+    async def archive_dismissed(self, before: datetime, now: datetime, batch_size: int) -> Tuple[int, Set[str]]:
+        ttl_days = self.storage.archive_ttl_days
+        if ttl_days > 0:
+            expiry = now - timedelta(days=ttl_days)
+            for alert_id in [alert_id for alert_id, alert in self.archive.items() if alert["archived_at"] < expiry]:
+                del self.archive[alert_id]
+
+        settled = [
+            alert for alert in self.docs.values()
+            if not alert.get("is_active") and alert.get("dismissed_at") is not None and alert["dismissed_at"] < before
+        ]
+        for alert in settled:
+            self.archive[alert["id"]] = {**alert, "archived_at": now}
+            del self.docs[alert["id"]]
+            self.by_village[alert["village_id"]].remove(alert["id"])
+            self.pending.discard(alert["id"])
+        return len(settled), {alert["village_id"] for alert in settled}
+
+    async def count_active(self, severity: Optional[str] = None) -> int:
+        if severity:
+            return len(self.active.get(severity, ()))
+        return sum(len(ids) for ids in self.active.values())
+
+    async def active_counts(self) -> Dict[str, Dict[str, int]]:
+        counts: Dict[str, Dict[str, int]] = {}
+        for severity, ids in self.active.items():
+            for alert_id in ids:
+                by_severity = counts.setdefault(self.docs[alert_id]["village_id"], {})
+                by_severity[severity] = by_severity.get(severity, 0) + 1
+        return counts
+
+    async def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+                     after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        if village_ids:
+            alert_ids: Iterable[str] = (alert_id for village_id in set(village_ids) for alert_id in self.by_village.get(village_id, []))
+        else:
+            alert_ids = self.docs
+        selected = [self.docs[alert_id] for alert_id in alert_ids if in_range(self.docs[alert_id].get(spec.time_field), time_range)]
+        async for doc in export_docs(selected, spec, after, batch_size):
+            yield doc
+
+
+class MemoryReadingRepository(ReadingRepository):
+
+    def __init__(self, storage: "MemoryStorage"):
+        self.storage = storage
+        # Each village's readings and their times, both sorted by time
+        self.series: Dict[str, List[Dict[str, Any]]] = {}
+        self.times: Dict[str, List[datetime]] = {}
+
+    def _range(self, village_id: str, time_range: TimeRange) -> List[Dict[str, Any]]:
+        since, until = time_range
+        times = self.times.get(village_id, [])
+        start = bisect_left(times, since) if since else 0
+        end = bisect_left(times, until) if until else len(times)
+        return self.series.get(village_id, [])[start:end]
+
+    async def insert_one(self, reading: Dict[str, Any]):
+        await self.insert_many([reading])
+
+    async def insert_many(self, readings: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+        for reading in readings:
+            times = self.times.setdefault(reading["village_id"], [])
+            position = bisect_right(times, reading["ts"])
+            times.insert(position, reading["ts"])
+            self.series.setdefault(reading["village_id"], []).insert(position, copy.deepcopy(reading))
+        return []
+
+    async def existing_keys(self, keys: List[Tuple[str, datetime]]) -> Set[Tuple[str, datetime]]:
+        found = set()
+        for village_id, ts in keys:
+            times = self.times.get(village_id, [])
+            position = bisect_left(times, ts)
+            if position < len(times) and times[position] == ts:
+                found.add((village_id, ts))
+        return found
+
+    async def find(self, village_id: str, time_range: TimeRange, limit: int) -> List[Dict[str, Any]]:
+        return [
+            {key: value for key, value in reading.items() if key not in ("village_id", "ts")}
+            for reading in self._range(village_id, time_range)[:limit]
+        ]
+
+    async def aggregate(self, village_id: str, time_range: TimeRange, bucket: str, metrics: List[str]) -> List[Dict[str, Any]]:
+        return aggregate_readings(self._range(village_id, time_range), bucket, metrics)
+
+    async def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+                     after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        selected = [
+            reading
+            for village_id in (set(village_ids) if village_ids else list(self.series))
+            for reading in self._range(village_id, time_range)
+        ]
+        async for doc in export_docs(selected, spec, after, batch_size):
+            yield doc
+
+
+class MemoryJobRepository(JobRepository):
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        # Ids of the jobs that are queued or running
+        self.unfinished: Set[str] = set()
+        # (expires_at, id) of finished jobs, oldest first
+        self.expiring: deque = deque()
+
+    async def insert(self, job: Dict[str, Any]):
+        while self.expiring and self.expiring[0][0] <= job["created_at"]:
+            self.docs.pop(self.expiring.popleft()[1], None)
+        self.docs[job["id"]] = copy.deepcopy(job)
+        self.unfinished.add(job["id"])
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.docs.get(job_id)
+        return copy.deepcopy(job) if job else None
+
+    async def claim(self, now: datetime, lease_until: datetime) -> Optional[Dict[str, Any]]:
+        due = [self.docs[job_id] for job_id in self.unfinished if self.docs[job_id]["due_at"] <= now]
+        if not due:
+            return None
+        job = min(due, key=lambda job: job["due_at"])
+        job.update(status="running", due_at=lease_until, attempts=job["attempts"] + 1, updated_at=now)
+        return copy.deepcopy(job)
+
+    async def finish(self, job_id: str, attempts: int, update: Dict[str, Any]) -> bool:
+        job = self.docs.get(job_id)
+        if not job or job["status"] != "running" or job["attempts"] != attempts:
+            return False
+        job.update(copy.deepcopy(update))
+        if job["status"] not in ("queued", "running"):
+            self.unfinished.discard(job_id)
+            self.expiring.append((job["expires_at"], job_id))
+        return True
+
+
+class MemoryStorage(Storage):
+    """Storage in the memory of this process.
+
+    Nothing is persisted and every worker has its own data, so this backend
+    suits tests, demos and single-worker benchmarks that should not depend
+    on a MongoDB server. Lookups use dict and sorted-list indexes, and each
+    call completes without yielding to the event loop, so no call observes
+    another's partial writes.
+    """
+
+    def __init__(self, severities: List[str], history_size: int, alerts_size: int, archive_ttl_days: float = 365):
+        self.severities = severities
+        self.history_size = history_size
+        self.alerts_size = alerts_size
+        self.archive_ttl_days = archive_ttl_days
+        self.villages = MemoryVillageRepository(self)
+        self.alerts = MemoryAlertRepository(self)
+        self.readings = MemoryReadingRepository(self)
+        self.jobs = MemoryJobRepository()
+        self.stats: Optional[Dict[str, Any]] = None
+        self.versions: Dict[str, int] = {}
+        self.markers: Dict[str, datetime] = {}
+        self.sync_positions: Dict[str, int] = {}
+
+    def highest(self, counts: Dict[str, int]) -> Optional[str]:
+        return next((severity for severity in reversed(self.severities) if counts.get(severity, 0) > 0), None)
+
+    async def prepare(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def clear(self):
+        self.villages = MemoryVillageRepository(self)
+        self.alerts = MemoryAlertRepository(self)
+        self.readings = MemoryReadingRepository(self)
+        self.stats = None
+
+    async def has_marker(self, name: str) -> bool:
+        return name in self.markers
+
+    async def set_marker(self, name: str, now: datetime):
+        self.markers.setdefault(name, now)
+
+    async def get_stats(self) -> Optional[Dict[str, Any]]:
+        return None if self.stats is None else dict(self.stats)
+
+    async def replace_stats(self, stats: Dict[str, Any]):
+        self.stats = dict(stats)
+
+    async def update_stats(self, totals: Dict[str, Any], deltas: Dict[str, int]):
+        if self.stats is None:
+            return
+        self.stats.update(totals)
+        for field, delta in deltas.items():
+            self.stats[field] = self.stats.get(field, 0) + delta
+
+    async def read_versions(self, names: List[str]) -> Dict[str, int]:
+        return {name: self.versions[name] for name in names if name in self.versions}
+
+    async def bump_version(self, name: str) -> int:
+        self.versions[name] = self.versions.get(name, 0) + 1
+        return self.versions[name]
+
+    async def get_sync_position(self, edge_id: str) -> int:
+        return self.sync_positions.get(edge_id, 0)
+
+    async def set_sync_position(self, edge_id: str, seq: int):
+        self.sync_positions[edge_id] = max(seq, self.sync_positions.get(edge_id, 0))
+
+    def pool_options(self) -> Optional[Dict[str, Any]]:
+        return None
@@ -0,0 +1,174 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Route template of the request being handled, e.g. /api/villages/{village_id}
+current_route: ContextVar[str] = ContextVar("current_route", default="unmatched")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, until the last body chunk is sent",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests currently being handled",
+    ["method", "route"], multiprocess_mode="livesum"
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of response bodies",
+    ["method", "route"], buckets=[2 ** exponent for exponent in range(8, 26, 2)]
+)
+SERIALIZATION_TIME = Histogram(
+    "http_response_serialization_seconds", "Time to encode a response body",
+    ["route"], buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "Round trip time of MongoDB commands",
+    ["collection", "command"], buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error",
+    ["collection", "command"]
+)
+
+
+def timed_encode(encode: Callable[[Any], bytes], payload: Any) -> bytes:
+    """Encode a response payload, recording the time against the current route"""
+    start = time.perf_counter()
+    body = encode(payload)
+    SERIALIZATION_TIME.labels(current_route.get()).observe(time.perf_counter() - start)
+    return body
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """pymongo command listener timing every command by collection and name"""
+
+    # Handshake and session housekeeping commands are not worth a series each
+    IGNORED = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue", "buildInfo"}
+
+    def __init__(self):
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+            MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+
+class StatsCollector:
+    """Expose the pool and cache counters kept by other modules at scrape time"""
+
+    def __init__(self, pool_metrics, cache):
+        self.pool_metrics = pool_metrics
+        self.cache = cache
+
+    def collect(self):
+        pool = self.pool_metrics.stats()
+        yield CounterMetricFamily("mongodb_pool_checkouts", "Connections checked out of the pool", value=pool["checkouts"])
+        yield GaugeMetricFamily("mongodb_pool_checked_out", "Connections currently checked out", value=pool["checked_out"])
+        yield GaugeMetricFamily("mongodb_pool_open_connections", "Open pool connections", value=pool["open_connections"])
+        yield CounterMetricFamily("mongodb_pool_checkout_wait_seconds", "Total time spent waiting for a connection", value=pool["wait_seconds_total"])
+        failures = CounterMetricFamily("mongodb_pool_checkout_failures", "Failed connection checkouts", labels=["reason"])
+        for reason, count in pool["checkout_failures"].items():
+            failures.add_metric([reason], count)
+        yield failures
+
+        cache = self.cache.stats()
+        yield CounterMetricFamily("response_cache_hits", "Read-through cache hits", value=cache.get("hits", 0))
+        yield CounterMetricFamily("response_cache_misses", "Read-through cache misses", value=cache.get("misses", 0))
+
+
+def route_template(app, scope) -> str:
+    """The path template of the route a request will be dispatched to"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and response sizes per route.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streamed
+    exports and the alert stream pass through without being buffered.
+    Requests are labelled with the route template to keep the number of
+    series bounded.
+    """
+
+    def __init__(self, app, fastapi_app, skip_paths=("/metrics",)):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.fastapi_app, scope)
+        token = current_route.set(route)
+        status = "500"
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(method, route, status).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(method, route).observe(size)
+            in_progress.dec()
+            current_route.reset(token)
+
+
+class MetricsExporter:
+    """Render the metrics in the Prometheus text format.
+
+    With PROMETHEUS_MULTIPROC_DIR set (required when uvicorn runs several
+    workers) the request and command metrics of all workers are merged,
+    while the pool and cache counters are those of the worker answering.
+    """
+
+    def __init__(self, collector: StatsCollector):
+        self.collector = collector
+        self.multiprocess = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+        if not self.multiprocess:
+            REGISTRY.register(collector)
+
+    def render(self) -> Tuple[bytes, str]:
+        if self.multiprocess:
+            registry = CollectorRegistry()
+            MultiProcessCollector(registry)
+            registry.register(self.collector)
+            return generate_latest(registry), CONTENT_TYPE_LATEST
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
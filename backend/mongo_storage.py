@@ -0,0 +1,563 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, DESCENDING, GEO2D, GEOSPHERE, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+from export import ExportSpec, resume_filter
+from geo import BBox, cluster_pipeline, point, point_expression, within_bbox
+from storage import AlertRepository, JobRepository, ReadingRepository, Storage, TimeRange, VillageQuery, VillageRepository
+from timeseries import aggregation_pipeline
+
+DASHBOARD_STATS_ID = "dashboard"
+
+ALERT_PROJECTION = {"_id": 0, "effects_pending": 0}
+READING_PROJECTION = {"_id": 0, "village_id": 0, "ts": 0}
+# What the map needs to draw and label a village marker
+MARKER_PROJECTION = {"_id": 0, "id": 1, "name": 1, "district": 1, "state": 1, "crop": 1, "coords": 1, "severity_summary.highest": 1}
+
+
+def collection_indexes(archive_ttl_days: float) -> Dict[str, List[IndexModel]]:
+    """The indexes of each collection.
+
+    Every query issued by the API routes must be served by one of these
+    indexes; tests/test_query_plans.py checks this with explain() against a
+    local mongod.
+    """
+    return {
+        "villages": [
+            IndexModel([("id", ASCENDING)], unique=True),
+            IndexModel([("state", ASCENDING), ("district", ASCENDING), ("id", ASCENDING)]),
+            IndexModel([("district", ASCENDING), ("id", ASCENDING)]),
+            IndexModel([("crop", ASCENDING), ("id", ASCENDING)]),
+            IndexModel([("severity_summary.highest", ASCENDING), ("id", ASCENDING)]),
+            IndexModel([("location", GEOSPHERE)]),
+            # Flat [latitude, longitude] pairs for bounding boxes; the upper
+            # bound is exclusive, so it is raised to let longitude 180 in
+            IndexModel([("coords", GEO2D)], min=-180, max=181),
+        ],
+        "alerts": [
+            IndexModel([("id", ASCENDING)], unique=True),
+            # id breaks timestamp ties so exports can resume from (timestamp, id)
+            IndexModel([("village_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+            IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+            IndexModel(
+                [("is_active", ASCENDING), ("severity", ASCENDING)],
+                partialFilterExpression={"is_active": True}
+            ),
+            IndexModel([("dismissed_at", ASCENDING)], partialFilterExpression={"is_active": False}),
+        ],
+        "alerts_archive": [
+            IndexModel([("id", ASCENDING)], unique=True),
+            IndexModel([("village_id", ASCENDING), ("timestamp", DESCENDING)]),
+            *(
+                [IndexModel([("archived_at", ASCENDING)], expireAfterSeconds=int(archive_ttl_days * 86400))]
+                if archive_ttl_days > 0 else []
+            ),
+        ],
+        "readings": [
+            IndexModel([("village_id", ASCENDING), ("ts", ASCENDING)]),
+        ],
+        "jobs": [
+            IndexModel([("id", ASCENDING)], unique=True),
+            IndexModel([("status", ASCENDING), ("due_at", ASCENDING)]),
+            # Finished jobs are deleted once their expires_at has passed
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ],
+    }
+
+
+def village_filter(query: VillageQuery) -> Dict[str, Any]:
+    filter_query: Dict[str, Any] = {}
+    if query.ids is not None:
+        filter_query["id"] = {"$in": query.ids}
+    if query.after:
+        filter_query.setdefault("id", {})["$gt"] = query.after
+    for field in ("state", "district", "crop"):
+        if getattr(query, field):
+            filter_query[field] = getattr(query, field)
+    if query.severity:
+        filter_query["severity_summary.highest"] = query.severity
+    return filter_query
+
+
+def time_filter(time_range: TimeRange) -> Dict[str, datetime]:
+    since, until = time_range
+    condition = {}
+    if since:
+        condition["$gte"] = since
+    if until:
+        condition["$lt"] = until
+    return condition
+
+
+def highest_severity_expression(severities: List[str]) -> Dict[str, Any]:
+    """Aggregation expression selecting the highest severity with active alerts"""
+    return {"$switch": {
+        "branches": [
+            {"case": {"$gt": [{"$ifNull": [f"$severity_summary.counts.{severity}", 0]}, 0]}, "then": severity}
+            for severity in reversed(severities)
+        ],
+        "default": None
+    }}
+
+
+class MotorRepository:
+    """Shared by the repositories of one collection"""
+
+    def __init__(self, storage: "MotorStorage", name: str):
+        self.storage = storage
+        self.name = name
+
+    @property
+    def collection(self):
+        return self.storage.db[self.name]
+
+    async def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+                     after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        conditions: List[Dict[str, Any]] = []
+        if village_ids:
+            conditions.append({spec.village_field: {"$in": village_ids}})
+        if time_filter(time_range):
+            conditions.append({spec.time_field: time_filter(time_range)})
+        if after is not None:
+            conditions.append(resume_filter(spec, after))
+        filter_query = conditions[0] if len(conditions) == 1 else {"$and": conditions} if conditions else {}
+
+        # Exports tolerate replication lag, so they may read from a secondary
+        cursor = self.storage.replica_db[self.name].find(filter_query, spec.projection).sort(
+            [(field, 1) for field, _ in spec.sort]
+        ).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+
+
+class MotorVillageRepository(MotorRepository, VillageRepository):
+
+    def projection(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        # Only the most recent readings and alert messages are returned, even
+        # for documents written before they were capped. The GeoJSON location
+        # only backs the map queries; clients use coords.
+        slices = {
+            "history": {"$slice": -self.storage.history_size},
+            "alerts": {"$slice": -self.storage.alerts_size}
+        }
+        if fields is None:
+            return {"_id": 0, "location": 0, **slices}
+        projection: Dict[str, Any] = {"_id": 0, "id": 1}
+        for name in fields:
+            projection[name] = slices.get(name, 1)
+        return projection
+
+    async def count(self) -> int:
+        return await self.collection.estimated_document_count()
+
+    async def count_with_highest(self, severity: str) -> int:
+        return await self.collection.count_documents({"severity_summary.highest": severity})
+
+    async def find(self, query: VillageQuery, fields: Optional[Iterable[str]] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        cursor = self.collection.find(village_filter(query), self.projection(fields)).sort("id", ASCENDING)
+        return await cursor.limit(limit).to_list(limit or None)
+
+    async def get(self, village_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": village_id}, self.projection())
+
+    async def insert_many(self, villages: List[Dict[str, Any]]):
+        await self.collection.insert_many([{**village, "location": point(village["coords"])} for village in villages])
+
+    async def insert_missing(self, villages: List[Dict[str, Any]]) -> List[int]:
+        try:
+            result = await self.collection.bulk_write([
+                UpdateOne({"id": village["id"]}, {"$setOnInsert": {**village, "location": point(village["coords"])}}, upsert=True)
+                for village in villages
+            ], ordered=False)
+            return list(result.upserted_ids)
+        except BulkWriteError as e:
+            # Another worker inserted the same village between our upserts
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            return [upsert["index"] for upsert in e.details.get("upserted", [])]
+
+    def history_push(self, readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Keep the embedded summary bounded to the most recent readings
+        size = self.storage.history_size
+        return {"history": {"$each": readings[-size:], "$sort": {"timestamp": 1}, "$slice": -size}}
+
+    async def push_reading(self, village_id: str, reading: Dict[str, Any], now: datetime,
+                           fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one_and_update(
+            {"id": village_id},
+            {"$push": self.history_push([reading]), "$set": {"last_updated": now}},
+            projection={"_id": 0, "id": 1, **{name: 1 for name in fields}}
+        )
+
+    async def push_readings(self, readings: Dict[str, List[Dict[str, Any]]], now: datetime):
+        updates = [
+            UpdateOne({"id": village_id}, {"$push": self.history_push(village_readings), "$set": {"last_updated": now}})
+            for village_id, village_readings in readings.items()
+        ]
+        for start in range(0, len(updates), self.storage.chunk_size):
+            await self.collection.bulk_write(updates[start:start + self.storage.chunk_size], ordered=False)
+
+    def new_alerts_update(self, messages: List[str], counts: Dict[str, int], now: datetime) -> List[Dict[str, Any]]:
+        """Pipeline update appending alert messages to a village and counting them in its severity summary"""
+        added = {
+            f"severity_summary.counts.{severity}": {"$add": [{"$ifNull": [f"$severity_summary.counts.{severity}", 0]}, count]}
+            for severity, count in counts.items()
+        }
+        return [
+            {"$set": {
+                # $literal keeps messages starting with "$" from being read as field paths
+                "alerts": {"$slice": [
+                    {"$concatArrays": [{"$ifNull": ["$alerts", []]}, {"$literal": messages}]},
+                    -self.storage.alerts_size
+                ]},
+                "last_updated": now,
+                **added
+            }},
+            {"$set": {"severity_summary.highest": highest_severity_expression(self.storage.severities)}}
+        ]
+
+    async def add_alerts(self, messages: Dict[str, List[str]], counts: Dict[str, Dict[str, int]], now: datetime):
+        await self.collection.bulk_write([
+            UpdateOne({"id": village_id}, self.new_alerts_update(texts, counts[village_id], now))
+            for village_id, texts in messages.items()
+        ], ordered=False)
+
+    async def adjust_severity(self, village_id: str, severity: str, delta: int) -> Optional[Dict[str, Any]]:
+        count_path = f"severity_summary.counts.{severity}"
+        previous = await self.collection.find_one_and_update(
+            {"id": village_id},
+            [
+                {"$set": {count_path: {"$max": [0, {"$add": [{"$ifNull": [f"${count_path}", 0]}, delta]}]}}},
+                {"$set": {"severity_summary.highest": highest_severity_expression(self.storage.severities)}}
+            ],
+            projection={"_id": 0, "severity_summary": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        return None if previous is None else previous.get("severity_summary", {})
+
+    async def replace_severity_summaries(self, summaries: Dict[str, Dict[str, Any]], empty: Dict[str, Any]):
+        # Reset villages whose alerts have all cleared, then apply the recomputed counts
+        await self.collection.update_many(
+            {"severity_summary.highest": {"$ne": None}, "id": {"$nin": list(summaries)}},
+            {"$set": {"severity_summary": empty}}
+        )
+        updates = [
+            UpdateOne({"id": village_id}, {"$set": {"severity_summary": summary}})
+            for village_id, summary in summaries.items()
+        ]
+        for start in range(0, len(updates), self.storage.chunk_size):
+            await self.collection.bulk_write(updates[start:start + self.storage.chunk_size], ordered=False)
+
+    async def markers_in_bbox(self, bbox: BBox, query: VillageQuery, limit: int) -> List[Dict[str, Any]]:
+        filter_query = {**within_bbox(bbox), **village_filter(query)}
+        return await self.collection.find(filter_query, MARKER_PROJECTION).limit(limit).to_list(limit)
+
+    async def markers_near(self, latitude: float, longitude: float, radius_km: float,
+                           query: VillageQuery, limit: int) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$geoNear": {
+                "near": point([latitude, longitude]),
+                "key": "location",
+                "distanceField": "distance_km",
+                "distanceMultiplier": 0.001,
+                "maxDistance": radius_km * 1000,
+                "query": village_filter(query),
+                "spherical": True
+            }},
+            {"$limit": limit},
+            {"$project": {**MARKER_PROJECTION, "distance_km": 1}}
+        ]
+        return await self.collection.aggregate(pipeline).to_list(limit)
+
+    async def clusters(self, bbox: BBox, zoom: int, query: VillageQuery) -> List[Dict[str, Any]]:
+        pipeline = cluster_pipeline(bbox, zoom, self.storage.severities, village_filter(query))
+        return await self.collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+
+class MotorAlertRepository(MotorRepository, AlertRepository):
+
+    async def insert_many(self, alerts: List[Dict[str, Any]]):
+        # The flag is unset once applied, so alerts stored before it existed count as applied
+        await self.collection.insert_many([{**alert, "effects_pending": True} for alert in alerts])
+
+    async def find(self, active_only: bool, limit: int) -> List[Dict[str, Any]]:
+        filter_query = {"is_active": True} if active_only else {}
+        return await self.collection.find(filter_query, ALERT_PROJECTION).sort("timestamp", -1).limit(limit).to_list(limit)
+
+    async def for_village(self, village_id: str, limit: int) -> List[Dict[str, Any]]:
+        cursor = self.collection.find({"village_id": village_id}, ALERT_PROJECTION).sort("timestamp", -1)
+        return await cursor.limit(limit).to_list(limit)
+
+    async def find_recent(self, village_ids: List[str], alert_types: List[str], since: datetime) -> List[Dict[str, Any]]:
+        filter_query = {
+            "village_id": {"$in": village_ids},
+            "alert_type": {"$in": alert_types},
+            "$or": [{"is_active": True}, {"timestamp": {"$gte": since}}]
+        }
+        return await self.collection.find(filter_query, {"_id": 0, "village_id": 1, "alert_type": 1, "severity": 1}).to_list(None)
+
+    async def exists(self, alert_id: str) -> bool:
+        return await self.collection.find_one({"id": alert_id}, {"_id": 1}) is not None
+
+    async def existing_ids(self, alert_ids: List[str]) -> Set[str]:
+        found = await self.collection.find({"id": {"$in": alert_ids}}, {"_id": 0, "id": 1}).to_list(None)
+        return {alert["id"] for alert in found}
+
+    async def pending_effects(self, alert_ids: List[str]) -> Set[str]:
+        found = await self.collection.find(
+            {"id": {"$in": alert_ids}, "effects_pending": True}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        return {alert["id"] for alert in found}
+
+    async def effects_applied(self, alert_ids: List[str]):
+        await self.collection.update_many({"id": {"$in": alert_ids}}, {"$unset": {"effects_pending": ""}})
+
+    async def deactivate(self, alert_id: str, now: datetime) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one_and_update(
+            {"id": alert_id, "is_active": True},
+            {"$set": {"is_active": False, "dismissed_at": now}},
+            projection={"_id": 0, "severity": 1, "village_id": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+
+    async def active_before(self, before: datetime, limit: int) -> List[str]:
+        stale = await self.collection.find(
+            {"is_active": True, "timestamp": {"$lt": before}}, {"_id": 0, "id": 1}
+        ).to_list(limit)
+        return [alert["id"] for alert in stale]
+
+    async def archive_dismissed(self, before: datetime, now: datetime, batch_size: int) -> Tuple[int, Set[str]]:
+        # Alerts are copied before they are deleted and the archive has a
+        # unique index on id, so an interrupted run is simply repeated by the next one
+        archived = 0
+        village_ids: Set[str] = set()
+        archive = self.storage.db.alerts_archive
+        while True:
+            batch = await self.collection.find(
+                {"is_active": False, "dismissed_at": {"$lt": before}}, ALERT_PROJECTION
+            ).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            try:
+                await archive.insert_many([{**alert, "archived_at": now} for alert in batch], ordered=False)
+            except BulkWriteError as e:
+                # Alerts copied by an earlier, interrupted run are already archived
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            result = await self.collection.delete_many({"id": {"$in": [alert["id"] for alert in batch]}, "is_active": False})
+            archived += result.deleted_count
+            village_ids.update(alert["village_id"] for alert in batch)
+            if len(batch) < batch_size:
+                break
+        return archived, village_ids
+
+    async def count_active(self, severity: Optional[str] = None) -> int:
+        filter_query = {"is_active": True, **({"severity": severity} if severity else {})}
+        return await self.collection.count_documents(filter_query)
+
+    async def active_counts(self) -> Dict[str, Dict[str, int]]:
+        counts: Dict[str, Dict[str, int]] = {}
+        pipeline = [
+            {"$match": {"is_active": True}},
+            {"$group": {"_id": {"village_id": "$village_id", "severity": "$severity"}, "count": {"$sum": 1}}}
+        ]
+        async for row in self.collection.aggregate(pipeline):
+            counts.setdefault(row["_id"]["village_id"], {})[row["_id"]["severity"]] = row["count"]
+        return counts
+
+
+class MotorReadingRepository(MotorRepository, ReadingRepository):
+
+    async def insert_one(self, reading: Dict[str, Any]):
+        await self.collection.insert_one(reading)
+
+    async def insert_many(self, readings: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+        try:
+            await self.collection.insert_many(readings, ordered=False)
+        except BulkWriteError as e:
+            return [(error["index"], error.get("errmsg", "Write failed")) for error in e.details.get("writeErrors", [])]
+        return []
+
+    async def existing_keys(self, keys: List[Tuple[str, datetime]]) -> Set[Tuple[str, datetime]]:
+        filter_query = {
+            "village_id": {"$in": list({village_id for village_id, _ in keys})},
+            "ts": {"$in": list({ts for _, ts in keys})}
+        }
+        found = await self.collection.find(filter_query, {"_id": 0, "village_id": 1, "ts": 1}).to_list(None)
+        # BSON dates keep milliseconds and come back naive; the village and
+        # time lists also match pairs that were not asked for
+        def millis(ts: datetime) -> datetime:
+            return ts.replace(microsecond=ts.microsecond // 1000 * 1000, tzinfo=timezone.utc)
+        stored = {(reading["village_id"], millis(reading["ts"])) for reading in found}
+        return {(village_id, ts) for village_id, ts in keys if (village_id, millis(ts)) in stored}
+
+    async def find(self, village_id: str, time_range: TimeRange, limit: int) -> List[Dict[str, Any]]:
+        filter_query: Dict[str, Any] = {"village_id": village_id}
+        if time_filter(time_range):
+            filter_query["ts"] = time_filter(time_range)
+        return await self.collection.find(filter_query, READING_PROJECTION).sort("ts", 1).to_list(limit)
+
+    async def aggregate(self, village_id: str, time_range: TimeRange, bucket: str, metrics: List[str]) -> List[Dict[str, Any]]:
+        pipeline = aggregation_pipeline(village_id, time_filter(time_range), bucket, metrics)
+        return await self.collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+
+class MotorJobRepository(MotorRepository, JobRepository):
+
+    async def insert(self, job: Dict[str, Any]):
+        await self.collection.insert_one(dict(job))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def claim(self, now: datetime, lease_until: datetime) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "due_at": {"$lte": now}},
+            {"$set": {"status": "running", "due_at": lease_until, "updated_at": now}, "$inc": {"attempts": 1}},
+            projection={"_id": 0},
+            sort=[("due_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def finish(self, job_id: str, attempts: int, update: Dict[str, Any]) -> bool:
+        result = await self.collection.update_one(
+            {"id": job_id, "status": "running", "attempts": attempts}, {"$set": update}
+        )
+        return result.modified_count == 1
+
+
+class MotorStorage(Storage):
+    """Storage in MongoDB through Motor.
+
+    Readings live in a time-series collection, villages carry a GeoJSON
+    location for the map queries, and the dashboard statistics, change
+    counters and markers are small documents in their own collections.
+    """
+
+    def __init__(self, db, severities: List[str], history_size: int, alerts_size: int, chunk_size: int = 1000,
+                 archive_ttl_days: float = 365, read_preference=None):
+        self.db = db
+        self.severities = severities
+        self.history_size = history_size
+        self.alerts_size = alerts_size
+        self.chunk_size = chunk_size
+        self.indexes = collection_indexes(archive_ttl_days)
+        self.read_preference = read_preference
+        self._replica_db = None
+        self.villages = MotorVillageRepository(self, "villages")
+        self.alerts = MotorAlertRepository(self, "alerts")
+        self.readings = MotorReadingRepository(self, "readings")
+        self.jobs = MotorJobRepository(self, "jobs")
+
+    @property
+    def replica_db(self):
+        """The database as read by exports, which tolerate replication lag.
+
+        Routes that fill the response cache or answer conditional GETs keep
+        reading from the primary: a lagging secondary would otherwise have its
+        stale data cached, or sent under the ETag of a newer version.
+        """
+        if self.read_preference is None:
+            return self.db
+        if self._replica_db is None:
+            self._replica_db = self.db.with_options(read_preference=self.read_preference)
+        return self._replica_db
+
+    async def prepare(self):
+        await self.ensure_collections()
+        await self.ensure_village_locations()
+        await self.ensure_alert_dismissal_times()
+        await self.ensure_indexes()
+
+    async def ensure_collections(self):
+        """Create the readings time-series collection if it does not exist yet"""
+        try:
+            await self.db.create_collection(
+                "readings",
+                timeseries={"timeField": "ts", "metaField": "village_id", "granularity": "hours"},
+            )
+            logging.info("Created readings time-series collection")
+        except CollectionInvalid:
+            pass
+
+    async def ensure_village_locations(self):
+        """Add the GeoJSON location to villages stored before it was introduced"""
+        result = await self.db.villages.update_many(
+            {
+                "location": {"$exists": False},
+                "coords.0": {"$gte": -90, "$lte": 90},
+                "coords.1": {"$gte": -180, "$lte": 180}
+            },
+            [{"$set": {"location": point_expression()}}]
+        )
+        if result.modified_count:
+            logging.info(f"Added locations to {result.modified_count} villages")
+
+    async def ensure_alert_dismissal_times(self):
+        """Give alerts dismissed before dismissed_at was recorded their alert time instead"""
+        await self.db.alerts.update_many(
+            {"is_active": False, "dismissed_at": {"$exists": False}},
+            [{"$set": {"dismissed_at": "$timestamp"}}]
+        )
+
+    async def ensure_indexes(self):
+        """Create the indexes used by the API routes"""
+        for collection, indexes in self.indexes.items():
+            names = await self.db[collection].create_indexes(indexes)
+            logging.info(f"Ensured indexes on {collection}: {', '.join(names)}")
+
+    async def close(self):
+        self.db.client.close()
+
+    async def clear(self):
+        for name in ("villages", "readings", "alerts", "alerts_archive", "stats"):
+            await self.db[name].drop()
+        await self.prepare()
+
+    async def has_marker(self, name: str) -> bool:
+        return await self.db.meta.find_one({"_id": name}, {"_id": 1}) is not None
+
+    async def set_marker(self, name: str, now: datetime):
+        await self.db.meta.update_one({"_id": name}, {"$setOnInsert": {"created_at": now}}, upsert=True)
+
+    async def get_stats(self) -> Optional[Dict[str, Any]]:
+        return await self.db.stats.find_one({"_id": DASHBOARD_STATS_ID}, {"_id": 0})
+
+    async def replace_stats(self, stats: Dict[str, Any]):
+        await self.db.stats.replace_one({"_id": DASHBOARD_STATS_ID}, stats, upsert=True)
+
+    async def update_stats(self, totals: Dict[str, Any], deltas: Dict[str, int]):
+        update: Dict[str, Any] = {"$set": totals}
+        if deltas:
+            update["$inc"] = deltas
+        # Without upsert a missing document stays missing and is rebuilt on read
+        await self.db.stats.update_one({"_id": DASHBOARD_STATS_ID}, update)
+
+    async def read_versions(self, names: List[str]) -> Dict[str, int]:
+        return {doc["_id"]: doc["v"] async for doc in self.db.versions.find({"_id": {"$in": names}})}
+
+    async def bump_version(self, name: str) -> int:
+        doc = await self.db.versions.find_one_and_update(
+            {"_id": name}, {"$inc": {"v": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return doc["v"]
+
+    async def get_sync_position(self, edge_id: str) -> int:
+        doc = await self.db.sync.find_one({"_id": edge_id})
+        return doc["seq"] if doc else 0
+
+    async def set_sync_position(self, edge_id: str, seq: int):
+        await self.db.sync.update_one({"_id": edge_id}, {"$max": {"seq": seq}}, upsert=True)
+
+    def pool_options(self) -> Optional[Dict[str, Any]]:
+        options = self.db.client.options.pool_options
+        return {
+            "max_pool_size": options.max_pool_size,
+            "min_pool_size": options.min_pool_size,
+            "max_idle_time_seconds": options.max_idle_time_seconds,
+            "max_connecting": options.max_connecting,
+            "wait_queue_timeout_seconds": options.wait_queue_timeout
+        }
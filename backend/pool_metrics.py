@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener recording how long requests wait for a connection.
+
+    Motor runs pymongo operations on executor threads and the checkout
+    events of one operation are published on the thread performing it, so
+    the start time is kept per thread. Long waits mean the pool is too small
+    for the load (or connections are being created under it).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.checked_out = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pools_cleared = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        wait = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            for index, bound in enumerate(WAIT_BUCKETS):
+                if wait <= bound:
+                    self.wait_buckets[index] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    # Events this listener does not record
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "checked_out": self.checked_out,
+                "open_connections": self.connections_created - self.connections_closed,
+                "connections_created": self.connections_created,
+                "pools_cleared": self.pools_cleared,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_mean": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                # Cumulative counts of checkouts that waited at most each bound
+                "wait_histogram": {str(bound): count for bound, count in zip(WAIT_BUCKETS, self.wait_buckets)}
+            }
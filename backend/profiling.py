@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (file, line, function) of one stack frame
+Frame = Tuple[str, int, str]
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (code.co_filename, frame.f_lineno, code.co_name)
+
+
+def _thread_stack(frame) -> List[Frame]:
+    """Frames of a thread, outermost first"""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_chain(coro) -> List[Frame]:
+    """Frames of a suspended coroutine and everything it awaits, outermost first"""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_key(frame))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if awaited is not None and not hasattr(awaited, "cr_frame") and not hasattr(awaited, "gi_frame"):
+            # A future, e.g. a Motor operation running on an executor thread
+            stack.append(("<await>", 0, "<waiting>"))
+            break
+        coro = awaited
+    return stack
+
+
+class StackSampler(threading.Thread):
+    """Sample the wall-clock stack of one asyncio task from a background thread.
+
+    While the task runs, the event loop thread's stack is recorded. While it
+    is suspended, the chain of coroutines it is awaiting is recorded
+    instead, ending in the future it waits on, so time spent waiting for
+    MongoDB shows up next to time spent building and encoding responses.
+
+    Each sample is weighted by the wall time since the previous one, since
+    the sampler cannot run while the loop thread holds the GIL for longer
+    than the sampling interval.
+    """
+
+    def __init__(self, task: asyncio.Task, thread_id: int, interval: float):
+        super().__init__(daemon=True, name="request-profiler")
+        self.task = task
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()  # stack -> seconds
+        self._stopped = threading.Event()
+
+    def run(self):
+        previous = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, previous = now - previous, now
+            coro = self.task.get_coro()
+            if getattr(coro, "cr_running", False):
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is None:
+                    continue
+                stack = _thread_stack(frame)
+            else:
+                stack = _await_chain(coro)
+            if stack:
+                self.samples[tuple(stack)] += elapsed
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _label(frame: Frame) -> str:
+    filename, line, name = frame
+    return f"{name} ({Path(filename).name}:{line})" if line else name
+
+
+def collapsed_stacks(samples: Counter) -> str:
+    """Brendan Gregg's collapsed stack format, as read by flamegraph.pl and speedscope, in microseconds"""
+    lines = [
+        ";".join(_label(frame).replace(";", ":") for frame in stack) + f" {round(seconds * 1e6)}"
+        for stack, seconds in samples.items()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(samples: Counter, name: str) -> Dict:
+    """A sampled profile in the speedscope file format"""
+    frames: List[Dict] = []
+    index: Dict[Frame, int] = {}
+    stacks, weights = [], []
+    for stack, seconds in samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                filename, line, function = frame
+                frames.append({"name": function, "file": filename, "line": line} if line else {"name": function})
+            ids.append(index[frame])
+        stacks.append(ids)
+        weights.append(seconds * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights
+        }],
+        "name": name,
+        "exporter": "digital-sarpanch"
+    }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled requests into files under ``directory``.
+
+    A request is profiled when it carries the ``header`` with the configured
+    token, or with probability ``sample_rate``. At most one request per
+    worker is profiled at a time. The profile id is returned in the
+    X-Profile-Id response header and names the written file. The middleware
+    is only installed when profiling is configured, so it costs nothing
+    otherwise.
+    """
+
+    def __init__(self, app, directory: str, sample_rate: float = 0.0, header: str = "x-profile",
+                 token: Optional[str] = None, interval: float = 0.001, fmt: str = "speedscope"):
+        if fmt not in ("speedscope", "collapsed"):
+            raise ValueError(f"Unsupported profile format: {fmt}")
+        self.app = app
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.token = token.encode() if token else None
+        self.interval = interval
+        self.fmt = fmt
+        self._busy = False
+
+    def _requested(self, scope) -> bool:
+        if self.token is None:
+            return False
+        return any(name == self.header and value == self.token for name, value in scope["headers"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy or not (
+            self._requested(scope) or (self.sample_rate and random.random() < self.sample_rate)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        sampler = StackSampler(asyncio.current_task(), threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            name = f"{scope['method']} {scope['path']} ({elapsed_ms:.1f} ms)"
+            try:
+                # Joining the sampler and writing the file would block every other request
+                await asyncio.get_running_loop().run_in_executor(None, self._finish, sampler, profile_id, scope, name)
+            finally:
+                self._busy = False
+
+    def _finish(self, sampler: StackSampler, profile_id: str, scope, name: str):
+        sampler.stop()
+        try:
+            self._write(profile_id, scope, name, sampler.samples)
+        except OSError:
+            logger.exception("Could not write request profile")
+
+    def _write(self, profile_id: str, scope, name: str, samples: Counter):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")[:60]
+        stem = f"{profile_id}-{scope['method']}-{slug}"
+        if self.fmt == "collapsed":
+            path = self.directory / f"{stem}.collapsed.txt"
+            path.write_text(collapsed_stacks(samples))
+        else:
+            path = self.directory / f"{stem}.speedscope.json"
+            path.write_text(json.dumps(speedscope_profile(samples, name)))
+        logger.info(f"Wrote profile of {name} to {path}")
+
+
+def profiling_settings() -> Optional[Dict]:
+    """ProfilingMiddleware options from the environment, or None when profiling is off"""
+    directory = os.environ.get("PROFILE_DIR")
+    if not directory:
+        return None
+    return {
+        "directory": directory,
+        "sample_rate": float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+        "header": os.environ.get("PROFILE_HEADER", "X-Profile"),
+        "token": os.environ.get("PROFILE_TOKEN") or None,
+        "interval": float(os.environ.get("PROFILE_INTERVAL_MS", "1")) / 1000,
+        "fmt": os.environ.get("PROFILE_FORMAT", "speedscope"),
+    }
@@ -0,0 +1,158 @@
+import operator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+COMPARISONS = {"<": operator.lt, ">": operator.gt}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Raise an alert when a sensor metric crosses a threshold.
+
+    ``crops`` and ``soil_types`` restrict the rule to villages growing one of
+    those crops or on one of those soils; a village matches when any word of
+    its crop (e.g. "coconut+paddy") or soil type (e.g. "sandy loam") is listed.
+    """
+    alert_type: str
+    metric: str
+    op: str
+    threshold: float
+    severity: str
+    message: str
+    crops: Optional[FrozenSet[str]] = None
+    soil_types: Optional[FrozenSet[str]] = None
+
+    def applies_to(self, village: Dict[str, Any]) -> bool:
+        if self.crops is not None and not self.crops & _words(village.get("crop")):
+            return False
+        if self.soil_types is not None and not self.soil_types & _words(village.get("soil_type")):
+            return False
+        return True
+
+
+def _words(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset((value or "").lower().replace("+", " ").split())
+
+
+WATER_HUNGRY_CROPS = frozenset({"paddy", "rice", "sugarcane"})
+POORLY_DRAINED_SOILS = frozenset({"clayey", "clay", "black"})
+
+DEFAULT_RULES = [
+    Rule("drought", "soil_moisture", "<", 15, "critical",
+         "CRITICAL: Drought conditions in {village}. Soil moisture at {value:.1f}%. Immediate irrigation required."),
+    Rule("drought", "soil_moisture", "<", 20, "high",
+         "DROUGHT ALERT: Low soil moisture ({value:.1f}%) in {village}. Irrigation recommended."),
+    Rule("drought", "soil_moisture", "<", 30, "high",
+         "DROUGHT ALERT: Soil moisture at {value:.1f}% is too low for {crop} in {village}. Irrigation recommended.",
+         crops=WATER_HUNGRY_CROPS),
+    Rule("flood", "soil_moisture", ">", 50, "medium",
+         "WATERLOGGING: Soil moisture at {value:.1f}% in {village}. Check field drainage."),
+    Rule("flood", "soil_moisture", ">", 40, "high",
+         "WATERLOGGING: Soil moisture at {value:.1f}% on poorly drained {soil} soil in {village}. Clear drainage channels.",
+         soil_types=POORLY_DRAINED_SOILS),
+    Rule("heat", "temperature", ">", 40, "high",
+         "HEAT STRESS: Temperature at {value:.1f}°C in {village}. Irrigate in the evening and protect young plants."),
+    Rule("disease", "humidity", ">", 90, "medium",
+         "DISEASE RISK: Humidity at {value:.1f}% in {village} favours fungal infection of {crop}. Inspect the fields."),
+    Rule("soil", "ph_level", "<", 5.5, "medium",
+         "SOIL ALERT: Acidic soil (pH {value:.1f}) in {village}. Consider liming."),
+    Rule("soil", "ph_level", ">", 8.5, "medium",
+         "SOIL ALERT: Alkaline soil (pH {value:.1f}) in {village}. Consider gypsum treatment."),
+]
+
+
+@dataclass
+class Candidate:
+    """The most severe rule match for one village and alert type within a batch"""
+    village_id: str
+    alert_type: str
+    severity: str
+    message: str
+
+
+class RuleEngine:
+    """Evaluate alert rules against batches of readings.
+
+    Each rule is applied to a whole metric column at once rather than to one
+    reading at a time, and the matches are reduced to a single candidate per
+    village and alert type. Candidates are then deduplicated against the
+    village's active alerts and debounced against recently raised ones.
+    """
+
+    def __init__(self, rules: Iterable[Rule], severities: List[str], debounce_seconds: float = 3600.0):
+        self.rules = list(rules)
+        self.rank = {severity: rank for rank, severity in enumerate(severities)}
+        self.debounce = timedelta(seconds=debounce_seconds)
+        unknown = {rule.severity for rule in self.rules} - set(self.rank)
+        if unknown:
+            raise ValueError(f"Unknown rule severities: {', '.join(sorted(unknown))}")
+
+    @property
+    def metrics(self) -> List[str]:
+        return sorted({rule.metric for rule in self.rules})
+
+    def evaluate(self, readings: List[Dict[str, Any]], villages: Dict[str, Dict[str, Any]]) -> List[Candidate]:
+        """Match a batch of readings (dicts with village_id and metrics) against the rules"""
+        if not readings:
+            return []
+        village_column = [reading["village_id"] for reading in readings]
+        columns = {metric: [reading.get(metric) for reading in readings] for metric in self.metrics}
+
+        # (village_id, alert_type) -> (rank, rule, value)
+        worst: Dict[Tuple[str, str], Tuple[int, Rule, float]] = {}
+        for rule in self.rules:
+            eligible = {village_id for village_id, village in villages.items() if rule.applies_to(village)}
+            if not eligible:
+                continue
+            compare = COMPARISONS[rule.op]
+            threshold = rule.threshold
+            rank = self.rank[rule.severity]
+            hits = [
+                (village_id, value)
+                for village_id, value in zip(village_column, columns[rule.metric])
+                if value is not None and compare(value, threshold) and village_id in eligible
+            ]
+            for village_id, value in hits:
+                key = (village_id, rule.alert_type)
+                current = worst.get(key)
+                # Keep the most severe rule, and its most extreme reading
+                if current is None or rank > current[0] or (
+                    rank == current[0] and rule is current[1] and compare(value, current[2])
+                ):
+                    worst[key] = (rank, rule, value)
+
+        candidates = []
+        for (village_id, alert_type), (_, rule, value) in worst.items():
+            village = villages[village_id]
+            message = rule.message.format(
+                village=village.get("name", village_id),
+                crop=village.get("crop", "crops"),
+                soil=village.get("soil_type", ""),
+                value=value
+            )
+            candidates.append(Candidate(village_id, alert_type, rule.severity, message))
+        return candidates
+
+    def recent_window(self, candidates: List[Candidate], now: datetime) -> Tuple[List[str], List[str], datetime]:
+        """Village ids, alert types and start of the debounce window of the alerts that can suppress candidates"""
+        return (
+            sorted({candidate.village_id for candidate in candidates}),
+            sorted({candidate.alert_type for candidate in candidates}),
+            now - self.debounce
+        )
+
+    def suppress(self, candidates: List[Candidate], existing: Iterable[Dict[str, Any]]) -> List[Candidate]:
+        """Drop candidates already covered by an active or recently raised alert.
+
+        An alert of the same village and type suppresses candidates of equal
+        or lower severity, so a worsening condition still escalates.
+        """
+        covered: Dict[Tuple[str, str], int] = {}
+        for alert in existing:
+            key = (alert["village_id"], alert["alert_type"])
+            covered[key] = max(covered.get(key, -1), self.rank.get(alert.get("severity"), -1))
+        return [
+            candidate for candidate in candidates
+            if self.rank[candidate.severity] > covered.get((candidate.village_id, candidate.alert_type), -1)
+        ]
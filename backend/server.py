@@ -1,26 +1,266 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Any, Set, Tuple
 import uuid
-from datetime import datetime, timezone
+import hashlib
+import socket
+from datetime import datetime, timedelta, timezone
 import asyncio
+import orjson
+from contextlib import asynccontextmanager
+
+from alert_stream import AlertBroker
+from cache import cache_key, create_cache
+from columnar import MSGPACK_MEDIA_TYPE, encode_msgpack, prefers_msgpack, with_history_columns
+from compression import CompressionMiddleware, compressors
+from edge_sync import BodyTooLarge, EdgeLog, EdgeSyncer, gunzip
+from export import EXPORTS, decode_cursor, stream_export
+from geo import parse_bbox
+from jobs import JobQueue, job_status
+from memory_storage import MemoryStorage
+from metrics import CommandMetrics, MetricsExporter, MetricsMiddleware, StatsCollector, timed_encode
+from mongo_storage import MotorStorage
+from pool_metrics import PoolMetrics
+from profiling import ProfilingMiddleware, profiling_settings
+from rules import DEFAULT_RULES, RuleEngine
+from storage import Storage, TimeRange, VillageQuery
+from timeseries import METRICS, bucket_series, lttb
+from versions import CollectionVersions
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+def mongo_client_options() -> Dict[str, Any]:
+    """Connection pool and driver settings from the environment.
+
+    Unset variables leave the option to MONGO_URL and then to the driver
+    default. Each worker process has its own pool, so the server sees up to
+    workers x MONGO_MAX_POOL_SIZE connections; MONGO_MAX_CONNECTING bounds
+    how many a worker opens at once when load arrives.
+    """
+    settings = {
+        "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+        "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+        "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", int),
+        "maxConnecting": ("MONGO_MAX_CONNECTING", int),
+        "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+        "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+        "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", int),
+        # e.g. "zstd,snappy,zlib"; zstd and snappy need the zstandard and python-snappy packages
+        "compressors": ("MONGO_COMPRESSORS", str),
+    }
+    return {option: parse(os.environ[name]) for option, (name, parse) in settings.items() if os.environ.get(name)}
+
+# Storage backend, opened by the app lifespan so importing this module does
+# not start the driver. STORAGE_BACKEND selects "mongodb" (MONGO_URL and
+# DB_NAME, the default) or "memory" (per worker and lost on restart).
+# Scripts and tests call open_storage() or set storage themselves.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongodb')
+pool_metrics = PoolMetrics()
+storage: Optional[Storage] = None
+_opened_storage = False
+
+def open_storage() -> Storage:
+    """Open the STORAGE_BACKEND storage unless one has already been set"""
+    global storage, _opened_storage
+    if storage is None:
+        if STORAGE_BACKEND == "memory":
+            storage = MemoryStorage(SEVERITIES, HISTORY_SUMMARY_SIZE, VILLAGE_ALERTS_SIZE, ALERT_ARCHIVE_TTL_DAYS)
+        elif STORAGE_BACKEND == "mongodb":
+            client = AsyncIOMotorClient(
+                os.environ['MONGO_URL'], event_listeners=[pool_metrics, CommandMetrics()], **mongo_client_options()
+            )
+            storage = MotorStorage(
+                client[os.environ['DB_NAME']], SEVERITIES, HISTORY_SUMMARY_SIZE, VILLAGE_ALERTS_SIZE,
+                chunk_size=BULK_CHUNK_SIZE, archive_ttl_days=ALERT_ARCHIVE_TTL_DAYS, read_preference=replica_preference
+            )
+        else:
+            raise ValueError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+        _opened_storage = True
+    return storage
+
+async def close_storage():
+    """Close the storage opened by open_storage()"""
+    global storage, _opened_storage
+    if _opened_storage:
+        await storage.close()
+        storage, _opened_storage = None, False
+
+# Seed the sample villages into an empty database on first startup
+SEED_SAMPLE_DATA = os.environ.get('SEED_SAMPLE_DATA', 'true').lower() in ('1', 'true', 'yes')
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def replica_read_preference():
+    """Read preference for the MongoDB exports, which tolerate replication lag"""
+    mode = os.environ.get('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unsupported MONGO_READ_PREFERENCE: {mode}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '-1')))
+
+replica_preference = replica_read_preference()
+
+# Number of most recent readings embedded in each village document. The full
+# series lives in the "readings" time-series collection.
+HISTORY_SUMMARY_SIZE = int(os.environ.get('HISTORY_SUMMARY_SIZE', '10'))
+
+# Number of most recent alert messages embedded in each village document
+VILLAGE_ALERTS_SIZE = int(os.environ.get('VILLAGE_ALERTS_SIZE', '20'))
+
+# Page size limits for GET /api/villages
+VILLAGES_DEFAULT_LIMIT = int(os.environ.get('VILLAGES_DEFAULT_LIMIT', '1000'))
+VILLAGES_MAX_LIMIT = int(os.environ.get('VILLAGES_MAX_LIMIT', '5000'))
+
+# Most markers returned by the map bbox and radius routes
+MAP_MAX_VILLAGES = int(os.environ.get('MAP_MAX_VILLAGES', '2000'))
+
+# Documents fetched per cursor batch when streaming exports
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Bulk ingest limits: rows per request, rows per insert_many chunk, and rows
+# allowed in flight per worker before new batches are turned away with a 429.
+BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', '20000'))
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '1000'))
+BULK_MAX_PENDING_ROWS = int(os.environ.get('BULK_MAX_PENDING_ROWS', '50000'))
+BULK_RETRY_AFTER_SECONDS = int(os.environ.get('BULK_RETRY_AFTER_SECONDS', '5'))
+
+# Background archival of alerts into the alerts_archive collection. Dismissed
+# alerts are moved once ALERT_ARCHIVE_AFTER_SECONDS have passed; active alerts
+# older than ALERT_EXPIRE_SECONDS are dismissed first (0 never expires them).
+# Archived alerts are deleted after ALERT_ARCHIVE_TTL_DAYS (0 keeps them).
+ALERT_ARCHIVE_INTERVAL_SECONDS = float(os.environ.get('ALERT_ARCHIVE_INTERVAL_SECONDS', '3600'))
+ALERT_ARCHIVE_AFTER_SECONDS = float(os.environ.get('ALERT_ARCHIVE_AFTER_SECONDS', '86400'))
+ALERT_EXPIRE_SECONDS = float(os.environ.get('ALERT_EXPIRE_SECONDS', '0'))
+ALERT_ARCHIVE_TTL_DAYS = float(os.environ.get('ALERT_ARCHIVE_TTL_DAYS', '365'))
+ALERT_ARCHIVE_BATCH_SIZE = int(os.environ.get('ALERT_ARCHIVE_BATCH_SIZE', '1000'))
+
+# Most villages a single POST /api/simulate/batch may target
+SIMULATION_BATCH_MAX_VILLAGES = int(os.environ.get('SIMULATION_BATCH_MAX_VILLAGES', '5000'))
+
+# Alerts raised automatically from incoming readings. An alert is not raised
+# again for the same village and type while one is active, or within the
+# debounce window of the last one, unless its severity is higher.
+ALERT_RULES_ENABLED = os.environ.get('ALERT_RULES_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+ALERT_DEBOUNCE_SECONDS = float(os.environ.get('ALERT_DEBOUNCE_SECONDS', '3600'))
+
+# Alert changes pushed to dashboards over server-sent events. Events are
+# published by this worker's write routes, so each worker streams its own.
+alert_broker = AlertBroker(
+    buffer_size=int(os.environ.get('ALERT_STREAM_BUFFER', '1000')),
+    heartbeat_seconds=float(os.environ.get('ALERT_STREAM_HEARTBEAT_SECONDS', '15'))
+)
+
+# Read-through cache for village and alert reads. CACHE_URL selects the
+# backend: "memory://" (per worker, default), "redis://..." (shared) or "none".
+cache = create_cache(
+    os.environ.get('CACHE_URL', 'memory://'),
+    max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', '1024')),
+    ttl_seconds=float(os.environ.get('CACHE_TTL_SECONDS', '30'))
+)
+
+# Edge sync mode. With EDGE_SYNC_URL set, every reading and alert this
+# server stores is also appended to the local log at EDGE_LOG_PATH before
+# the request completes, and replayed in batches to the central server at
+# that URL whenever it can be reached.
+EDGE_SYNC_URL = os.environ.get('EDGE_SYNC_URL')
+edge_log = EdgeLog(
+    os.environ.get('EDGE_LOG_PATH', str(ROOT_DIR / 'edge_log.sqlite3')),
+    retention_seconds=float(os.environ.get('EDGE_LOG_RETENTION_SECONDS', '86400'))
+) if EDGE_SYNC_URL else None
+edge_syncer = EdgeSyncer(
+    edge_log,
+    EDGE_SYNC_URL,
+    edge_id=os.environ.get('EDGE_ID', socket.gethostname()),
+    batch_size=int(os.environ.get('EDGE_SYNC_BATCH_SIZE', '5000')),
+    interval_seconds=float(os.environ.get('EDGE_SYNC_INTERVAL_SECONDS', '5')),
+    max_backoff_seconds=float(os.environ.get('EDGE_SYNC_MAX_BACKOFF_SECONDS', '300'))
+) if edge_log else None
+# Largest body accepted by POST /api/sync/batch, both as sent and decompressed
+SYNC_MAX_BODY_BYTES = int(os.environ.get('SYNC_MAX_BODY_BYTES', str(64 * 1024 * 1024)))
+
+# Background jobs, stored with the data so that an enqueued job survives a
+# restart. Each process runs JOB_CONCURRENCY workers (0 runs none); a failed
+# job is retried with exponential backoff from JOB_RETRY_SECONDS until it has
+# been attempted JOB_MAX_ATTEMPTS times. Finished jobs are kept for
+# JOB_RETENTION_SECONDS.
+job_queue = JobQueue(
+    lambda: storage.jobs,
+    concurrency=int(os.environ.get('JOB_CONCURRENCY', '4')),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', '5')),
+    retry_seconds=float(os.environ.get('JOB_RETRY_SECONDS', '2')),
+    lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', '60')),
+    retention_seconds=float(os.environ.get('JOB_RETENTION_SECONDS', str(7 * 86400)))
+)
+
+# Periodic jobs started with the app and cancelled on shutdown
+background_tasks: Set[asyncio.Task] = set()
+
+# Prometheus metrics served at /metrics
+metrics_exporter = MetricsExporter(StatsCollector(pool_metrics, cache))
+
+# Change counters behind the ETags of the read routes
+collection_versions = CollectionVersions(
+    lambda: storage,
+    ttl_seconds=float(os.environ.get('ETAG_VERSION_TTL_SECONDS', '1'))
+)
+
+# Cache-Control sent with each conditional read route. Dashboards must see
+# writes immediately, so most routes revalidate on every use and rely on 304s.
+ROUTE_CACHE_CONTROL = {
+    "villages": "no-cache",
+    "village": "no-cache",
+    "readings": "private, max-age=30",
+    "alerts": "no-cache",
+    "village_alerts": "no-cache",
+    "stats": "no-cache",
+    "map": "no-cache",
+}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open and prepare the storage on startup, close it on shutdown"""
+    await open_storage().prepare()
+    if SEED_SAMPLE_DATA:
+        await initialize_sample_data()
+    if await storage.get_stats() is None:
+        await rebuild_dashboard_stats()
+    if ALERT_ARCHIVE_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(run_alert_archiver()))
+    if edge_log:
+        await edge_log.open()
+        background_tasks.add(asyncio.create_task(edge_syncer.run()))
+    if job_queue.concurrency > 0:
+        background_tasks.add(asyncio.create_task(job_queue.run()))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        # Wait for them to stop, so no job is still writing once storage closes
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+        if edge_log:
+            await edge_log.close()
+        await close_storage()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -34,6 +274,17 @@ class SensorReading(BaseModel):
     ph_level: float
     timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+# Alert severities, lowest first
+SEVERITIES = ["low", "medium", "high", "critical"]
+
+class SeveritySummary(BaseModel):
+    """Active alert counts for a village, kept in sync as alerts are raised and dismissed"""
+    highest: Optional[str] = None
+    counts: Dict[str, int] = Field(default_factory=lambda: {severity: 0 for severity in SEVERITIES})
+
+class BulkReading(SensorReading):
+    village_id: str
+
 class Village(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -45,8 +296,9 @@ class Village(BaseModel):
     area_hectares: float
     soil_type: str
     irrigation_type: str
-    history: List[SensorReading] = Field(default_factory=list)
-    alerts: List[str] = Field(default_factory=list)
+    history: List[SensorReading] = Field(default_factory=list)  # latest HISTORY_SUMMARY_SIZE readings
+    alerts: List[str] = Field(default_factory=list)  # latest VILLAGE_ALERTS_SIZE alert messages
+    severity_summary: SeveritySummary = Field(default_factory=SeveritySummary)
     last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class VillageCreate(BaseModel):
@@ -68,217 +320,1110 @@ class Alert(BaseModel):
     severity: str  # "low", "medium", "high", "critical"
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_active: bool = True
+    dismissed_at: Optional[datetime] = None
 
 class SimulationTrigger(BaseModel):
     scenario: str
     village_id: str
     severity: str = "medium"
 
-# Initialize with sample data
+class SimulationBatch(BaseModel):
+    """A scenario triggered for every village matching the filter"""
+    scenario: str
+    severity: str = "medium"
+    village_ids: Optional[List[str]] = None
+    state: Optional[str] = None
+    district: Optional[str] = None
+    crop: Optional[str] = None
+
+alert_engine = RuleEngine(DEFAULT_RULES, SEVERITIES, debounce_seconds=ALERT_DEBOUNCE_SECONDS)
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO-8601 reading timestamp into an aware UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def reading_document(village_id: str, reading: SensorReading) -> Dict[str, Any]:
+    """Build a readings time-series document from a sensor reading"""
+    doc = reading.dict()
+    doc["village_id"] = village_id
+    doc["ts"] = parse_timestamp(reading.timestamp)
+    return doc
+
+# Sample Indian villages seeded into an empty database
+SAMPLE_VILLAGES = [
+    {
+        "id": "mandya-kirangur",
+        "name": "Kirangur",
+        "district": "Mandya",
+        "state": "Karnataka",
+        "crop": "paddy",
+        "coords": [12.522, 76.899],
+        "population": 1500,
+        "area_hectares": 250.0,
+        "soil_type": "clayey",
+        "irrigation_type": "canal",
+        "history": [
+            {"day": "Day 1", "soil_moisture": 28.5, "temperature": 32.1, "humidity": 78.2, "ph_level": 6.8, "timestamp": "2024-01-01T10:00:00Z"},
+            {"day": "Day 2", "soil_moisture": 25.2, "temperature": 33.4, "humidity": 76.1, "ph_level": 6.7, "timestamp": "2024-01-02T10:00:00Z"},
+            {"day": "Day 3", "soil_moisture": 22.8, "temperature": 34.2, "humidity": 74.5, "ph_level": 6.6, "timestamp": "2024-01-03T10:00:00Z"},
+            {"day": "Day 4", "soil_moisture": 20.1, "temperature": 35.8, "humidity": 71.2, "ph_level": 6.5, "timestamp": "2024-01-04T10:00:00Z"},
+            {"day": "Day 5", "soil_moisture": 18.4, "temperature": 36.5, "humidity": 68.9, "ph_level": 6.4, "timestamp": "2024-01-05T10:00:00Z"}
+        ],
+        "alerts": ["Low soil moisture detected", "Temperature rising"]
+    },
+    {
+        "id": "thanjavur-kovil",
+        "name": "Kovil",
+        "district": "Thanjavur",
+        "state": "Tamil Nadu",
+        "crop": "sugarcane",
+        "coords": [10.786, 79.138],
+        "population": 2200,
+        "area_hectares": 400.0,
+        "soil_type": "alluvial",
+        "irrigation_type": "drip",
+        "history": [
+            {"day": "Day 1", "soil_moisture": 60.2, "temperature": 29.8, "humidity": 82.1, "ph_level": 7.2, "timestamp": "2024-01-01T10:00:00Z"},
+            {"day": "Day 2", "soil_moisture": 58.5, "temperature": 30.4, "humidity": 80.8, "ph_level": 7.1, "timestamp": "2024-01-02T10:00:00Z"},
+            {"day": "Day 3", "soil_moisture": 55.8, "temperature": 31.2, "humidity": 79.4, "ph_level": 7.0, "timestamp": "2024-01-03T10:00:00Z"},
+            {"day": "Day 4", "soil_moisture": 53.2, "temperature": 32.1, "humidity": 77.9, "ph_level": 6.9, "timestamp": "2024-01-04T10:00:00Z"},
+            {"day": "Day 5", "soil_moisture": 51.4, "temperature": 32.8, "humidity": 76.2, "ph_level": 6.8, "timestamp": "2024-01-05T10:00:00Z"}
+        ],
+        "alerts": ["Optimal conditions"]
+    },
+    {
+        "id": "washim-manjari",
+        "name": "Manjari",
+        "district": "Washim",
+        "state": "Maharashtra",
+        "crop": "soybean",
+        "coords": [20.125, 76.103],
+        "population": 800,
+        "area_hectares": 180.0,
+        "soil_type": "sandy loam",
+        "irrigation_type": "rainfed",
+        "history": [
+            {"day": "Day 1", "soil_moisture": 15.2, "temperature": 38.5, "humidity": 45.2, "ph_level": 6.2, "timestamp": "2024-01-01T10:00:00Z"},
+            {"day": "Day 2", "soil_moisture": 14.1, "temperature": 39.2, "humidity": 43.8, "ph_level": 6.1, "timestamp": "2024-01-02T10:00:00Z"},
+            {"day": "Day 3", "soil_moisture": 13.5, "temperature": 40.1, "humidity": 41.5, "ph_level": 6.0, "timestamp": "2024-01-03T10:00:00Z"},
+            {"day": "Day 4", "soil_moisture": 12.8, "temperature": 41.2, "humidity": 39.2, "ph_level": 5.9, "timestamp": "2024-01-04T10:00:00Z"},
+            {"day": "Day 5", "soil_moisture": 11.9, "temperature": 42.1, "humidity": 36.8, "ph_level": 5.8, "timestamp": "2024-01-05T10:00:00Z"}
+        ],
+        "alerts": ["CRITICAL: Drought conditions", "Immediate irrigation required"]
+    },
+    {
+        "id": "payyanur-kerala",
+        "name": "Payyanur",
+        "district": "Kannur",
+        "state": "Kerala",
+        "crop": "coconut+paddy",
+        "coords": [12.093, 75.198],
+        "population": 3200,
+        "area_hectares": 320.0,
+        "soil_type": "laterite",
+        "irrigation_type": "mixed",
+        "history": [
+            {"day": "Day 1", "soil_moisture": 70.5, "temperature": 28.2, "humidity": 88.5, "ph_level": 6.5, "timestamp": "2024-01-01T10:00:00Z"},
+            {"day": "Day 2", "soil_moisture": 68.8, "temperature": 29.1, "humidity": 87.2, "ph_level": 6.4, "timestamp": "2024-01-02T10:00:00Z"},
+            {"day": "Day 3", "soil_moisture": 66.2, "temperature": 29.8, "humidity": 85.8, "ph_level": 6.3, "timestamp": "2024-01-03T10:00:00Z"},
+            {"day": "Day 4", "soil_moisture": 65.1, "temperature": 30.5, "humidity": 84.1, "ph_level": 6.2, "timestamp": "2024-01-04T10:00:00Z"},
+            {"day": "Day 5", "soil_moisture": 64.3, "temperature": 31.2, "humidity": 82.5, "ph_level": 6.1, "timestamp": "2024-01-05T10:00:00Z"}
+        ],
+        "alerts": ["High humidity - monitor for fungal diseases"]
+    }
+]
+
+SAMPLE_DATA_MARKER = "sample_data"
+
 async def initialize_sample_data():
-    """Initialize the database with sample Indian villages if empty"""
-    villages_count = await db.villages.count_documents({})
-    if villages_count == 0:
-        sample_villages = [
-            {
-                "id": "mandya-kirangur",
-                "name": "Kirangur",
-                "district": "Mandya",
-                "state": "Karnataka",
-                "crop": "paddy",
-                "coords": [12.522, 76.899],
-                "population": 1500,
-                "area_hectares": 250.0,
-                "soil_type": "clayey",
-                "irrigation_type": "canal",
-                "history": [
-                    {"day": "Day 1", "soil_moisture": 28.5, "temperature": 32.1, "humidity": 78.2, "ph_level": 6.8, "timestamp": "2024-01-01T10:00:00Z"},
-                    {"day": "Day 2", "soil_moisture": 25.2, "temperature": 33.4, "humidity": 76.1, "ph_level": 6.7, "timestamp": "2024-01-02T10:00:00Z"},
-                    {"day": "Day 3", "soil_moisture": 22.8, "temperature": 34.2, "humidity": 74.5, "ph_level": 6.6, "timestamp": "2024-01-03T10:00:00Z"},
-                    {"day": "Day 4", "soil_moisture": 20.1, "temperature": 35.8, "humidity": 71.2, "ph_level": 6.5, "timestamp": "2024-01-04T10:00:00Z"},
-                    {"day": "Day 5", "soil_moisture": 18.4, "temperature": 36.5, "humidity": 68.9, "ph_level": 6.4, "timestamp": "2024-01-05T10:00:00Z"}
-                ],
-                "alerts": ["Low soil moisture detected", "Temperature rising"],
-                "last_updated": datetime.now(timezone.utc)
-            },
-            {
-                "id": "thanjavur-kovil",
-                "name": "Kovil",
-                "district": "Thanjavur",
-                "state": "Tamil Nadu",
-                "crop": "sugarcane",
-                "coords": [10.786, 79.138],
-                "population": 2200,
-                "area_hectares": 400.0,
-                "soil_type": "alluvial",
-                "irrigation_type": "drip",
-                "history": [
-                    {"day": "Day 1", "soil_moisture": 60.2, "temperature": 29.8, "humidity": 82.1, "ph_level": 7.2, "timestamp": "2024-01-01T10:00:00Z"},
-                    {"day": "Day 2", "soil_moisture": 58.5, "temperature": 30.4, "humidity": 80.8, "ph_level": 7.1, "timestamp": "2024-01-02T10:00:00Z"},
-                    {"day": "Day 3", "soil_moisture": 55.8, "temperature": 31.2, "humidity": 79.4, "ph_level": 7.0, "timestamp": "2024-01-03T10:00:00Z"},
-                    {"day": "Day 4", "soil_moisture": 53.2, "temperature": 32.1, "humidity": 77.9, "ph_level": 6.9, "timestamp": "2024-01-04T10:00:00Z"},
-                    {"day": "Day 5", "soil_moisture": 51.4, "temperature": 32.8, "humidity": 76.2, "ph_level": 6.8, "timestamp": "2024-01-05T10:00:00Z"}
-                ],
-                "alerts": ["Optimal conditions"],
-                "last_updated": datetime.now(timezone.utc)
-            },
-            {
-                "id": "washim-manjari",
-                "name": "Manjari",
-                "district": "Washim",
-                "state": "Maharashtra",
-                "crop": "soybean",
-                "coords": [20.125, 76.103],
-                "population": 800,
-                "area_hectares": 180.0,
-                "soil_type": "sandy loam",
-                "irrigation_type": "rainfed",
-                "history": [
-                    {"day": "Day 1", "soil_moisture": 15.2, "temperature": 38.5, "humidity": 45.2, "ph_level": 6.2, "timestamp": "2024-01-01T10:00:00Z"},
-                    {"day": "Day 2", "soil_moisture": 14.1, "temperature": 39.2, "humidity": 43.8, "ph_level": 6.1, "timestamp": "2024-01-02T10:00:00Z"},
-                    {"day": "Day 3", "soil_moisture": 13.5, "temperature": 40.1, "humidity": 41.5, "ph_level": 6.0, "timestamp": "2024-01-03T10:00:00Z"},
-                    {"day": "Day 4", "soil_moisture": 12.8, "temperature": 41.2, "humidity": 39.2, "ph_level": 5.9, "timestamp": "2024-01-04T10:00:00Z"},
-                    {"day": "Day 5", "soil_moisture": 11.9, "temperature": 42.1, "humidity": 36.8, "ph_level": 5.8, "timestamp": "2024-01-05T10:00:00Z"}
-                ],
-                "alerts": ["CRITICAL: Drought conditions", "Immediate irrigation required"],
-                "last_updated": datetime.now(timezone.utc)
-            },
-            {
-                "id": "payyanur-kerala",
-                "name": "Payyanur",
-                "district": "Kannur",
-                "state": "Kerala",
-                "crop": "coconut+paddy",
-                "coords": [12.093, 75.198],
-                "population": 3200,
-                "area_hectares": 320.0,
-                "soil_type": "laterite",
-                "irrigation_type": "mixed",
-                "history": [
-                    {"day": "Day 1", "soil_moisture": 70.5, "temperature": 28.2, "humidity": 88.5, "ph_level": 6.5, "timestamp": "2024-01-01T10:00:00Z"},
-                    {"day": "Day 2", "soil_moisture": 68.8, "temperature": 29.1, "humidity": 87.2, "ph_level": 6.4, "timestamp": "2024-01-02T10:00:00Z"},
-                    {"day": "Day 3", "soil_moisture": 66.2, "temperature": 29.8, "humidity": 85.8, "ph_level": 6.3, "timestamp": "2024-01-03T10:00:00Z"},
-                    {"day": "Day 4", "soil_moisture": 65.1, "temperature": 30.5, "humidity": 84.1, "ph_level": 6.2, "timestamp": "2024-01-04T10:00:00Z"},
-                    {"day": "Day 5", "soil_moisture": 64.3, "temperature": 31.2, "humidity": 82.5, "ph_level": 6.1, "timestamp": "2024-01-05T10:00:00Z"}
-                ],
-                "alerts": ["High humidity - monitor for fungal diseases"],
-                "last_updated": datetime.now(timezone.utc)
-            }
+    """Seed the sample villages into an empty database, once.
+
+    A stored marker records that seeding ran, so later startups skip it
+    with one key lookup and villages deleted since are not brought back.
+    Only villages whose id is not stored yet are inserted, so workers
+    starting at the same time can all run this without creating duplicates.
+    """
+    if await storage.has_marker(SAMPLE_DATA_MARKER):
+        return
+
+    if await storage.villages.count() == 0:
+        now = datetime.now(timezone.utc)
+        villages = [
+            {**village, "severity_summary": SeveritySummary().dict(), "last_updated": now}
+            for village in SAMPLE_VILLAGES
+        ]
+        inserted = await storage.villages.insert_missing(villages)
+
+        # Readings only for the villages this worker inserted, so none are doubled
+        readings = [
+            reading_document(villages[index]["id"], SensorReading(**reading))
+            for index in inserted
+            for reading in villages[index]["history"]
         ]
-        
-        for village_data in sample_villages:
-            await db.villages.insert_one(village_data)
-        
-        logging.info("Sample village data initialized")
+        if readings:
+            await storage.readings.insert_many(readings)
+        if inserted:
+            logging.info(f"Seeded {len(inserted)} sample villages")
+
+    await storage.set_marker(SAMPLE_DATA_MARKER, datetime.now(timezone.utc))
+
+# Dashboard statistics are materialized in a single document that the write
+# routes keep current with increments, so reading them is one key lookup.
+async def bump_dashboard_stats(totals: Optional[Dict[str, int]] = None, **deltas: int):
+    """Apply incremental changes to the materialized dashboard statistics.
+
+    ``totals`` overwrites fields that were recounted rather than adjusted.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas and not totals:
+        return
+    # Missing statistics stay missing and are rebuilt on read
+    await storage.update_stats({**(totals or {}), "last_updated": datetime.now(timezone.utc)}, deltas)
+    await collection_versions.bump("stats")
+
+async def update_severity_summary(village_id: str, severity: str, delta: int) -> int:
+    """Adjust a village's active alert count for one severity.
+
+    Returns the change in the number of villages with active critical
+    alerts (-1, 0 or 1) for the dashboard statistics.
+    """
+    previous = await storage.villages.adjust_severity(village_id, severity, delta)
+    if previous is None or severity != "critical":
+        return 0
+    before = previous.get("counts", {}).get("critical", 0)
+    after = max(0, before + delta)
+    return int(after > 0) - int(before > 0)
+
+async def rebuild_severity_summaries():
+    """Recompute every village's severity summary from its active alerts"""
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for village_id, by_severity in (await storage.alerts.active_counts()).items():
+        summary = SeveritySummary()
+        summary.counts.update({severity: count for severity, count in by_severity.items() if severity in SEVERITIES})
+        summary.highest = next((severity for severity in reversed(SEVERITIES) if summary.counts[severity] > 0), None)
+        if summary.highest is not None:
+            summaries[village_id] = summary.dict()
+    await storage.villages.replace_severity_summaries(summaries, SeveritySummary().dict())
+
+async def rebuild_dashboard_stats() -> Dict[str, Any]:
+    """Recompute the dashboard statistics from the stored villages and alerts"""
+    await rebuild_severity_summaries()
+    stats = {
+        "total_villages": await storage.villages.count(),
+        "active_alerts": await storage.alerts.count_active(),
+        "critical_alerts": await storage.alerts.count_active("critical"),
+        "critical_villages": await storage.villages.count_with_highest("critical"),
+        "last_updated": datetime.now(timezone.utc)
+    }
+    await storage.replace_stats(stats)
+    await collection_versions.bump("stats")
+    return stats
+
+def dashboard_stats_response(stats: Dict[str, Any]) -> Dict[str, Any]:
+    response = {key: value for key, value in stats.items() if key != "_id"}
+    # Mongo hands back naive datetimes; they are stored as UTC
+    response["last_updated"] = stats["last_updated"].replace(tzinfo=timezone.utc).isoformat()
+    return response
+
+def encode_json(payload: Any) -> bytes:
+    """Encode a response payload in one pass.
+
+    Mongo returns naive datetimes that are stored as UTC, so they are
+    written with a Z suffix like Pydantic does for aware ones.
+    """
+    return orjson.dumps(payload, default=str, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+
+def encode_response(payload: Any, encode=encode_json) -> bytes:
+    """Encode a whole response body, timed for the serialization metrics"""
+    return timed_encode(encode, payload)
+
+def json_response(body: bytes, headers: Dict[str, str], media_type: str = "application/json") -> Response:
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def read_through(key: str, tags: List[str], loader, encode=encode_json,
+                       etag: Optional[str] = None) -> Optional[Tuple[bytes, Dict[str, str]]]:
+    """Return a cached encoded response, or load, encode and cache it on a miss.
+
+    ``loader`` returns a (payload, headers) pair, or None when there is
+    nothing to return. Read routes trust documents that were validated by
+    the models on write and encode them directly, so no model is built and
+    FastAPI does not validate the response a second time. ``etag`` is the
+    ETag the response is sent with; it is part of the key, so a body cached
+    under other collection versions (by a worker whose versions were older
+    or newer) is never sent with this ETag.
+    """
+    if etag:
+        key = f"{key}#{etag}"
+    cached = await cache.get(key)
+    if cached is None:
+        loaded = await loader()
+        if loaded is None:
+            return None
+        payload, headers = loaded
+        cached = (encode_response(payload, encode), headers)
+        await cache.set(key, cached, tags)
+    return cached
+
+async def invalidate_villages(*village_ids: str):
+    """Drop cached village lists and the given villages, and change their ETags"""
+    await cache.invalidate("villages", *(f"village:{village_id}" for village_id in village_ids))
+    await collection_versions.bump("villages")
+
+async def invalidate_alerts(*village_ids: str):
+    """Drop cached alert lists that may include alerts of the given villages, and change their ETags"""
+    await cache.invalidate("alerts", *(f"alerts:{village_id}" for village_id in village_ids))
+    await collection_versions.bump("alerts")
+
+async def conditional_get(request: Request, route: str, *collections: str,
+                          variant: str = "") -> Tuple[Optional[Response], Dict[str, str]]:
+    """Answer a conditional GET from the collection versions alone.
+
+    Returns a 304 response when If-None-Match carries the current ETag,
+    along with the ETag and Cache-Control headers for a full response.
+    The versions are read before the route queries Mongo, so a concurrent
+    write can only make the ETag older than the body, never newer.
+    ``variant`` names the representation when a route negotiates one.
+    """
+    versions = await collection_versions.get(*collections)
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.sha1(f"{request.url.path}?{query}|{sorted(versions.items())}|{variant}".encode()).hexdigest()
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": ROUTE_CACHE_CONTROL[route]}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers), headers
+    return None, headers
 
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Digital Sarpanch API - Village Governance System"}
 
+# Fields added to Village after the first documents were written; older
+# documents are returned with these defaults instead of being re-validated.
+VILLAGE_DEFAULTS = {"history": [], "alerts": [], "severity_summary": SeveritySummary().dict()}
+
+# Village attributes used to evaluate alert rules and word alert messages
+ALERT_VILLAGE_FIELDS = ("name", "crop", "soil_type")
+
+def village_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated list of Village fields, or None for all of them"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(Village.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return sorted(requested)
+
+def village_encoding(request: Request) -> Tuple[str, Any]:
+    """Media type and encoder of a village read: MessagePack when the client prefers it, otherwise JSON"""
+    if prefers_msgpack(request.headers.get("accept", "")):
+        return MSGPACK_MEDIA_TYPE, encode_msgpack
+    return "application/json", encode_json
+
+def parse_time_range(since: Optional[str], until: Optional[str]) -> TimeRange:
+    """Parse the since and until query parameters, answering 422 when either is malformed"""
+    try:
+        return (parse_timestamp(since) if since else None, parse_timestamp(until) if until else None)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid time range")
+
 @api_router.get("/villages", response_model=List[Village])
-async def get_villages():
-    """Get all villages with their sensor data"""
-    villages = await db.villages.find().to_list(1000)
-    return [Village(**village) for village in villages]
+async def get_villages(
+    request: Request,
+    after: Optional[str] = None,
+    limit: int = Query(VILLAGES_DEFAULT_LIMIT, ge=1, le=VILLAGES_MAX_LIMIT),
+    fields: Optional[str] = None,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    crop: Optional[str] = None,
+    severity: Optional[str] = None,
+    history_format: str = Query("rows", pattern="^(rows|columns)$")
+):
+    """Get villages with their latest sensor readings, ordered by id.
+
+    Pass the X-Next-Cursor response header back as ``after`` to fetch the
+    next page. ``fields`` limits each village to the listed attributes and
+    ``severity`` keeps villages whose highest active alert has that severity.
+    ``history_format=columns`` sends each history as one array per field,
+    and clients sending Accept: application/msgpack get MessagePack.
+    """
+    query = VillageQuery(state=state, district=district, crop=crop, severity=severity, after=after)
+    requested = village_fields(fields)
+    media_type, encode = village_encoding(request)
+    unchanged, headers = await conditional_get(request, "villages", "villages", variant=media_type)
+    if unchanged:
+        return unchanged
+
+    async def load_page():
+        villages = await storage.villages.find(query, requested, limit)
+        if not fields:
+            villages = [{**VILLAGE_DEFAULTS, **village} for village in villages]
+        page_headers = {"X-Next-Cursor": villages[-1]["id"]} if len(villages) == limit else {}
+        if history_format == "columns":
+            villages = [with_history_columns(village) for village in villages]
+        return villages, page_headers
+
+    key = cache_key(
+        "villages", after=after, limit=limit, fields=fields, state=state, district=district,
+        crop=crop, severity=severity, history_format=history_format, media_type=media_type
+    )
+    body, page_headers = await read_through(key, ["villages"], load_page, encode, etag=headers["ETag"])
+    return json_response(body, {**headers, **page_headers, "Vary": "Accept"}, media_type)
 
 @api_router.get("/villages/{village_id}", response_model=Village)
-async def get_village(village_id: str):
-    """Get a specific village by ID"""
-    village = await db.villages.find_one({"id": village_id})
-    if not village:
+async def get_village(
+    village_id: str,
+    request: Request,
+    history_format: str = Query("rows", pattern="^(rows|columns)$")
+):
+    """Get a specific village by ID, encoded like GET /api/villages"""
+    media_type, encode = village_encoding(request)
+    unchanged, headers = await conditional_get(request, "village", "villages", variant=media_type)
+    if unchanged:
+        return unchanged
+
+    async def load_village():
+        village = await storage.villages.get(village_id)
+        if not village:
+            return None
+        village = {**VILLAGE_DEFAULTS, **village}
+        return (with_history_columns(village) if history_format == "columns" else village), {}
+
+    key = cache_key("village", id=village_id, history_format=history_format, media_type=media_type)
+    cached = await read_through(key, [f"village:{village_id}"], load_village, encode, etag=headers["ETag"])
+    if not cached:
         raise HTTPException(status_code=404, detail="Village not found")
-    return Village(**village)
+    return json_response(cached[0], {**headers, "Vary": "Accept"}, media_type)
 
 @api_router.post("/villages", response_model=Village)
 async def create_village(village: VillageCreate):
     """Create a new village"""
+    if len(village.coords) != 2 or not (-90 <= village.coords[0] <= 90 and -180 <= village.coords[1] <= 180):
+        raise HTTPException(status_code=422, detail="coords must be [latitude, longitude]")
     village_dict = village.dict()
     village_obj = Village(**village_dict)
-    await db.villages.insert_one(village_obj.dict())
+    await storage.villages.insert_many([village_obj.dict()])
+    await invalidate_villages()
+    await bump_dashboard_stats(total_villages=1)
     return village_obj
 
-@api_router.post("/simulate/trigger")
-async def trigger_simulation(trigger: SimulationTrigger):
-    """Trigger a simulation scenario for a village"""
-    village = await db.villages.find_one({"id": trigger.village_id})
-    if not village:
+@api_router.post("/villages/{village_id}/readings", response_model=SensorReading)
+async def add_reading(village_id: str, reading: SensorReading):
+    """Record a sensor reading for a village"""
+    try:
+        doc = reading_document(village_id, reading)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid reading timestamp")
+
+    village = await storage.villages.push_reading(village_id, reading.dict(), datetime.now(timezone.utc), ALERT_VILLAGE_FIELDS)
+    if village is None:
         raise HTTPException(status_code=404, detail="Village not found")
-    
-    # Create alert based on scenario
-    alert_messages = {
-        "drought": f"DROUGHT ALERT: Critical water shortage detected in {village['name']}. Immediate irrigation required.",
-        "flood": f"FLOOD WARNING: Heavy rainfall predicted for {village['name']}. Prepare drainage systems.",
-        "pest": f"PEST ALERT: Pest infestation detected in {village['name']} {village['crop']} fields.",
-        "disease": f"DISEASE WARNING: Crop disease outbreak in {village['name']}. Contact agricultural officer."
+
+    await storage.readings.insert_one(doc)
+    if edge_log:
+        await edge_log.append_readings([{**reading.dict(), "village_id": village_id}])
+    await invalidate_villages(village_id)
+    await collection_versions.bump("readings")
+    await raise_rule_alerts([doc], {village_id: village})
+    return reading
+
+@api_router.get("/villages/{village_id}/readings", response_model=List[SensorReading])
+async def get_readings(
+    village_id: str,
+    request: Request,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Get the full sensor history of a village, oldest first"""
+    unchanged, headers = await conditional_get(request, "readings", "readings")
+    if unchanged:
+        return unchanged
+
+    time_range = parse_time_range(since, until)
+    readings = await storage.readings.find(village_id, time_range, limit)
+    return json_response(encode_response(readings), headers)
+
+@api_router.get("/villages/{village_id}/readings/aggregate")
+async def aggregate_readings(
+    village_id: str,
+    request: Request,
+    bucket: str = Query("1d", pattern="^(1h|1d|1w)$"),
+    metrics: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3, le=10000)
+):
+    """Get min/max/mean/last of each sensor metric per time bucket, oldest first.
+
+    ``metrics`` is a comma-separated subset of the sensor fields (all by
+    default). With ``points`` each series is downsampled with LTTB to at
+    most that many buckets, so chart payloads stay small for long ranges.
+    """
+    requested = [name.strip() for name in metrics.split(",") if name.strip()] if metrics else METRICS
+    unknown = set(requested) - set(METRICS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metrics: {', '.join(sorted(unknown))}")
+
+    time_range = parse_time_range(since, until)
+    unchanged, headers = await conditional_get(request, "readings", "readings")
+    if unchanged:
+        return unchanged
+
+    rows = await storage.readings.aggregate(village_id, time_range, bucket, requested)
+    series = bucket_series(rows, requested)
+    if points:
+        series = {metric: lttb(values, points) for metric, values in series.items()}
+
+    return json_response(encode_response({"village_id": village_id, "bucket": bucket, "series": series}), headers)
+
+# Rows accepted by /readings/bulk whose writes have not completed yet
+bulk_pending_rows = 0
+
+@api_router.post("/readings/bulk")
+async def bulk_add_readings(rows: List[Dict[str, Any]] = Body(...)):
+    """Ingest sensor readings for many villages in one request.
+
+    Invalid rows and rows for unknown villages are reported back by index
+    without failing the rest of the batch.
+    """
+    return await ingest_readings(rows)
+
+async def ingest_readings(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validate and store reading rows, answering 413 or 429 when the batch cannot be taken now"""
+    global bulk_pending_rows
+
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BULK_MAX_ROWS} rows")
+    if bulk_pending_rows + len(rows) > BULK_MAX_PENDING_ROWS:
+        raise HTTPException(
+            status_code=429,
+            detail="Ingest queue is full, retry later",
+            headers={"Retry-After": str(BULK_RETRY_AFTER_SECONDS)}
+        )
+
+    rejected = []
+    valid = []  # (row index, reading)
+    for index, row in enumerate(rows):
+        try:
+            reading = BulkReading(**row)
+            parse_timestamp(reading.timestamp)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            rejected.append({"index": index, "error": errors})
+            continue
+        except (ValueError, TypeError):
+            rejected.append({"index": index, "error": "timestamp: Invalid ISO-8601 timestamp"})
+            continue
+        valid.append((index, reading))
+
+    bulk_pending_rows += len(rows)
+    try:
+        village_ids = {reading.village_id for _, reading in valid}
+        known = await storage.villages.find(VillageQuery(ids=list(village_ids)), ALERT_VILLAGE_FIELDS)
+        known_villages = {village["id"]: village for village in known}
+
+        accepted = []
+        for index, reading in valid:
+            if reading.village_id in known_villages:
+                accepted.append((index, reading))
+            else:
+                rejected.append({"index": index, "error": "Village not found"})
+
+        # Write the time series in fixed-size unordered chunks
+        stored = []
+        for start in range(0, len(accepted), BULK_CHUNK_SIZE):
+            chunk = accepted[start:start + BULK_CHUNK_SIZE]
+            docs = [reading_document(reading.village_id, SensorReading(**reading.dict(exclude={"village_id"}))) for _, reading in chunk]
+            failed = set()
+            for position, error in await storage.readings.insert_many(docs):
+                failed.add(position)
+                rejected.append({"index": chunk[position][0], "error": error})
+            stored.extend(row for position, row in enumerate(chunk) if position not in failed)
+
+        # Refresh each village's embedded summary with one push per village
+        summaries: Dict[str, List[Dict[str, Any]]] = {}
+        for _, reading in stored:
+            summaries.setdefault(reading.village_id, []).append(reading.dict(exclude={"village_id"}))
+        await storage.villages.push_readings(summaries, datetime.now(timezone.utc))
+        if edge_log:
+            await edge_log.append_readings([reading.dict() for _, reading in stored])
+        if summaries:
+            await invalidate_villages(*summaries)
+            await collection_versions.bump("readings")
+        alerts = await raise_rule_alerts([reading.dict() for _, reading in stored], known_villages)
+    finally:
+        bulk_pending_rows -= len(rows)
+
+    rejected.sort(key=lambda reject: reject["index"])
+    return {
+        "received": len(rows),
+        "accepted": len(stored),
+        "rejected": rejected,
+        "villages_updated": len(summaries),
+        "alerts_raised": len(alerts)
     }
-    
-    alert = Alert(
-        village_id=trigger.village_id,
-        alert_type=trigger.scenario,
-        message=alert_messages.get(trigger.scenario, f"Alert triggered for {village['name']}"),
-        severity=trigger.severity
+
+async def record_alerts(alerts: List[Alert]):
+    """Store new alerts and update the village summaries, statistics and subscribers.
+
+    However many alerts and villages are involved this is one write of the
+    alerts and one of the village summaries, plus a count of critical
+    villages when needed.
+    """
+    if not alerts:
+        return
+    await storage.alerts.insert_many([alert.dict() for alert in alerts])
+    await apply_alert_effects(alerts)
+
+async def apply_alert_effects(alerts: List[Alert]):
+    """Update the village summaries, statistics and subscribers for stored alerts.
+
+    The alerts are marked applied only at the end. Should this fail part
+    way they stay pending, and the job or sync batch that stored them
+    applies them again when retried. The steps that had already completed
+    are then repeated: village severity counts and statistics can count
+    those alerts twice until POST /api/dashboard/stats/rebuild, and
+    subscribers may see them twice.
+    """
+    if edge_log:
+        await edge_log.append_alerts([alert.dict() for alert in alerts])
+
+    messages: Dict[str, List[str]] = {}
+    counts: Dict[str, Dict[str, int]] = {}
+    for alert in alerts:
+        messages.setdefault(alert.village_id, []).append(alert.message)
+        by_severity = counts.setdefault(alert.village_id, {})
+        by_severity[alert.severity] = by_severity.get(alert.severity, 0) + 1
+    await storage.villages.add_alerts(messages, counts, datetime.now(timezone.utc))
+
+    critical_alerts = sum(1 for alert in alerts if alert.severity == "critical")
+    totals = None
+    if critical_alerts:
+        # A bulk write cannot report which villages just became critical, so recount them
+        totals = {"critical_villages": await storage.villages.count_with_highest("critical")}
+    await invalidate_villages(*messages)
+    await invalidate_alerts(*messages)
+    await bump_dashboard_stats(totals, active_alerts=len(alerts), critical_alerts=critical_alerts)
+    await storage.alerts.effects_applied([alert.id for alert in alerts])
+    for alert in alerts:
+        alert_broker.publish("alert.created", alert.dict())
+
+async def raise_rule_alerts(readings: List[Dict[str, Any]], villages: Dict[str, Dict[str, Any]]) -> List[Alert]:
+    """Evaluate the alert rules against stored readings and raise the alerts they call for"""
+    if not ALERT_RULES_ENABLED:
+        return []
+    candidates = alert_engine.evaluate(readings, villages)
+    if not candidates:
+        return []
+
+    village_ids, alert_types, since = alert_engine.recent_window(candidates, datetime.now(timezone.utc))
+    existing = await storage.alerts.find_recent(village_ids, alert_types, since)
+    alerts = [
+        Alert(village_id=candidate.village_id, alert_type=candidate.alert_type,
+              message=candidate.message, severity=candidate.severity)
+        for candidate in alert_engine.suppress(candidates, existing)
+    ]
+    await record_alerts(alerts)
+    return alerts
+
+# Alert messages for simulated scenarios, formatted with the village document
+SCENARIO_MESSAGES = {
+    "drought": "DROUGHT ALERT: Critical water shortage detected in {name}. Immediate irrigation required.",
+    "flood": "FLOOD WARNING: Heavy rainfall predicted for {name}. Prepare drainage systems.",
+    "pest": "PEST ALERT: Pest infestation detected in {name} {crop} fields.",
+    "disease": "DISEASE WARNING: Crop disease outbreak in {name}. Contact agricultural officer."
+}
+
+def scenario_alert(scenario: str, severity: str, village: Dict[str, Any]) -> Alert:
+    """Create the alert a simulated scenario raises for a village"""
+    template = SCENARIO_MESSAGES.get(scenario, "Alert triggered for {name}")
+    return Alert(
+        village_id=village["id"],
+        alert_type=scenario,
+        message=template.format(name=village["name"], crop=village["crop"]),
+        severity=severity
     )
+
+@job_queue.handler("simulation.alert")
+async def record_simulated_alert(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Store an alert enqueued by POST /api/simulate/trigger.
+
+    A retry stores the alert only if no earlier attempt did, and applies its
+    effects if the attempt that stored it failed before applying them all.
+    """
+    alert = Alert(**payload["alert"])
+    if not await storage.alerts.exists(alert.id):
+        await record_alerts([alert])
+    elif await storage.alerts.pending_effects([alert.id]):
+        await apply_alert_effects([alert])
+    return {"alert_id": alert.id}
+
+@api_router.post("/simulate/trigger")
+async def trigger_simulation(trigger: SimulationTrigger):
+    """Trigger a simulation scenario for a village.
+
+    Responds once the alert is enqueued. Storing it and updating the village,
+    the dashboard statistics and the alert stream happen in the background;
+    follow them with GET /api/jobs/{job_id}.
+    """
+    if trigger.severity not in SEVERITIES:
+        raise HTTPException(status_code=422, detail=f"Severity must be one of: {', '.join(SEVERITIES)}")
     
-    # Save alert
-    await db.alerts.insert_one(alert.dict())
+    villages = await storage.villages.find(VillageQuery(ids=[trigger.village_id]), ALERT_VILLAGE_FIELDS, 1)
+    if not villages:
+        raise HTTPException(status_code=404, detail="Village not found")
     
-    # Update village alerts
-    await db.villages.update_one(
-        {"id": trigger.village_id},
-        {"$push": {"alerts": alert.message}, "$set": {"last_updated": datetime.now(timezone.utc)}}
-    )
+    alert = scenario_alert(trigger.scenario, trigger.severity, villages[0])
+    
+    job = await job_queue.enqueue("simulation.alert", {"alert": alert.dict()})
     
     return {
         "message": f"Simulation '{trigger.scenario}' triggered for village {trigger.village_id}",
         "alert": alert.dict(),
+        "job_id": job["id"],
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+@api_router.post("/simulate/batch")
+async def trigger_simulation_batch(batch: SimulationBatch):
+    """Trigger a simulation scenario for every village matching a filter.
+
+    Villages are selected by ``village_ids`` and/or ``state``, ``district``
+    and ``crop``; at least one must be given. The villages are resolved with
+    one query and all alerts are written in bulk.
+    """
+    if batch.severity not in SEVERITIES:
+        raise HTTPException(status_code=422, detail=f"Severity must be one of: {', '.join(SEVERITIES)}")
+
+    query = VillageQuery(ids=batch.village_ids, state=batch.state, district=batch.district, crop=batch.crop)
+    if query == VillageQuery():
+        raise HTTPException(status_code=422, detail="Select villages with village_ids, state, district or crop")
+
+    villages = await storage.villages.find(query, ALERT_VILLAGE_FIELDS, SIMULATION_BATCH_MAX_VILLAGES + 1)
+    if len(villages) > SIMULATION_BATCH_MAX_VILLAGES:
+        raise HTTPException(status_code=413, detail=f"Filter matches more than {SIMULATION_BATCH_MAX_VILLAGES} villages")
+
+    alerts = [scenario_alert(batch.scenario, batch.severity, village) for village in villages]
+    await record_alerts(alerts)
+
+    found = {village["id"] for village in villages}
+    return {
+        "message": f"Simulation '{batch.scenario}' triggered for {len(villages)} villages",
+        "villages_matched": len(villages),
+        "alerts_created": len(alerts),
+        "villages_not_found": len(set(batch.village_ids or []) - found),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 @api_router.get("/alerts", response_model=List[Alert])
-async def get_alerts(active_only: bool = True):
+async def get_alerts(request: Request, active_only: bool = True):
     """Get all alerts, optionally filter for active ones"""
-    filter_query = {"is_active": True} if active_only else {}
-    alerts = await db.alerts.find(filter_query).sort("timestamp", -1).to_list(100)
-    return [Alert(**alert) for alert in alerts]
+    unchanged, headers = await conditional_get(request, "alerts", "alerts")
+    if unchanged:
+        return unchanged
+
+    async def load_alerts():
+        return await storage.alerts.find(active_only, 100), {}
+
+    key = cache_key("alerts", active_only=active_only)
+    body, _ = await read_through(key, ["alerts"], load_alerts, etag=headers["ETag"])
+    return json_response(body, headers)
 
 @api_router.get("/alerts/{village_id}", response_model=List[Alert])
-async def get_village_alerts(village_id: str):
+async def get_village_alerts(village_id: str, request: Request):
     """Get alerts for a specific village"""
-    alerts = await db.alerts.find({"village_id": village_id}).sort("timestamp", -1).to_list(100)
-    return [Alert(**alert) for alert in alerts]
+    unchanged, headers = await conditional_get(request, "village_alerts", "alerts")
+    if unchanged:
+        return unchanged
+
+    async def load_alerts():
+        return await storage.alerts.for_village(village_id, 100), {}
+
+    key = cache_key("village_alerts", village_id=village_id)
+    body, _ = await read_through(key, [f"alerts:{village_id}"], load_alerts, etag=headers["ETag"])
+    return json_response(body, headers)
+
+async def deactivate_alert(alert_id: str) -> Optional[Dict[str, Any]]:
+    """Mark an active alert dismissed and update everything derived from it.
+
+    Returns the alert as it was before, or None when it was not active.
+    """
+    previous = await storage.alerts.deactivate(alert_id, datetime.now(timezone.utc))
+    if previous is None:
+        return None
+    critical_villages = 0
+    if previous.get("severity") in SEVERITIES:
+        critical_villages = await update_severity_summary(previous["village_id"], previous["severity"], -1)
+    await invalidate_villages(previous["village_id"])
+    await invalidate_alerts(previous["village_id"])
+    await bump_dashboard_stats(
+        active_alerts=-1,
+        critical_alerts=-1 if previous.get("severity") == "critical" else 0,
+        critical_villages=critical_villages
+    )
+    alert_broker.publish("alert.dismissed", {"id": alert_id, "village_id": previous["village_id"]})
+    return previous
 
 @api_router.patch("/alerts/{alert_id}/dismiss")
 async def dismiss_alert(alert_id: str):
     """Dismiss an active alert"""
-    result = await db.alerts.update_one(
-        {"id": alert_id},
-        {"$set": {"is_active": False}}
-    )
-    if result.matched_count == 0:
+    if await deactivate_alert(alert_id) is None and not await storage.alerts.exists(alert_id):
         raise HTTPException(status_code=404, detail="Alert not found")
     return {"message": "Alert dismissed successfully"}
 
+async def archive_alerts() -> Dict[str, int]:
+    """Expire old active alerts and move settled dismissed alerts to the archive"""
+    now = datetime.now(timezone.utc)
+    expired = 0
+    if ALERT_EXPIRE_SECONDS > 0:
+        cutoff = now - timedelta(seconds=ALERT_EXPIRE_SECONDS)
+        for alert_id in await storage.alerts.active_before(cutoff, ALERT_ARCHIVE_BATCH_SIZE):
+            if await deactivate_alert(alert_id) is not None:
+                expired += 1
+
+    cutoff = now - timedelta(seconds=ALERT_ARCHIVE_AFTER_SECONDS)
+    archived, village_ids = await storage.alerts.archive_dismissed(cutoff, now, ALERT_ARCHIVE_BATCH_SIZE)
+    if village_ids:
+        await invalidate_alerts(*village_ids)
+    return {"expired": expired, "archived": archived}
+
+async def run_alert_archiver():
+    """Archive alerts every ALERT_ARCHIVE_INTERVAL_SECONDS until cancelled"""
+    while True:
+        await asyncio.sleep(ALERT_ARCHIVE_INTERVAL_SECONDS)
+        try:
+            result = await archive_alerts()
+            if result["expired"] or result["archived"]:
+                logging.info(f"Expired {result['expired']} and archived {result['archived']} alerts")
+        except Exception:
+            logging.exception("Alert archival failed")
+
+@api_router.post("/alerts/archive")
+async def archive_alerts_now():
+    """Run the alert archival job immediately"""
+    return await archive_alerts()
+
+@api_router.get("/stream/alerts")
+async def stream_alerts(request: Request, last_event_id: Optional[str] = None):
+    """Stream alert changes as server-sent events.
+
+    Sends ``alert.created`` and ``alert.dismissed`` deltas. Clients resume
+    with the Last-Event-ID header (or ``last_event_id``) and must refetch
+    /api/alerts when they receive a ``reset`` event.
+    """
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        alert_broker.stream(resume_from, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats():
+async def get_dashboard_stats(request: Request):
     """Get dashboard statistics"""
-    total_villages = await db.villages.count_documents({})
-    active_alerts = await db.alerts.count_documents({"is_active": True})
-    critical_alerts = await db.alerts.count_documents({"is_active": True, "severity": "critical"})
-    
-    # Get villages with critical conditions
-    critical_villages = await db.villages.find({
-        "alerts": {"$regex": "CRITICAL", "$options": "i"}
-    }).to_list(10)
-    
+    unchanged, headers = await conditional_get(request, "stats", "stats")
+    if unchanged:
+        return unchanged
+
+    stats = await storage.get_stats()
+    if stats is None:
+        stats = await rebuild_dashboard_stats()
+    return json_response(encode_response(dashboard_stats_response(stats)), headers)
+
+@api_router.post("/dashboard/stats/rebuild")
+async def rebuild_stats():
+    """Recompute the dashboard statistics to reconcile any drift"""
+    stats = await rebuild_dashboard_stats()
+    # Severity summaries may have changed on any village
+    await cache.clear()
+    await collection_versions.bump("villages")
+    return dashboard_stats_response(stats)
+
+def marker_query(crop: Optional[str], severity: Optional[str]) -> VillageQuery:
+    """Attribute filters shared by the map routes"""
+    return VillageQuery(crop=crop, severity=severity)
+
+def map_bbox(bbox: str):
+    """Parse the bbox query parameter, answering 422 when it is malformed"""
+    try:
+        return parse_bbox(bbox)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+
+@api_router.get("/map/villages")
+async def get_map_villages(
+    request: Request,
+    bbox: str,
+    limit: int = Query(MAP_MAX_VILLAGES, ge=1, le=MAP_MAX_VILLAGES),
+    crop: Optional[str] = None,
+    severity: Optional[str] = None
+):
+    """Get markers for the villages inside a bounding box.
+
+    ``truncated`` is set when more than ``limit`` villages are in view; the
+    map should then zoom in or switch to /map/clusters.
+    """
+    box = map_bbox(bbox)
+    unchanged, headers = await conditional_get(request, "map", "villages")
+    if unchanged:
+        return unchanged
+
+    async def load_markers():
+        villages = await storage.villages.markers_in_bbox(box, marker_query(crop, severity), limit + 1)
+        return {"count": min(len(villages), limit), "truncated": len(villages) > limit, "villages": villages[:limit]}, {}
+
+    key = cache_key("map_villages", bbox=bbox, limit=limit, crop=crop, severity=severity)
+    body, _ = await read_through(key, ["villages"], load_markers, etag=headers["ETag"])
+    return json_response(body, headers)
+
+@api_router.get("/map/villages/near")
+async def get_villages_near(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    limit: int = Query(100, ge=1, le=MAP_MAX_VILLAGES),
+    crop: Optional[str] = None,
+    severity: Optional[str] = None
+):
+    """Get markers for the villages within a radius of a point, nearest first"""
+    unchanged, headers = await conditional_get(request, "map", "villages")
+    if unchanged:
+        return unchanged
+
+    villages = await storage.villages.markers_near(lat, lon, radius_km, marker_query(crop, severity), limit)
+    return json_response(encode_response({"count": len(villages), "villages": villages}), headers)
+
+@api_router.get("/map/clusters")
+async def get_map_clusters(
+    request: Request,
+    bbox: str,
+    zoom: int = Query(..., ge=0, le=22),
+    crop: Optional[str] = None,
+    severity: Optional[str] = None
+):
+    """Cluster the villages inside a bounding box for a map zoom level.
+
+    Villages are grouped on a grid sized to the zoom level. Each cluster
+    has its village count, mean position and highest alert severity, and
+    clusters of one village also carry its id and name.
+    """
+    box = map_bbox(bbox)
+    unchanged, headers = await conditional_get(request, "map", "villages")
+    if unchanged:
+        return unchanged
+
+    async def load_clusters():
+        clusters = await storage.villages.clusters(box, zoom, marker_query(crop, severity))
+        return {"zoom": zoom, "villages": sum(cluster["count"] for cluster in clusters), "clusters": clusters}, {}
+
+    key = cache_key("map_clusters", bbox=bbox, zoom=zoom, crop=crop, severity=severity)
+    body, _ = await read_through(key, ["villages"], load_clusters, etag=headers["ETag"])
+    return json_response(body, headers)
+
+@api_router.get("/export/{collection}")
+async def export_collection(
+    collection: str,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    village_id: Optional[List[str]] = Query(None),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000)
+):
+    """Stream villages, alerts or readings as NDJSON or CSV.
+
+    Filters by village ids and by a time range on the collection's time
+    field. The last record of every batch carries a ``_cursor`` token;
+    passing it back as ``cursor`` resumes the export after that record.
+    """
+    spec = EXPORTS.get(collection)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {collection}")
+
+    time_range = parse_time_range(since, until)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(spec, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    docs = getattr(storage, spec.collection).export(spec, village_id, time_range, after, batch_size)
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(docs, spec, fmt, batch_size, encode_json),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{fmt}"'}
+    )
+
+class SyncEntry(BaseModel):
+    seq: int
+    kind: str  # "reading" or "alert"
+    data: Dict[str, Any]
+
+class SyncBatch(BaseModel):
+    """Readings and alerts buffered by an edge server, in log order"""
+    edge_id: str
+    entries: List[SyncEntry]
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """Read a request body, answering 413 as soon as it grows past ``max_bytes``"""
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def sync_reading_key(row: Dict[str, Any]) -> Optional[Tuple[str, datetime]]:
+    """The (village_id, ts) of a replayed reading row, or None if ingest will reject it anyway"""
+    if not isinstance(row.get("village_id"), str) or not isinstance(row.get("timestamp"), str):
+        return None
+    try:
+        return row["village_id"], parse_timestamp(row["timestamp"])
+    except ValueError:
+        return None
+
+@api_router.post("/sync/batch")
+async def sync_batch(request: Request):
+    """Apply a batch of readings and alerts replayed from an edge server's log.
+
+    The body may be gzip-compressed (Content-Encoding: gzip). Entries at or
+    below the last seq applied from the same edge log are skipped, and the
+    position only moves once the whole batch is applied. A batch resent
+    after failing part way does not store its alerts or readings twice;
+    readings stored by the failed attempt are then left out of the village
+    summaries and the alert rules, should it have failed before those.
+    Alerts are stored before readings, so the alert rules do not raise
+    again what the edge already raised.
+    Invalid entries are reported by seq and still acknowledged. Bodies over
+    SYNC_MAX_BODY_BYTES, sent or decompressed, are refused with 413.
+    """
+    body = await read_body(request, SYNC_MAX_BODY_BYTES)
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        try:
+            body = gunzip(body, SYNC_MAX_BODY_BYTES)
+        except BodyTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        batch = SyncBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    position = await storage.get_sync_position(batch.edge_id)
+    entries = [entry for entry in batch.entries if entry.seq > position]
+    rejected = []
+
+    alerts = []  # (seq, alert)
+    readings = []
+    for entry in entries:
+        if entry.kind == "reading":
+            readings.append(entry)
+        elif entry.kind == "alert":
+            try:
+                alerts.append((entry.seq, Alert(**entry.data)))
+            except ValidationError as e:
+                rejected.append({"seq": entry.seq, "kind": entry.kind, "error": e.errors()[0]["msg"]})
+        else:
+            rejected.append({"seq": entry.seq, "kind": entry.kind, "error": "Unknown entry kind"})
+
+    created = []
+    if alerts:
+        # Alerts stored by an earlier attempt at this batch are not stored
+        # again, but their effects are applied if that attempt failed first
+        existing = await storage.alerts.existing_ids([alert.id for _, alert in alerts])
+        pending = await storage.alerts.pending_effects(list(existing)) if existing else set()
+        villages = await storage.villages.find(VillageQuery(ids=list({alert.village_id for _, alert in alerts})), ())
+        known = {village["id"] for village in villages}
+        resumed = []
+        for seq, alert in alerts:
+            if alert.village_id not in known:
+                rejected.append({"seq": seq, "kind": "alert", "error": "Village not found"})
+            elif alert.id not in existing:
+                created.append(alert)
+            elif alert.id in pending:
+                resumed.append(alert)
+        await record_alerts(created)
+        if resumed:
+            await apply_alert_effects(resumed)
+
+    if readings:
+        # Readings stored by an earlier attempt at this batch are not stored again
+        keys = [sync_reading_key(entry.data) for entry in readings]
+        stored = await storage.readings.existing_keys([key for key in keys if key])
+        readings = [entry for entry, key in zip(readings, keys) if key not in stored]
+
+    ingested = {"accepted": 0, "rejected": [], "alerts_raised": 0}
+    if readings:
+        ingested = await ingest_readings([entry.data for entry in readings])
+        rejected.extend(
+            {"seq": readings[reject["index"]].seq, "kind": "reading", "error": reject["error"]}
+            for reject in ingested["rejected"]
+        )
+
+    acked = max([position, *(entry.seq for entry in batch.entries)])
+    await storage.set_sync_position(batch.edge_id, acked)
+    rejected.sort(key=lambda reject: reject["seq"])
+    return {
+        "acked": acked,
+        "skipped": len(batch.entries) - len(entries),
+        "readings_accepted": ingested["accepted"],
+        "alerts_created": len(created),
+        "alerts_raised": ingested["alerts_raised"],
+        "rejected": rejected
+    }
+
+@api_router.get("/sync/status")
+async def get_sync_status():
+    """Get the backlog and progress of this edge server's sync to the central server"""
+    if edge_syncer is None:
+        raise HTTPException(status_code=404, detail="Edge sync is not enabled")
+    return await edge_syncer.status()
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status, attempts and result or last error of a background job"""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return json_response(encode_json(job_status(job)), {"Cache-Control": "no-store"})
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Get read-through cache hit/miss counters for this worker"""
+    return cache.stats()
+
+@api_router.get("/db/pool")
+async def get_pool_stats():
+    """Get the MongoDB connection settings and pool checkout metrics for this worker"""
+    options = storage.pool_options()
+    if options is None:
+        raise HTTPException(status_code=404, detail="The storage backend has no connection pool")
     return {
-        "total_villages": total_villages,
-        "active_alerts": active_alerts,
-        "critical_alerts": critical_alerts,
-        "critical_villages": len(critical_villages),
-        "last_updated": datetime.now(timezone.utc).isoformat()
+        **options,
+        "replica_read_preference": replica_preference.mongos_mode,
+        "pool": pool_metrics.stats()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics for request latency, MongoDB commands and the connection pool"""
+    body, content_type = metrics_exporter.render()
+    return Response(content=body, media_type=content_type)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -288,20 +1433,35 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# Responses are compressed with the best content coding the client accepts
+# (COMPRESSION_ENCODINGS, default brotli when installed, then gzip) once they
+# reach COMPRESSION_MIN_BYTES; an empty COMPRESSION_ENCODINGS turns it off.
+compression_encodings = os.environ.get('COMPRESSION_ENCODINGS')
+app.add_middleware(
+    CompressionMiddleware,
+    factories=compressors(
+        [name.strip() for name in compression_encodings.split(',') if name.strip()]
+        if compression_encodings is not None else None,
+        gzip_level=int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6')),
+        brotli_quality=int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+    ),
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
 )
 
+# Request profiling is only installed when PROFILE_DIR is set
+profiling = profiling_settings()
+if profiling:
+    app.add_middleware(ProfilingMiddleware, **profiling)
+
+# Outermost, so the recorded latency covers the other middleware too
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize sample data on startup"""
-    await initialize_sample_data()
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
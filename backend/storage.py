@@ -0,0 +1,260 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from export import ExportSpec
+from geo import BBox
+
+# A (since, until) pair bounding a time field; either end may be open
+TimeRange = Tuple[Optional[datetime], Optional[datetime]]
+
+
+@dataclass
+class VillageQuery:
+    """Attribute filters for selecting villages; unset fields match everything"""
+    ids: Optional[List[str]] = None
+    state: Optional[str] = None
+    district: Optional[str] = None
+    crop: Optional[str] = None
+    # Highest active alert severity
+    severity: Optional[str] = None
+    # Only villages whose id sorts after this one
+    after: Optional[str] = None
+
+
+class VillageRepository:
+    """Villages with their embedded summaries of recent readings and alerts.
+
+    Villages are returned as plain dicts without storage internals, with the
+    embedded history and alert messages trimmed to the configured sizes.
+    Listings are ordered by id.
+    """
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def count_with_highest(self, severity: str) -> int:
+        """Number of villages whose highest active alert has this severity"""
+        raise NotImplementedError
+
+    async def find(self, query: VillageQuery, fields: Optional[Iterable[str]] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        """Villages matching a query, ordered by id; ``fields`` keeps only those attributes (and id)"""
+        raise NotImplementedError
+
+    async def get(self, village_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def insert_many(self, villages: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    async def insert_missing(self, villages: List[Dict[str, Any]]) -> List[int]:
+        """Insert the villages whose id is not stored yet, returning the positions of those inserted"""
+        raise NotImplementedError
+
+    async def push_reading(self, village_id: str, reading: Dict[str, Any], now: datetime,
+                           fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Add a reading to a village's history, returning the listed fields of the village or None if unknown"""
+        raise NotImplementedError
+
+    async def push_readings(self, readings: Dict[str, List[Dict[str, Any]]], now: datetime):
+        """Add readings to the history of several villages at once"""
+        raise NotImplementedError
+
+    async def add_alerts(self, messages: Dict[str, List[str]], counts: Dict[str, Dict[str, int]], now: datetime):
+        """Append alert messages to villages and count the alerts in their severity summaries"""
+        raise NotImplementedError
+
+    async def adjust_severity(self, village_id: str, severity: str, delta: int) -> Optional[Dict[str, Any]]:
+        """Change a village's active alert count for one severity, returning the summary as it was before"""
+        raise NotImplementedError
+
+    async def replace_severity_summaries(self, summaries: Dict[str, Dict[str, Any]], empty: Dict[str, Any]):
+        """Set the given villages' severity summaries and reset every other village to ``empty``"""
+        raise NotImplementedError
+
+    async def markers_in_bbox(self, bbox: BBox, query: VillageQuery, limit: int) -> List[Dict[str, Any]]:
+        """Map markers (id, name, district, state, crop, coords and highest severity) inside a bounding box"""
+        raise NotImplementedError
+
+    async def markers_near(self, latitude: float, longitude: float, radius_km: float,
+                           query: VillageQuery, limit: int) -> List[Dict[str, Any]]:
+        """Map markers within a radius of a point, nearest first, with their distance_km"""
+        raise NotImplementedError
+
+    async def clusters(self, bbox: BBox, zoom: int, query: VillageQuery) -> List[Dict[str, Any]]:
+        """Grid clusters of the villages inside a bounding box, as described by geo.cluster_pipeline"""
+        raise NotImplementedError
+
+    def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+               after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """Records to export in ``spec.sort`` order, resuming after the given sort key values"""
+        raise NotImplementedError
+
+
+class AlertRepository:
+    """Raised alerts, and the archive that settled ones are moved to"""
+
+    async def insert_many(self, alerts: List[Dict[str, Any]]):
+        """Store new alerts, marked as having effects pending until effects_applied is called for them"""
+        raise NotImplementedError
+
+    async def find(self, active_only: bool, limit: int) -> List[Dict[str, Any]]:
+        """Most recent alerts first"""
+        raise NotImplementedError
+
+    async def for_village(self, village_id: str, limit: int) -> List[Dict[str, Any]]:
+        """A village's most recent alerts first"""
+        raise NotImplementedError
+
+    async def find_recent(self, village_ids: List[str], alert_types: List[str], since: datetime) -> List[Dict[str, Any]]:
+        """Village id, type and severity of alerts that are active or were raised since a time"""
+        raise NotImplementedError
+
+    async def exists(self, alert_id: str) -> bool:
+        raise NotImplementedError
+
+    async def existing_ids(self, alert_ids: List[str]) -> Set[str]:
+        """Those of the given ids that belong to stored alerts"""
+        raise NotImplementedError
+
+    async def pending_effects(self, alert_ids: List[str]) -> Set[str]:
+        """Those of the given ids that belong to stored alerts whose effects are still pending"""
+        raise NotImplementedError
+
+    async def effects_applied(self, alert_ids: List[str]):
+        """Record that the village summaries, statistics and subscribers were updated for these alerts"""
+        raise NotImplementedError
+
+    async def deactivate(self, alert_id: str, now: datetime) -> Optional[Dict[str, Any]]:
+        """Dismiss an active alert, returning its village_id and severity, or None when it was not active"""
+        raise NotImplementedError
+
+    async def active_before(self, before: datetime, limit: int) -> List[str]:
+        """Ids of active alerts raised before a time"""
+        raise NotImplementedError
+
+    async def archive_dismissed(self, before: datetime, now: datetime, batch_size: int) -> Tuple[int, Set[str]]:
+        """Move alerts dismissed before a time to the archive, returning the count and their village ids"""
+        raise NotImplementedError
+
+    async def count_active(self, severity: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    async def active_counts(self) -> Dict[str, Dict[str, int]]:
+        """Active alert counts by village id and severity"""
+        raise NotImplementedError
+
+    def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+               after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class ReadingRepository:
+    """The full sensor time series of every village"""
+
+    async def insert_one(self, reading: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def insert_many(self, readings: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+        """Store readings, returning the position and error of any that could not be written"""
+        raise NotImplementedError
+
+    async def existing_keys(self, keys: List[Tuple[str, datetime]]) -> Set[Tuple[str, datetime]]:
+        """Those of the given (village_id, ts) pairs that belong to stored readings, ts in UTC"""
+        raise NotImplementedError
+
+    async def find(self, village_id: str, time_range: TimeRange, limit: int) -> List[Dict[str, Any]]:
+        """A village's readings, oldest first, without village_id and ts"""
+        raise NotImplementedError
+
+    async def aggregate(self, village_id: str, time_range: TimeRange, bucket: str, metrics: List[str]) -> List[Dict[str, Any]]:
+        """Per-bucket statistics rows as produced by timeseries.aggregation_pipeline, oldest first"""
+        raise NotImplementedError
+
+    def export(self, spec: ExportSpec, village_ids: Optional[List[str]], time_range: TimeRange,
+               after: Optional[List[Any]], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class JobRepository:
+    """Background jobs, shared by the job workers of every API process.
+
+    A job is due at its ``due_at``: the time of its next attempt while it
+    is queued, and the end of its lease while it is running.
+    """
+
+    async def insert(self, job: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def claim(self, now: datetime, lease_until: datetime) -> Optional[Dict[str, Any]]:
+        """Start the job that has been due the longest, leasing it until ``lease_until``, and return it"""
+        raise NotImplementedError
+
+    async def finish(self, job_id: str, attempts: int, update: Dict[str, Any]) -> bool:
+        """Record the outcome of an attempt, unless the job was claimed again since; returns whether it was recorded"""
+        raise NotImplementedError
+
+
+class Storage:
+    """Where the API keeps its data: the repositories plus a few small documents.
+
+    Besides villages, alerts and readings a backend stores the materialized
+    dashboard statistics, the change counters behind the ETags, one-time
+    markers such as the sample data seeding marker and how far each edge
+    server's log has been applied.
+    """
+
+    villages: VillageRepository
+    alerts: AlertRepository
+    readings: ReadingRepository
+    jobs: JobRepository
+
+    async def prepare(self):
+        """Create collections and indexes and migrate old documents"""
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def clear(self):
+        """Remove every village, alert, reading and the statistics"""
+        raise NotImplementedError
+
+    async def has_marker(self, name: str) -> bool:
+        raise NotImplementedError
+
+    async def set_marker(self, name: str, now: datetime):
+        raise NotImplementedError
+
+    async def get_stats(self) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def replace_stats(self, stats: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def update_stats(self, totals: Dict[str, Any], deltas: Dict[str, int]):
+        """Overwrite ``totals`` and add ``deltas`` to the statistics, if they exist"""
+        raise NotImplementedError
+
+    async def read_versions(self, names: List[str]) -> Dict[str, int]:
+        """Change counters of the named collections; missing ones are omitted"""
+        raise NotImplementedError
+
+    async def bump_version(self, name: str) -> int:
+        """Increment a change counter and return its new value"""
+        raise NotImplementedError
+
+    async def get_sync_position(self, edge_id: str) -> int:
+        """The last seq applied from an edge server's log, 0 before the first batch"""
+        raise NotImplementedError
+
+    async def set_sync_position(self, edge_id: str, seq: int):
+        """Advance an edge server's sync position; it never moves back"""
+        raise NotImplementedError
+
+    def pool_options(self) -> Optional[Dict[str, Any]]:
+        """Connection pool settings, or None when the backend has no pool"""
+        raise NotImplementedError
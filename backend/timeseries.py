@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sensor fields that can be aggregated
+METRICS = ["soil_moisture", "temperature", "humidity", "ph_level"]
+
+# Bucket widths accepted by the aggregate route, as $dateTrunc arguments
+BUCKETS = {
+    "1h": {"unit": "hour", "binSize": 1},
+    "1d": {"unit": "day", "binSize": 1},
+    "1w": {"unit": "week", "binSize": 1, "startOfWeek": "monday"},
+}
+
+STATISTICS = ["min", "max", "mean", "last"]
+
+
+def aggregation_pipeline(
+    village_id: str,
+    time_range: Dict[str, datetime],
+    bucket: str,
+    metrics: List[str]
+) -> List[Dict[str, Any]]:
+    """Build the pipeline computing min/max/mean/last of each metric per time bucket.
+
+    Buckets are aligned to UTC and returned oldest first. Readings are sorted
+    by ``ts`` before grouping so ``last`` is the latest reading in the bucket.
+    """
+    match: Dict[str, Any] = {"village_id": village_id}
+    if time_range:
+        match["ts"] = time_range
+
+    group: Dict[str, Any] = {
+        "_id": {"$dateTrunc": {"date": "$ts", "timezone": "UTC", **BUCKETS[bucket]}},
+        "count": {"$sum": 1},
+    }
+    for metric in metrics:
+        group[f"{metric}_min"] = {"$min": f"${metric}"}
+        group[f"{metric}_max"] = {"$max": f"${metric}"}
+        group[f"{metric}_mean"] = {"$avg": f"${metric}"}
+        group[f"{metric}_last"] = {"$last": f"${metric}"}
+
+    return [
+        {"$match": match},
+        {"$sort": {"ts": 1}},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def bucket_start(ts: datetime, bucket: str) -> datetime:
+    """Start of the UTC bucket a time falls in, as $dateTrunc computes it with BUCKETS"""
+    start = ts.replace(minute=0, second=0, microsecond=0)
+    if bucket == "1h":
+        return start
+    start = start.replace(hour=0)
+    if bucket == "1w":
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def aggregate_readings(readings: List[Dict[str, Any]], bucket: str, metrics: List[str]) -> List[Dict[str, Any]]:
+    """Compute the rows of aggregation_pipeline in Python from readings sorted by ``ts``"""
+    rows: Dict[datetime, Dict[str, Any]] = {}
+    totals: Dict[Tuple[datetime, str], Tuple[float, int]] = {}
+    for reading in readings:
+        start = bucket_start(reading["ts"], bucket)
+        row = rows.get(start)
+        if row is None:
+            row = rows[start] = {"_id": start, "count": 0}
+            for metric in metrics:
+                for statistic in STATISTICS:
+                    row[f"{metric}_{statistic}"] = None
+        row["count"] += 1
+        for metric in metrics:
+            value = reading.get(metric)
+            # $last takes the last reading's value even when it is missing
+            row[f"{metric}_last"] = value
+            if value is None:
+                continue
+            low, high = row[f"{metric}_min"], row[f"{metric}_max"]
+            row[f"{metric}_min"] = value if low is None else min(low, value)
+            row[f"{metric}_max"] = value if high is None else max(high, value)
+            total, count = totals.get((start, metric), (0.0, 0))
+            totals[(start, metric)] = (total + value, count + 1)
+    for (start, metric), (total, count) in totals.items():
+        rows[start][f"{metric}_mean"] = total / count
+    return [rows[start] for start in sorted(rows)]
+
+
+def bucket_series(rows: List[Dict[str, Any]], metrics: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Split grouped rows into one series of bucket statistics per metric"""
+    series: Dict[str, List[Dict[str, Any]]] = {metric: [] for metric in metrics}
+    for row in rows:
+        for metric in metrics:
+            if row.get(f"{metric}_mean") is None:
+                continue
+            point = {"t": row["_id"], "count": row["count"]}
+            for statistic in STATISTICS:
+                point[statistic] = row[f"{metric}_{statistic}"]
+            series[metric].append(point)
+    return series
+
+
+def lttb(points: List[Dict[str, Any]], threshold: int, value: str = "mean") -> List[Dict[str, Any]]:
+    """Downsample a series to ``threshold`` points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. Every other kept point is the
+    one in its bucket forming the largest triangle with the previously kept
+    point and the average of the next bucket, which preserves peaks and dips
+    that plain striding would drop.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+
+    xs = [(point["t"] - points[0]["t"]).total_seconds() for point in points]
+    ys = [point[value] for point in points]
+    every = (len(points) - 2) / (threshold - 2)
+
+    sampled = [points[0]]
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best: Optional[int] = None
+        best_area = -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,31 @@
+import time
+from typing import Callable, Dict, Tuple
+
+
+class CollectionVersions:
+    """Per-collection change counters used to derive ETags.
+
+    Counters are kept by the storage backend so every worker sees writes
+    made by the others. Each worker keeps its last read of a counter for
+    ``ttl_seconds`` and bumps its own copy immediately on local writes, so
+    most conditional requests are answered without touching the database.
+    """
+
+    def __init__(self, storage: Callable, ttl_seconds: float = 1.0):
+        self._storage = storage
+        self.ttl_seconds = ttl_seconds
+        self._local: Dict[str, Tuple[float, int]] = {}
+
+    async def get(self, *names: str) -> Dict[str, int]:
+        now = time.monotonic()
+        stale = [name for name in names if name not in self._local or self._local[name][0] < now]
+        if stale:
+            found = await self._storage().read_versions(stale)
+            for name in stale:
+                self._local[name] = (now + self.ttl_seconds, found.get(name, 0))
+        return {name: self._local[name][1] for name in names}
+
+    async def bump(self, *names: str):
+        now = time.monotonic()
+        for name in names:
+            self._local[name] = (now + self.ttl_seconds, await self._storage().bump_version(name))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Alert rule engine benchmark.
+
+Measures how many readings per second RuleEngine.evaluate() gets through
+on one core for bulk-ingest sized batches, with the default rules and a
+mix of crops and soils. No database is needed.
+
+    python benchmarks/bench_alert_rules.py --batches 1000 10000 --villages 500
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from rules import DEFAULT_RULES, RuleEngine  # noqa: E402
+
+SEVERITIES = ["low", "medium", "high", "critical"]
+CROPS = ["paddy", "sugarcane", "soybean", "coconut+paddy", "cotton", "wheat"]
+SOILS = ["clayey", "alluvial", "sandy loam", "laterite", "black"]
+
+
+def make_villages(count: int) -> Dict[str, dict]:
+    return {
+        f"village-{i:05d}": {
+            "id": f"village-{i:05d}",
+            "name": f"Village {i}",
+            "crop": CROPS[i % len(CROPS)],
+            "soil_type": SOILS[i % len(SOILS)]
+        }
+        for i in range(count)
+    }
+
+
+def make_readings(count: int, village_ids: List[str], seed: int = 7) -> List[dict]:
+    """Readings shaped like the rows stored by POST /api/readings/bulk"""
+    rng = random.Random(seed)
+    return [
+        {
+            "village_id": rng.choice(village_ids),
+            "day": f"Day {i}",
+            "soil_moisture": rng.uniform(8, 55),
+            "temperature": rng.uniform(22, 44),
+            "humidity": rng.uniform(40, 95),
+            "ph_level": rng.uniform(5.0, 9.0),
+            "timestamp": "2024-01-01T10:00:00Z"
+        }
+        for i in range(count)
+    ]
+
+
+def measure(engine: RuleEngine, readings: List[dict], villages: Dict[str, dict], repeat: int) -> float:
+    """Median CPU milliseconds per evaluate() call"""
+    engine.evaluate(readings, villages)
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        engine.evaluate(readings, villages)
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--villages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    engine = RuleEngine(DEFAULT_RULES, SEVERITIES)
+    villages = make_villages(args.villages)
+    results = []
+    print(f"{'readings':>10} {'ms':>10} {'readings/s':>12} {'candidates':>11}")
+    for size in args.batches:
+        readings = make_readings(size, list(villages))
+        elapsed = measure(engine, readings, villages, args.repeat)
+        candidates = len(engine.evaluate(readings, villages))
+        rate = size / (elapsed / 1000) if elapsed else float("inf")
+        results.append({"readings": size, "ms": round(elapsed, 2), "readings_per_second": round(rate), "candidates": candidates})
+        print(f"{size:>10} {elapsed:>10.1f} {rate:>12,.0f} {candidates:>11}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"benchmark": "alert_rules", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Edge sync benchmark.
+
+Buffers a week of hourly readings per village, plus some alerts, in an
+EdgeLog the way an edge server does while its uplink is down, then
+replays the log to a central server with EdgeSyncer. Reports the append
+throughput for single readings (POST /api/readings) and bulk batches,
+the replay time and the bytes sent compressed and raw.
+
+The central server is the app running in-process on the in-memory
+storage backend, so no database is needed. Needs httpx.
+
+    python benchmarks/bench_edge_sync.py --villages 100 --days 7 --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from edge_sync import EdgeLog, EdgeSyncer, encode_batch  # noqa: E402
+
+START = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def make_readings(village_ids: List[str], days: int, seed: int) -> List[dict]:
+    """Hourly readings shaped like the rows the edge server stores, oldest first"""
+    rng = random.Random(seed)
+    readings = []
+    for hour in range(days * 24):
+        timestamp = (START + timedelta(hours=hour)).isoformat()
+        for village_id in village_ids:
+            readings.append({
+                "village_id": village_id,
+                "day": f"Day {hour // 24 + 1}",
+                "soil_moisture": round(rng.uniform(8, 55), 1),
+                "temperature": round(rng.uniform(22, 44), 1),
+                "humidity": round(rng.uniform(40, 95), 1),
+                "ph_level": round(rng.uniform(5.0, 9.0), 2),
+                "timestamp": timestamp
+            })
+    return readings
+
+
+def make_alerts(village_ids: List[str], count: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "village_id": rng.choice(village_ids),
+            "alert_type": rng.choice(["drought", "flood", "pest", "disease"]),
+            "message": "Buffered on the edge",
+            "severity": rng.choice(["low", "medium", "high", "critical"]),
+            "timestamp": START + timedelta(minutes=i),
+            "is_active": True,
+            "dismissed_at": None
+        }
+        for i in range(count)
+    ]
+
+
+async def append_single(log: EdgeLog, readings: List[dict]) -> float:
+    """Seconds to append the readings one at a time"""
+    start = time.perf_counter()
+    for reading in readings:
+        await log.append_readings([reading])
+    return time.perf_counter() - start
+
+
+async def append_bulk(log: EdgeLog, readings: List[dict], batch: int) -> float:
+    """Seconds to append the readings in batches"""
+    start = time.perf_counter()
+    for offset in range(0, len(readings), batch):
+        await log.append_readings(readings[offset:offset + batch])
+    return time.perf_counter() - start
+
+
+async def run(args) -> dict:
+    import httpx
+    import server
+    from storage import VillageQuery
+
+    await server.open_storage().prepare()
+    await server.storage.clear()
+    await server.storage.villages.insert_many([
+        {"id": f"village-{i:05d}", "name": f"Village {i}", "state": "Maharashtra", "district": "Pune",
+         "crop": "paddy", "soil_type": "clayey", "coordinates": {"lat": 18.5, "lng": 73.8}}
+        for i in range(args.villages)
+    ])
+    village_ids = [village["id"] for village in await server.storage.villages.find(VillageQuery(), ())]
+    readings = make_readings(village_ids, args.days, args.seed)
+    alerts = make_alerts(village_ids, args.alerts, args.seed)
+    results = {"villages": len(village_ids), "readings": len(readings), "alerts": len(alerts)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        single = EdgeLog(os.path.join(directory, "single.sqlite3"))
+        await single.open()
+        sample = readings[:args.single]
+        elapsed = await append_single(single, sample)
+        await single.close()
+        results["single_appends_per_second"] = round(len(sample) / elapsed)
+
+        log = EdgeLog(os.path.join(directory, "edge.sqlite3"))
+        await log.open()
+        elapsed = await append_bulk(log, readings, args.append_batch)
+        results["bulk_appends_per_second"] = round(len(readings) / elapsed)
+        await log.append_alerts(alerts)
+
+        # Size of the same batches uncompressed, for the compression ratio
+        pending = await log.pending(len(readings) + len(alerts))
+        raw_bytes = sum(
+            len(encode_batch("bench-edge", pending[offset:offset + args.batch_size]))
+            for offset in range(0, len(pending), args.batch_size)
+        )
+
+        syncer = EdgeSyncer(log, "http://central", "bench-edge", batch_size=args.batch_size)
+        transport = httpx.ASGITransport(app=server.app)
+        batches = 0
+        start = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://central", timeout=None) as client:
+            while await syncer.sync_once(client):
+                batches += 1
+        elapsed = time.perf_counter() - start
+        results.update({
+            "sync_batches": batches,
+            "sync_seconds": round(elapsed, 2),
+            "synced_entries_per_second": round(syncer.synced_entries / elapsed),
+            "raw_bytes": raw_bytes,
+            "gzip_bytes": syncer.sent_bytes,
+            "compression_ratio": round(raw_bytes / syncer.sent_bytes, 1),
+            "backlog_after_sync": await log.backlog()
+        })
+        await log.close()
+
+    results["stored_alerts"] = await server.storage.alerts.count_active()
+    await server.close_storage()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--villages", type=int, default=100)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--alerts", type=int, default=500)
+    parser.add_argument("--single", type=int, default=2000, help="readings appended one at a time")
+    parser.add_argument("--append-batch", type=int, default=1000, help="readings per bulk append")
+    parser.add_argument("--batch-size", type=int, default=5000, help="entries per sync request")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["SEED_SAMPLE_DATA"] = "false"
+    results = asyncio.run(run(args))
+    for name, value in results.items():
+        print(f"{name:>28} {value:>12,}" if isinstance(value, int) else f"{name:>28} {value:>12}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"benchmark": "edge_sync", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Payload size benchmark for the village list response.
+
+Encodes a page of villages in each representation GET /api/villages can
+send (history as rows or columns, JSON or MessagePack), compresses it
+with each content coding and reports the bytes on the wire, the CPU time
+to encode and compress, and the transfer time over a slow link. The
+sensor histories are random but seeded, so runs are comparable. No
+database is needed; MessagePack and brotli rows need the msgpack and
+brotli packages from backend/requirements-optional.txt.
+
+    python benchmarks/bench_payloads.py --sizes 100 1000 --link-kbps 64 384 --seed 7
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bench_serialization import make_village_docs  # noqa: E402
+from columnar import MSGPACK_AVAILABLE, encode_msgpack, with_history_columns  # noqa: E402
+from compression import compressors  # noqa: E402
+from server import VILLAGE_DEFAULTS, encode_json  # noqa: E402
+
+
+def representations():
+    """(name, payload builder, encoder) for each body GET /api/villages can send"""
+    rows = lambda docs: [{**VILLAGE_DEFAULTS, **doc} for doc in docs]  # noqa: E731
+    columns = lambda docs: [with_history_columns({**VILLAGE_DEFAULTS, **doc}) for doc in docs]  # noqa: E731
+    found = [("json rows", rows, encode_json), ("json columns", columns, encode_json)]
+    if MSGPACK_AVAILABLE:
+        found += [("msgpack rows", rows, encode_msgpack), ("msgpack columns", columns, encode_msgpack)]
+    return found
+
+
+def codings(gzip_level: int, brotli_quality: int):
+    """(name, compress) pairs, starting with the uncompressed body"""
+    found = [("identity", lambda body: body)]
+    for encoding, factory in compressors(None, gzip_level=gzip_level, brotli_quality=brotli_quality).items():
+        found.append((encoding, lambda body, factory=factory: factory().finish(body)))
+    return found
+
+
+def measure(fn, repeat: int) -> float:
+    """Median CPU milliseconds per call"""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    parser.add_argument("--link-kbps", type=int, nargs="+", default=[64, 384],
+                        help="link speeds to report transfer times for (2G EDGE, 3G)")
+    parser.add_argument("--seed", type=int, default=7, help="seed of the random sensor histories")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    links = "".join(f" {f'{kbps} kbps s':>12}" for kbps in args.link_kbps)
+    print(f"{'villages':>8} {'representation':>16} {'coding':>9} {'bytes':>11} {'ratio':>6} {'encode ms':>10} {'total ms':>9}{links}")
+    for size in args.sizes:
+        docs = make_village_docs(size, seed=args.seed)
+        baseline = None
+        for name, build, encode in representations():
+            encode_ms = measure(lambda: encode(build(docs)), args.repeat)
+            body = encode(build(docs))
+            baseline = baseline or len(body)
+            for coding, compress in codings(args.gzip_level, args.brotli_quality):
+                wire = compress(body)
+                compress_ms = measure(lambda: compress(body), args.repeat) if coding != "identity" else 0.0
+                seconds = [len(wire) * 8 / (kbps * 1000) for kbps in args.link_kbps]
+                results.append({
+                    "villages": size, "representation": name, "coding": coding, "bytes": len(wire),
+                    "encode_ms": round(encode_ms, 2), "compress_ms": round(compress_ms, 2),
+                    "transfer_seconds": dict(zip(map(str, args.link_kbps), (round(s, 2) for s in seconds)))
+                })
+                print(
+                    f"{size:>8} {name:>16} {coding:>9} {len(wire):>11,} {baseline / len(wire):>5.1f}x "
+                    f"{encode_ms:>10.1f} {encode_ms + compress_ms:>9.1f}" + "".join(f" {s:>12.1f}" for s in seconds)
+                )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"benchmark": "payloads", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the village list response.
+
+Compares the CPU time per GET /api/villages response of the old path
+(build Village models, let FastAPI dump and re-validate them against the
+response model, then json.dumps) with the current one (encode the Mongo
+documents once with orjson). No database is needed.
+
+    python benchmarks/bench_serialization.py --sizes 1000 10000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from server import HISTORY_SUMMARY_SIZE, VILLAGE_DEFAULTS, Village, encode_json  # noqa: E402
+
+
+def make_village_docs(count: int, seed: Optional[int] = None) -> List[dict]:
+    """Build village documents shaped like the ones Motor returns.
+
+    Every village has the same history trend unless ``seed`` is given; the
+    readings and their times then vary the way sensor data does, so that
+    payload size comparisons are not flattered by repeated values.
+    """
+    start = datetime(2024, 1, 1, 10, 0, 0)
+    rng = random.Random(seed) if seed is not None else None
+    docs = []
+    for i in range(count):
+        if rng is None:
+            history = [
+                {
+                    "day": f"Day {day + 1}",
+                    "soil_moisture": 30.0 - day * 0.7 + i % 7,
+                    "temperature": 31.0 + day * 0.4,
+                    "humidity": 75.0 - day * 0.9,
+                    "ph_level": 6.8 - day * 0.05,
+                    "timestamp": (start + timedelta(days=day)).isoformat() + "Z"
+                }
+                for day in range(HISTORY_SUMMARY_SIZE)
+            ]
+        else:
+            history = [
+                {
+                    "day": f"Day {day + 1}",
+                    "soil_moisture": round(rng.uniform(8, 55), 1),
+                    "temperature": round(rng.uniform(22, 44), 1),
+                    "humidity": round(rng.uniform(40, 95), 1),
+                    "ph_level": round(rng.uniform(5.0, 9.0), 2),
+                    "timestamp": (start + timedelta(days=day, seconds=rng.randrange(3600))).isoformat() + "Z"
+                }
+                for day in range(HISTORY_SUMMARY_SIZE)
+            ]
+        docs.append({
+            "id": f"village-{i:06d}",
+            "name": f"Village {i}",
+            "district": f"District {i % 40}",
+            "state": "Karnataka",
+            "crop": "paddy",
+            "coords": [12.5 + i * 1e-4, 76.9 - i * 1e-4],
+            "population": 1000 + i % 5000,
+            "area_hectares": 100.0 + i % 300,
+            "soil_type": "clayey",
+            "irrigation_type": "canal",
+            "history": history,
+            "alerts": ["Low soil moisture detected"] if i % 3 == 0 else [],
+            "severity_summary": {"highest": None, "counts": {"low": 0, "medium": 0, "high": 0, "critical": 0}},
+            "last_updated": start
+        })
+    return docs
+
+
+village_list = TypeAdapter(List[Village])
+
+
+def model_path(docs: List[dict]) -> bytes:
+    """What a route returning Village models through response_model costs"""
+    models = [Village(**doc) for doc in docs]
+    # FastAPI dumps returned models and validates them again against the response model
+    validated = village_list.validate_python([model.model_dump() for model in models])
+    return json.dumps(village_list.dump_python(validated, mode="json")).encode()
+
+
+def fast_path(docs: List[dict]) -> bytes:
+    """The current read path: trust the stored documents and encode them once"""
+    return encode_json([{**VILLAGE_DEFAULTS, **doc} for doc in docs])
+
+
+def measure(fn, docs, repeat: int) -> float:
+    """Median CPU milliseconds per call"""
+    fn(docs)
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn(docs)
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'villages':>10} {'models ms':>12} {'orjson ms':>12} {'saved ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        docs = make_village_docs(size)
+        slow = measure(model_path, docs, args.repeat)
+        fast = measure(fast_path, docs, args.repeat)
+        results.append({"villages": size, "model_path_ms": round(slow, 2), "fast_path_ms": round(fast, 2)})
+        print(f"{size:>10} {slow:>12.1f} {fast:>12.1f} {slow - fast:>10.1f} {slow / fast:>7.1f}x")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"benchmark": "serialization", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
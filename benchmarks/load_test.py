@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Load test for the Digital Sarpanch API.
+
+Seeds a database with a configurable number of villages, readings and
+alerts, then drives every API route with concurrent async clients and
+reports throughput and p50/p95/p99 latency per route. The data and the
+request sequence of every client are derived from --seed, so two runs
+with the same arguments send the same requests against the same data.
+
+By default the app runs in-process (httpx's ASGI transport, with the app
+lifespan running so the job workers carry out triggered simulations)
+against the mongod at --mongo-url. The client then shares the event loop and the CPU
+with the server, so use --base-url against a uvicorn server for absolute
+numbers; start it with DB_NAME set to --db-name. With --memory the app
+uses the in-memory storage backend instead, which needs no server.
+
+The seeded collections of --db-name are dropped first. Needs httpx.
+
+    python benchmarks/load_test.py --villages 1000 --readings 100000 --alerts 10000 \\
+        --concurrency 32 --duration 30 --output results.json
+    python benchmarks/load_test.py --skip-seed --duration 30 --baseline results.json
+    python benchmarks/load_test.py --compare results.json other.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+STATES = ["Karnataka", "Tamil Nadu", "Maharashtra", "Kerala", "Punjab", "Bihar", "Odisha", "Gujarat"]
+CROPS = ["paddy", "sugarcane", "soybean", "coconut+paddy", "cotton", "wheat"]
+SOILS = ["clayey", "alluvial", "sandy loam", "laterite", "black"]
+ALERT_TYPES = ["drought", "flood", "heat", "disease", "pest"]
+SEVERITIES = ["low", "medium", "high", "critical"]
+
+# Readings are hourly from this instant; alerts fall in the same range
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+VILLAGES_PER_DISTRICT = 50
+INSERT_BATCH_SIZE = 5000
+PERCENTILES = (50, 95, 99)
+
+
+def village_id(index: int) -> str:
+    return f"bench-{index:07d}"
+
+
+def alert_id(index: int) -> str:
+    return f"bench-alert-{index:08d}"
+
+
+def alert_is_active(index: int) -> bool:
+    return index % 10 < 7
+
+
+def district(index: int) -> str:
+    return f"District {index // VILLAGES_PER_DISTRICT}"
+
+
+def village_coords(rng: random.Random) -> List[float]:
+    """[latitude, longitude] somewhere over India"""
+    return [round(rng.uniform(8.0, 30.0), 5), round(rng.uniform(70.0, 88.0), 5)]
+
+
+def make_readings(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    readings = []
+    moisture, temperature = rng.uniform(15, 60), rng.uniform(24, 36)
+    for hour in range(count):
+        moisture = min(80.0, max(5.0, moisture + rng.gauss(0, 1.5)))
+        temperature = min(46.0, max(15.0, temperature + rng.gauss(0, 0.8)))
+        readings.append({
+            "day": f"Day {hour // 24 + 1}",
+            "soil_moisture": round(moisture, 2),
+            "temperature": round(temperature, 2),
+            "humidity": round(rng.uniform(35, 95), 2),
+            "ph_level": round(rng.uniform(5.5, 8.0), 2),
+            "timestamp": (START + timedelta(hours=hour)).isoformat().replace("+00:00", "Z")
+        })
+    return readings
+
+
+def make_alert(index: int, villages: int, rng: random.Random) -> Dict[str, Any]:
+    alert_type = rng.choice(ALERT_TYPES)
+    timestamp = START + timedelta(minutes=index * 7)
+    active = alert_is_active(index)
+    return {
+        "id": alert_id(index),
+        "village_id": village_id(index % villages),
+        "alert_type": alert_type,
+        "message": f"Simulated {alert_type} alert",
+        "severity": rng.choice(SEVERITIES),
+        "timestamp": timestamp,
+        "is_active": active,
+        "dismissed_at": None if active else timestamp
+    }
+
+
+async def insert_batches(insert_many, documents):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            await insert_many(batch)
+            batch = []
+    if batch:
+        await insert_many(batch)
+
+
+async def seed(server, villages: int, readings: int, alerts: int, seed_value: int):
+    """Replace the villages, readings and alerts with generated data"""
+    storage = server.storage
+    await storage.clear()
+
+    per_village, extra = divmod(readings, villages)
+    messages: Dict[str, List[str]] = {}
+
+    def alert_docs():
+        rng = random.Random(seed_value)
+        for index in range(alerts):
+            alert = make_alert(index, villages, rng)
+            recent = messages.setdefault(alert["village_id"], [])
+            recent.append(alert["message"])
+            del recent[:-server.VILLAGE_ALERTS_SIZE]
+            yield alert
+
+    await insert_batches(storage.alerts.insert_many, alert_docs())
+
+    for start in range(0, villages, INSERT_BATCH_SIZE):
+        village_docs, reading_docs = [], []
+        for index in range(start, min(start + INSERT_BATCH_SIZE, villages)):
+            rng = random.Random(seed_value * 1_000_003 + index)
+            history = make_readings(rng, per_village + (index < extra))
+            coords = village_coords(rng)
+            vid = village_id(index)
+            village_docs.append({
+                "id": vid,
+                "name": f"Village {index}",
+                "district": district(index),
+                "state": STATES[index // VILLAGES_PER_DISTRICT % len(STATES)],
+                "crop": CROPS[index % len(CROPS)],
+                "coords": coords,
+                "population": 500 + index % 5000,
+                "area_hectares": float(100 + index % 400),
+                "soil_type": SOILS[index % len(SOILS)],
+                "irrigation_type": "canal",
+                "history": history[-server.HISTORY_SUMMARY_SIZE:],
+                "alerts": messages.get(vid, []),
+                "severity_summary": server.SeveritySummary().model_dump(),
+                "last_updated": START
+            })
+            reading_docs.extend(
+                {**reading, "village_id": vid, "ts": server.parse_timestamp(reading["timestamp"])}
+                for reading in history
+            )
+        await storage.villages.insert_many(village_docs)
+        await insert_batches(storage.readings.insert_many, reading_docs)
+
+
+@dataclass
+class Endpoint:
+    """One route of the mix; ``build`` returns (method, url, params, json body)"""
+    name: str
+    weight: float
+    build: Callable[[random.Random, "Context"], Tuple[str, str, Optional[dict], Any]]
+
+
+class Context:
+    """What the request builders know about the seeded data"""
+
+    def __init__(self, villages: int, alerts: int):
+        self.villages = villages
+        self.active_alerts = [alert_id(index) for index in range(alerts) if alert_is_active(index)]
+        self.dismissed = 0
+        self.created = 0
+        self.clock = START + timedelta(days=365)
+
+    def village(self, rng: random.Random) -> str:
+        return village_id(rng.randrange(self.villages))
+
+    def next_timestamp(self) -> str:
+        self.clock += timedelta(seconds=1)
+        return self.clock.isoformat().replace("+00:00", "Z")
+
+    def reading(self, rng: random.Random) -> Dict[str, Any]:
+        return make_readings(rng, 1)[0] | {"timestamp": self.next_timestamp()}
+
+    def alert_to_dismiss(self) -> str:
+        # Walk the seeded active alerts in order; once they run out the
+        # route answers 404, which is reported as such
+        if self.dismissed < len(self.active_alerts):
+            self.dismissed += 1
+            return self.active_alerts[self.dismissed - 1]
+        return "bench-alert-missing"
+
+
+def bbox(rng: random.Random, degrees: float) -> str:
+    lat, lon = rng.uniform(8.0, 30.0 - degrees), rng.uniform(70.0, 88.0 - degrees)
+    return f"{lon:.4f},{lat:.4f},{lon + degrees:.4f},{lat + degrees:.4f}"
+
+
+def bulk_rows(rng: random.Random, ctx: Context) -> List[Dict[str, Any]]:
+    return [{**ctx.reading(rng), "village_id": ctx.village(rng)} for _ in range(100)]
+
+
+def new_village(rng: random.Random, ctx: Context) -> Dict[str, Any]:
+    ctx.created += 1
+    return {
+        "name": f"Load test village {ctx.created}",
+        "district": district(rng.randrange(ctx.villages)),
+        "state": rng.choice(STATES),
+        "crop": rng.choice(CROPS),
+        "coords": village_coords(rng)
+    }
+
+
+# Read-heavy mix, roughly what the dashboard and field devices send. The
+# alert stream is left out: it is a long-lived SSE connection, not a request.
+ENDPOINTS = [
+    Endpoint("GET /", 1, lambda rng, ctx: ("GET", "/api/", None, None)),
+    Endpoint("GET /villages", 8, lambda rng, ctx: ("GET", "/api/villages", {"limit": 100, "after": ctx.village(rng)}, None)),
+    Endpoint("GET /villages?district", 4, lambda rng, ctx: ("GET", "/api/villages", {"district": district(rng.randrange(ctx.villages))}, None)),
+    Endpoint("GET /villages/{id}", 10, lambda rng, ctx: ("GET", f"/api/villages/{ctx.village(rng)}", None, None)),
+    Endpoint("POST /villages", 0.5, lambda rng, ctx: ("POST", "/api/villages", None, new_village(rng, ctx))),
+    Endpoint("POST /villages/{id}/readings", 6, lambda rng, ctx: ("POST", f"/api/villages/{ctx.village(rng)}/readings", None, ctx.reading(rng))),
+    Endpoint("GET /villages/{id}/readings", 6, lambda rng, ctx: ("GET", f"/api/villages/{ctx.village(rng)}/readings", {"limit": 500}, None)),
+    Endpoint("GET /villages/{id}/readings/aggregate", 4, lambda rng, ctx: ("GET", f"/api/villages/{ctx.village(rng)}/readings/aggregate", {"bucket": "1d", "points": 100}, None)),
+    Endpoint("POST /readings/bulk", 1, lambda rng, ctx: ("POST", "/api/readings/bulk", None, bulk_rows(rng, ctx))),
+    Endpoint("POST /simulate/trigger", 2, lambda rng, ctx: ("POST", "/api/simulate/trigger", None, {"scenario": rng.choice(["drought", "flood", "pest"]), "village_id": ctx.village(rng), "severity": rng.choice(SEVERITIES)})),
+    Endpoint("POST /simulate/batch", 0.5, lambda rng, ctx: ("POST", "/api/simulate/batch", None, {"scenario": "drought", "severity": "medium", "district": district(rng.randrange(ctx.villages))})),
+    Endpoint("GET /alerts", 8, lambda rng, ctx: ("GET", "/api/alerts", None, None)),
+    Endpoint("GET /alerts/{village_id}", 6, lambda rng, ctx: ("GET", f"/api/alerts/{ctx.village(rng)}", None, None)),
+    Endpoint("PATCH /alerts/{id}/dismiss", 2, lambda rng, ctx: ("PATCH", f"/api/alerts/{ctx.alert_to_dismiss()}/dismiss", None, None)),
+    Endpoint("POST /alerts/archive", 0.1, lambda rng, ctx: ("POST", "/api/alerts/archive", None, None)),
+    Endpoint("GET /dashboard/stats", 10, lambda rng, ctx: ("GET", "/api/dashboard/stats", None, None)),
+    Endpoint("POST /dashboard/stats/rebuild", 0.1, lambda rng, ctx: ("POST", "/api/dashboard/stats/rebuild", None, None)),
+    Endpoint("GET /map/villages", 4, lambda rng, ctx: ("GET", "/api/map/villages", {"bbox": bbox(rng, 2.0)}, None)),
+    Endpoint("GET /map/villages/near", 3, lambda rng, ctx: ("GET", "/api/map/villages/near", {"lat": rng.uniform(8, 30), "lon": rng.uniform(70, 88), "radius_km": 50}, None)),
+    Endpoint("GET /map/clusters", 3, lambda rng, ctx: ("GET", "/api/map/clusters", {"bbox": bbox(rng, 10.0), "zoom": 6}, None)),
+    Endpoint("GET /export/readings", 0.5, lambda rng, ctx: ("GET", "/api/export/readings", {"village_id": ctx.village(rng)}, None)),
+    Endpoint("GET /cache/stats", 0.5, lambda rng, ctx: ("GET", "/api/cache/stats", None, None)),
+    Endpoint("GET /db/pool", 0.5, lambda rng, ctx: ("GET", "/api/db/pool", None, None)),
+    Endpoint("GET /metrics", 0.5, lambda rng, ctx: ("GET", "/metrics", None, None)),
+]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.bytes = 0
+
+    def record(self, name: str, status: str, seconds: float, size: int):
+        self.latencies.setdefault(name, []).append(seconds * 1000)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        self.bytes += size
+
+
+async def client_loop(http, endpoints: List[Endpoint], ctx: Context, rng: random.Random,
+                      deadline: float, remaining: List[int], results: Optional[Results]):
+    weights = [endpoint.weight for endpoint in endpoints]
+    while time.perf_counter() < deadline and remaining[0] != 0:
+        remaining[0] -= 1
+        endpoint = rng.choices(endpoints, weights)[0]
+        method, url, params, body = endpoint.build(rng, ctx)
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, params=params, json=body)
+            status, size = str(response.status_code), len(response.content)
+        except Exception as e:
+            status, size = type(e).__name__, 0
+        if results is not None:
+            results.record(endpoint.name, status, time.perf_counter() - start, size)
+
+
+async def drive(http, endpoints: List[Endpoint], ctx: Context, concurrency: int, seconds: float,
+                requests: int, seed_value: int, results: Optional[Results]) -> float:
+    """Run the clients until the time or request budget is used up; returns the elapsed seconds"""
+    remaining = [requests or -1]
+    deadline = time.perf_counter() + seconds if seconds else float("inf")
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client_loop(http, endpoints, ctx, random.Random(seed_value * 7919 + worker), deadline, remaining, results)
+        for worker in range(concurrency)
+    ))
+    return time.perf_counter() - start
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Linearly interpolated percentile of sorted values"""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    summary = {f"p{q}": round(percentile(ordered, q), 3) for q in PERCENTILES}
+    summary["mean"] = round(sum(ordered) / len(ordered), 3) if ordered else 0.0
+    summary["max"] = round(ordered[-1], 3) if ordered else 0.0
+    return summary
+
+
+def is_error(status: str) -> bool:
+    return not status.isdigit() or int(status) >= 400
+
+
+def summarize(results: Results, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, latencies in results.latencies.items():
+        statuses = results.statuses[name]
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": sum(count for status, count in statuses.items() if is_error(status)),
+            "statuses": statuses,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "latency_ms": latency_summary(latencies)
+        }
+    everything = [value for latencies in results.latencies.values() for value in latencies]
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(everything),
+        "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+        "throughput_rps": round(len(everything) / elapsed, 2) if elapsed else 0.0,
+        "response_bytes": results.bytes,
+        "latency_ms": latency_summary(everything),
+        "endpoints": dict(sorted(endpoints.items()))
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print(f"{'route':<40} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = [*summary["endpoints"].items(), ("total", summary)]
+    for name, row in rows:
+        latency = row["latency_ms"]
+        print(f"{name:<40} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>9.1f} "
+              f"{latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f}")
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Routes whose p95 latency or throughput got worse than ``tolerance`` allows"""
+    regressions = []
+    print(f"{'route':<40} {'p95 before':>11} {'p95 after':>10} {'change':>8}")
+    rows = [(name, row, current["endpoints"].get(name)) for name, row in baseline["endpoints"].items()]
+    for name, before, after in [*rows, ("total", baseline, current)]:
+        if after is None or not before["requests"] or not after["requests"]:
+            continue
+        old, new = before["latency_ms"]["p95"], after["latency_ms"]["p95"]
+        change = (new - old) / old if old else 0.0
+        print(f"{name:<40} {old:>11.2f} {new:>10.2f} {change:>+8.1%}")
+        if change > tolerance:
+            regressions.append(f"{name}: p95 {old:.2f} ms -> {new:.2f} ms")
+    old_rate, new_rate = baseline["throughput_rps"], current["throughput_rps"]
+    if old_rate and (old_rate - new_rate) / old_rate > tolerance:
+        regressions.append(f"throughput {old_rate:.1f} -> {new_rate:.1f} req/s")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=BACKEND_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    import server
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with contextlib.AsyncExitStack() as stack:
+        if args.base_url:
+            # Only seeds; the server runs its own workers
+            await server.open_storage().prepare()
+            stack.push_async_callback(server.close_storage)
+            transport, base_url = None, args.base_url.rstrip("/")
+        else:
+            # The ASGI transport does not run the lifespan, which opens the
+            # storage and starts the job workers that run simulations
+            await stack.enter_async_context(server.app.router.lifespan_context(server.app))
+            transport, base_url = httpx.ASGITransport(app=server.app), "http://load-test"
+
+        if not args.skip_seed:
+            start = time.perf_counter()
+            await seed(server, args.villages, args.readings, args.alerts, args.seed)
+            print(f"Seeded {args.villages} villages, {args.readings} readings and {args.alerts} alerts "
+                  f"in {time.perf_counter() - start:.1f} s")
+
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=args.timeout) as http:
+            # Recounts severity summaries and dashboard stats, and clears the response cache
+            response = await http.post("/api/dashboard/stats/rebuild")
+            response.raise_for_status()
+            if args.seed_only:
+                return {}
+
+            endpoints = [
+                endpoint for endpoint in ENDPOINTS
+                if (not args.endpoints or endpoint.name in args.endpoints)
+                # The in-memory backend has no connection pool to report
+                and not (endpoint.name == "GET /db/pool" and server.storage.pool_options() is None)
+            ]
+            if not endpoints:
+                raise SystemExit(f"No such endpoints; choose from: {', '.join(endpoint.name for endpoint in ENDPOINTS)}")
+            ctx = Context(args.villages, args.alerts)
+            if args.warmup:
+                await drive(http, endpoints, ctx, args.concurrency, args.warmup, 0, args.seed + 1, None)
+            results = Results()
+            elapsed = await drive(http, endpoints, ctx, args.concurrency, args.duration, args.requests, args.seed, results)
+    return {
+        "benchmark": "load_test",
+        "config": {
+            key: getattr(args, key)
+            for key in ("villages", "readings", "alerts", "seed", "concurrency", "duration", "requests", "warmup", "endpoints")
+        } | {"target": args.base_url or ("in-process memory" if args.memory else "in-process mongod")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat()
+        },
+        **summarize(results, elapsed)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--villages", type=int, default=1000)
+    parser.add_argument("--readings", type=int, default=100000, help="total readings, spread over the villages")
+    parser.add_argument("--alerts", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run, 0 for no limit")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests, 0 for no limit")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unrecorded requests before the run")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--endpoints", nargs="+", help="only drive these routes, e.g. 'GET /alerts'")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="digital_sarpanch_bench")
+    parser.add_argument("--memory", action="store_true", help="use the in-memory storage backend instead of mongod")
+    parser.add_argument("--base-url", help="load test a running server instead of the app in-process")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse data seeded by an earlier run with the same arguments")
+    parser.add_argument("--seed-only", action="store_true", help="seed the database and exit")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with the results of an earlier run, exiting 1 on a regression")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files and exit")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95 and throughput regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (json.loads(Path(path).read_text()) for path in args.compare)
+        regressions = compare(baseline, current, args.tolerance)
+    else:
+        if args.duration <= 0 and args.requests <= 0:
+            parser.error("set --duration or --requests")
+        if args.memory and (args.base_url or args.skip_seed):
+            parser.error("--memory only applies to the in-process app and always seeds")
+        # server.py reads these at import time; the .env file does not override them
+        os.environ["MONGO_URL"] = args.mongo_url
+        os.environ["DB_NAME"] = args.db_name
+        os.environ["STORAGE_BACKEND"] = "memory" if args.memory else "mongodb"
+        # The benchmark seeds its own data, replacing the sample villages
+        os.environ["SEED_SAMPLE_DATA"] = "false"
+
+        current = asyncio.run(run(args))
+        if args.seed_only:
+            return
+        print_summary(current)
+        if args.output:
+            Path(args.output).write_text(json.dumps(current, indent=2))
+        regressions = []
+        if args.baseline:
+            regressions = compare(json.loads(Path(args.baseline).read_text()), current, args.tolerance)
+
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ export const AlertProvider = ({ children }) => {
   const [alerts, setAlerts] = useState([]);
   const [alertCount, setAlertCount] = useState(0);
 
-  // Fetch alerts on mount and set up polling
+  // Fetch alerts on mount, then apply pushed changes from the alert stream
   useEffect(() => {
     const fetchAlerts = async () => {
       try {
@@ -24,10 +24,38 @@ export const AlertProvider = ({ children }) => {
 
     fetchAlerts();
 
-    // Poll for new alerts every 30 seconds
-    const interval = setInterval(fetchAlerts, 30000);
+    if (typeof EventSource === 'undefined') {
+      // Fall back to polling every 30 seconds where server-sent events are unavailable
+      const interval = setInterval(fetchAlerts, 30000);
+      return () => clearInterval(interval);
+    }
 
-    return () => clearInterval(interval);
+    // EventSource reconnects on its own and resumes with Last-Event-ID
+    const stream = new EventSource(`${API}/stream/alerts`);
+
+    stream.addEventListener('alert.created', (event) => {
+      const alert = JSON.parse(event.data);
+      setAlerts(prev => {
+        if (prev.some(existing => existing.id === alert.id)) return prev;
+        const next = [alert, ...prev];
+        setAlertCount(next.length);
+        return next;
+      });
+    });
+
+    stream.addEventListener('alert.dismissed', (event) => {
+      const { id } = JSON.parse(event.data);
+      setAlerts(prev => {
+        const next = prev.filter(alert => alert.id !== id);
+        setAlertCount(next.length);
+        return next;
+      });
+    });
+
+    // The server could not replay what we missed, so start over
+    stream.addEventListener('reset', fetchAlerts);
+
+    return () => stream.close();
   }, []);
 
   const addAlert = (newAlert) => {
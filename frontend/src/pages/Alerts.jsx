@@ -22,7 +22,7 @@ const Alerts = () => {
         setLoading(true);
         const [alertsRes, villagesRes] = await Promise.all([
           axios.get(`${API}/alerts`),
-          axios.get(`${API}/villages`)
+          axios.get(`${API}/villages`, { params: { fields: 'id,name' } })
         ]);
         
         setAlerts(alertsRes.data);
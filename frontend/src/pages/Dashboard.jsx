@@ -9,6 +9,16 @@ import { useAlerts } from '../contexts/AlertContext';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Poll a background job until it has finished, giving up after `attempts` polls
+const waitForJob = async (jobId, attempts = 20, intervalMs = 250) => {
+  for (let i = 0; i < attempts; i++) {
+    const { data } = await axios.get(`${API}/jobs/${jobId}`);
+    if (data.status === 'succeeded' || data.status === 'failed') return data;
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+  return null;
+};
+
 const Dashboard = () => {
   const { t } = useTranslation();
   const { speak } = useVoice();
@@ -60,6 +70,9 @@ const Dashboard = () => {
       // Speak the alert
       speak(response.data.alert.message);
       
+      // The alert is stored in the background; refresh once it is
+      await waitForJob(response.data.job_id);
+      
       // Refresh village data
       const villagesRes = await axios.get(`${API}/villages`);
       setVillages(villagesRes.data);
@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { useTranslation } from 'react-i18next';
-import { MapContainer, TileLayer, Marker, Popup, CircleMarker } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Popup, CircleMarker, Tooltip, useMapEvents } from 'react-leaflet';
 import { motion } from 'framer-motion';
 import axios from 'axios';
 import 'leaflet/dist/leaflet.css';
@@ -44,31 +44,99 @@ const normalIcon = new L.Icon({
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Most markers drawn at once; with more villages in view they are clustered
+const MAX_MARKERS = 500;
+
+// The "min_lon,min_lat,max_lon,max_lat" bbox of the visible map, clamped to
+// the valid range as the map can show the world more than once when zoomed out
+const viewportBbox = (map) => {
+  const bounds = map.getBounds();
+  const clamp = (value, limit) => Math.min(limit, Math.max(-limit, value));
+  return [
+    clamp(bounds.getWest(), 180),
+    clamp(bounds.getSouth(), 90),
+    clamp(bounds.getEast(), 180),
+    clamp(bounds.getNorth(), 90)
+  ].map((value) => value.toFixed(5)).join(',');
+};
+
+// Reports the bbox and zoom level whenever the map stops moving
+const ViewportTracker = ({ onChange }) => {
+  const map = useMapEvents({
+    moveend: () => onChange(viewportBbox(map), map.getZoom())
+  });
+
+  useEffect(() => {
+    onChange(viewportBbox(map), map.getZoom());
+  }, [map, onChange]);
+
+  return null;
+};
+
 const VillageMap = () => {
   const { t } = useTranslation();
   const [villages, setVillages] = useState([]);
+  const [clusters, setClusters] = useState([]);
   const [loading, setLoading] = useState(true);
   const [selectedVillage, setSelectedVillage] = useState(null);
-  const [mapCenter, setMapCenter] = useState([20.5937, 78.9629]); // India center
-  const [mapZoom, setMapZoom] = useState(6);
+  const [map, setMap] = useState(null);
+  const [viewport, setViewport] = useState(null);
+  const mapCenter = [20.5937, 78.9629]; // India center
+  const mapZoom = 6;
+
+  const onViewportChange = useCallback((bbox, zoom) => setViewport({ bbox, zoom }), []);
 
   useEffect(() => {
-    const fetchVillages = async () => {
+    if (!viewport) return undefined;
+    const controller = new AbortController();
+
+    const fetchViewport = async () => {
       try {
-        setLoading(true);
-        const response = await axios.get(`${API}/villages`);
-        setVillages(response.data);
+        const response = await axios.get(`${API}/map/villages`, {
+          params: { bbox: viewport.bbox, limit: MAX_MARKERS },
+          signal: controller.signal
+        });
+        if (response.data.truncated) {
+          // Too many villages in view to draw one by one
+          const clustered = await axios.get(`${API}/map/clusters`, {
+            params: { bbox: viewport.bbox, zoom: viewport.zoom },
+            signal: controller.signal
+          });
+          setClusters(clustered.data.clusters);
+        } else {
+          setClusters([]);
+        }
+        setVillages(response.data.villages);
       } catch (err) {
-        console.error('Error fetching villages:', err);
+        if (!axios.isCancel(err)) {
+          console.error('Error fetching villages:', err);
+        }
       } finally {
         setLoading(false);
       }
     };
 
-    fetchVillages();
-  }, []);
+    fetchViewport();
+    // A newer viewport supersedes a request still in flight
+    return () => controller.abort();
+  }, [viewport]);
+
+  // Markers only carry what the map draws; the popup needs the full village
+  const selectVillage = async (village) => {
+    setSelectedVillage(village);
+    try {
+      const response = await axios.get(`${API}/villages/${village.id}`);
+      setSelectedVillage((current) => (current?.id === village.id ? response.data : current));
+    } catch (err) {
+      console.error('Error fetching village:', err);
+    }
+  };
 
   const getVillageStatus = (village) => {
+    const highest = village.severity_summary?.highest ?? village.highest;
+    if (highest === 'critical') return 'critical';
+    if (highest === 'high' || highest === 'medium') return 'warning';
+
     if (!village.alerts || village.alerts.length === 0) return 'normal';
     
     const hasCritical = village.alerts.some(alert => 
@@ -95,19 +163,12 @@ const VillageMap = () => {
   };
 
   const focusOnVillage = (village) => {
-    setMapCenter(village.coords);
-    setMapZoom(12);
-    setSelectedVillage(village);
+    map?.flyTo(village.coords, 12);
+    selectVillage(village);
   };
 
-  if (loading) {
-    return (
-      <div className="flex items-center justify-center min-h-screen">
-        <div className="spinner"></div>
-        <span className="ml-3 text-lg">{t('Loading...')}</span>
-      </div>
-    );
-  }
+  // Selected village details once loaded, else the marker itself
+  const details = (village) => (selectedVillage?.id === village.id ? selectedVillage : village);
 
   return (
     <div className="h-screen flex">
@@ -120,10 +181,19 @@ const VillageMap = () => {
         <div className="p-4 border-b">
           <h2 className="text-xl font-semibold">{t('Village Map')}</h2>
           <p className="text-gray-600 text-sm mt-1">
-            {villages.length} {t('Total Villages')}
+            {clusters.length > 0
+              ? clusters.reduce((total, cluster) => total + cluster.count, 0)
+              : villages.length} {t('Total Villages')}
           </p>
         </div>
 
+        {loading && (
+          <div className="flex items-center justify-center p-4">
+            <div className="spinner"></div>
+            <span className="ml-3">{t('Loading...')}</span>
+          </div>
+        )}
+
         <div className="p-4">
           <div className="space-y-3">
             {villages.map((village) => {
@@ -161,9 +231,9 @@ const VillageMap = () => {
                     </div>
                   </div>
                   
-                  {village.alerts && village.alerts.length > 0 && (
+                  {selectedVillage?.id === village.id && selectedVillage.alerts?.length > 0 && (
                     <div className="mt-2 space-y-1">
-                      {village.alerts.slice(0, 2).map((alert, index) => (
+                      {selectedVillage.alerts.slice(0, 2).map((alert, index) => (
                         <div
                           key={index}
                           className={`text-xs p-2 rounded ${
@@ -191,23 +261,42 @@ const VillageMap = () => {
           zoom={mapZoom}
           className="w-full h-full"
           zoomControl={true}
+          ref={setMap}
         >
           <TileLayer
             attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
             url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
           />
-          
-          {villages.map((village) => {
-            const status = getVillageStatus(village);
+          <ViewportTracker onChange={onViewportChange} />
+
+          {clusters.map((cluster) => (
+            <CircleMarker
+              key={`${cluster.coords[0]},${cluster.coords[1]}`}
+              center={cluster.coords}
+              radius={Math.min(30, 8 + 3 * Math.log2(cluster.count))}
+              pathOptions={{ color: '#fff', weight: 2, fillColor: getMarkerColor(getVillageStatus(cluster)), fillOpacity: 0.85 }}
+              eventHandlers={{
+                click: () => map?.flyTo(cluster.coords, Math.min((map?.getZoom() ?? mapZoom) + 2, 18)),
+              }}
+            >
+              <Tooltip direction="top">
+                {cluster.count === 1 ? cluster.name : `${cluster.count} ${t('Total Villages')}`}
+              </Tooltip>
+            </CircleMarker>
+          ))}
+
+          {clusters.length === 0 && villages.map((marker) => {
+            const status = getVillageStatus(marker);
             const icon = status === 'critical' ? criticalIcon : normalIcon;
+            const village = details(marker);
             
             return (
               <Marker
-                key={village.id}
-                position={village.coords}
+                key={marker.id}
+                position={marker.coords}
                 icon={icon}
                 eventHandlers={{
-                  click: () => setSelectedVillage(village),
+                  click: () => selectVillage(marker),
                 }}
               >
                 <Popup>
@@ -0,0 +1,44 @@
+"""
+Shared fixtures: the API running in-process on the in-memory storage
+backend, so the functional tests need no MongoDB server.
+"""
+
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from cache import MemoryCache  # noqa: E402
+from versions import CollectionVersions  # noqa: E402
+
+
+@contextmanager
+def memory_client():
+    """A TestClient for the app on fresh in-memory storage seeded with the sample villages"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(server, "STORAGE_BACKEND", "memory")
+        patch.setattr(server, "SEED_SAMPLE_DATA", True)
+        patch.setattr(server, "storage", None)
+        # Nothing cached for an earlier app may be served by this one
+        patch.setattr(server, "cache", MemoryCache(max_entries=1024, ttl_seconds=30))
+        patch.setattr(server, "collection_versions", CollectionVersions(lambda: server.storage, ttl_seconds=1))
+        with TestClient(server.app) as client:
+            yield client
+
+
+@pytest.fixture
+def client():
+    with memory_client() as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def module_client():
+    """One app shared by the tests of a module, for tests that build on each other"""
+    with memory_client() as test_client:
+        yield test_client
@@ -0,0 +1,120 @@
+"""
+Tests of the alert stream broker: resuming from Last-Event-ID, reset events
+and disconnecting slow subscribers.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from alert_stream import AlertBroker  # noqa: E402
+
+
+async def connected():
+    return False
+
+
+def parse(message):
+    """The fields of one SSE message"""
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+async def receive(stream, count):
+    return [parse(await asyncio.wait_for(stream.__anext__(), timeout=1)) for _ in range(count)]
+
+
+def publish(broker, count, start=1):
+    return [broker.publish("alert.created", {"id": f"alert-{n}"}) for n in range(start, start + count)]
+
+
+def test_resume_replays_exactly_the_missed_events():
+    async def scenario():
+        broker = AlertBroker(buffer_size=10)
+        ids = publish(broker, 5)
+        stream = broker.stream(ids[1], connected)
+        replayed = await receive(stream, 3)
+        assert [message["id"] for message in replayed] == ids[2:]
+        assert [message["data"]["id"] for message in replayed] == ["alert-3", "alert-4", "alert-5"]
+
+        # Then it carries on with live events
+        live = publish(broker, 1, start=6)
+        assert [message["id"] for message in await receive(stream, 1)] == live
+        await stream.aclose()
+        assert broker.subscriber_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_resume_from_the_latest_event_replays_nothing():
+    async def scenario():
+        broker = AlertBroker(heartbeat_seconds=0.01)
+        ids = publish(broker, 3)
+        stream = broker.stream(ids[-1], connected)
+        assert await asyncio.wait_for(stream.__anext__(), timeout=1) == ": keep-alive\n\n"
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_unknown_epoch_gets_a_reset():
+    async def scenario():
+        broker = AlertBroker()
+        ids = publish(broker, 3)
+        # Epochs are hex, so "previous" is never this process's
+        for last_event_id in ("previous-2", "malformed"):
+            stream = broker.stream(last_event_id, connected)
+            [reset] = await receive(stream, 1)
+            assert (reset["event"], reset["id"], reset["data"]) == ("reset", ids[-1], {})
+            await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_id_older_than_the_buffer_gets_a_reset():
+    async def scenario():
+        broker = AlertBroker(buffer_size=3)
+        ids = publish(broker, 5)
+
+        # Events 3 to 5 are buffered, so resuming after 2 still works
+        stream = broker.stream(ids[1], connected)
+        assert [message["id"] for message in await receive(stream, 3)] == ids[2:]
+        await stream.aclose()
+
+        stream = broker.stream(ids[0], connected)
+        [reset] = await receive(stream, 1)
+        assert (reset["event"], reset["id"]) == ("reset", ids[-1])
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_full_subscriber_is_disconnected():
+    async def scenario():
+        broker = AlertBroker(queue_size=2)
+        slow = broker.stream(None, connected)
+        waiting = asyncio.ensure_future(slow.__anext__())
+        await asyncio.sleep(0)
+        assert broker.subscriber_count == 1
+
+        # Published without yielding, so the subscriber reads none of them
+        ids = publish(broker, 3)
+        assert broker.subscriber_count == 0
+        try:
+            await asyncio.wait_for(waiting, timeout=1)
+        except StopAsyncIteration:
+            pass
+        else:
+            raise AssertionError("the slow subscriber was not disconnected")
+
+        # Its reconnect replays what it missed from the buffer
+        stream = broker.stream(f"{broker.epoch}-0", connected)
+        assert [message["id"] for message in await receive(stream, 3)] == ids
+        await stream.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,29 @@
+"""
+Functional tests of every API route: the backend_test.py suite run
+in-process against the in-memory storage backend.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend_test import TEST_SEQUENCE, DigitalSarpanchTester  # noqa: E402
+
+# TestClient only returns a response once the app has sent all of it, so an
+# endless event stream can only be tested against a running server
+LIVE_SERVER_ONLY = {"Alert Stream"}
+
+
+@pytest.fixture(scope="module")
+def tester(module_client):
+    return DigitalSarpanchTester(base_url=f"{module_client.base_url}/api", session=module_client)
+
+
+@pytest.mark.parametrize("name,method", TEST_SEQUENCE, ids=[name for name, _ in TEST_SEQUENCE])
+def test_route(tester, name, method):
+    if name in LIVE_SERVER_ONLY:
+        pytest.skip("needs a running server")
+    assert getattr(tester, method)(), tester.test_results[-1]["message"]
@@ -0,0 +1,124 @@
+"""
+Tests of the read-through cache: the MemoryCache backend on its own, and
+the invalidation of cached API responses when a write route runs.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache as cache_module  # noqa: E402
+from cache import MemoryCache, cache_key  # noqa: E402
+
+NEW_VILLAGE = {
+    "name": "Cache Test Village", "state": "Karnataka", "district": "Mandya", "crop": "paddy", "coords": [12.5, 76.9]
+}
+
+
+class Clock:
+    """Stands in for time.monotonic so TTLs can expire without sleeping"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_cache_key_ignores_parameter_order_and_none():
+    assert cache_key("villages", limit=10, after=None, state="Goa") == cache_key("villages", state="Goa", limit=10)
+    assert cache_key("stats") == "stats"
+
+
+def test_get_counts_hits_and_misses():
+    cache = MemoryCache()
+
+    async def scenario():
+        assert await cache.get("a") is None
+        await cache.set("a", (b"body", {}), ["villages"])
+        assert await cache.get("a") == (b"body", {})
+        assert await cache.get("a") == (b"body", {})
+
+    asyncio.run(scenario())
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache.stats()["entries"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = MemoryCache(ttl_seconds=30)
+
+    async def scenario():
+        await cache.set("a", (b"body", {}), [])
+        clock.now += 29
+        assert await cache.get("a") is not None
+        clock.now += 2
+        assert await cache.get("a") is None
+
+    asyncio.run(scenario())
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoryCache(max_entries=2)
+
+    async def scenario():
+        await cache.set("a", (b"a", {}), ["villages"])
+        await cache.set("b", (b"b", {}), ["villages"])
+        # Reading "a" makes "b" the least recently used
+        await cache.get("a")
+        await cache.set("c", (b"c", {}), ["villages"])
+        return await cache.get("a"), await cache.get("b"), await cache.get("c")
+
+    assert asyncio.run(scenario()) == ((b"a", {}), None, (b"c", {}))
+    assert cache.evictions == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = MemoryCache()
+
+    async def scenario():
+        await cache.set("villages", (b"list", {}), ["villages"])
+        await cache.set("village?id=1", (b"one", {}), ["village:1"])
+        await cache.set("village?id=2", (b"two", {}), ["village:2"])
+        await cache.invalidate("villages", "village:1")
+        return [await cache.get(key) for key in ("villages", "village?id=1", "village?id=2")]
+
+    assert asyncio.run(scenario()) == [None, None, (b"two", {})]
+    assert cache.invalidations == 2
+
+
+def test_write_invalidates_cached_village_list(client):
+    first = client.get("/api/villages", params={"limit": 5})
+    assert client.get("/api/villages", params={"limit": 5}).content == first.content
+    stats = client.get("/api/cache/stats").json()
+    assert stats["hits"] >= 1
+
+    response = client.post("/api/villages", json=NEW_VILLAGE)
+    assert response.status_code == 200, response.text
+    assert client.get("/api/cache/stats").json()["invalidations"] > stats["invalidations"]
+
+    names = [village["name"] for village in client.get("/api/villages", params={"limit": 1000}).json()]
+    assert NEW_VILLAGE["name"] in names
+
+
+def test_write_invalidates_cached_village(client):
+    village = client.get("/api/villages", params={"limit": 1}).json()[0]
+    client.get(f"/api/villages/{village['id']}")
+    response = client.post(f"/api/villages/{village['id']}/readings", json={
+        "day": "Day 8", "soil_moisture": 20.0, "temperature": 30.0, "humidity": 60.0, "ph_level": 6.5
+    })
+    assert response.status_code == 200, response.text
+    assert len(client.get(f"/api/villages/{village['id']}").json()["history"]) == len(village["history"]) + 1
@@ -0,0 +1,82 @@
+"""
+Tests of conditional GETs: the ETags derived from the collection versions,
+304 responses, and their agreement with the cached response bodies.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import columnar  # noqa: E402
+import server  # noqa: E402
+
+NEW_VILLAGE = {"name": "ETag Test Village", "district": "Mandya", "state": "Karnataka", "crop": "paddy", "coords": [12.5, 76.9]}
+
+
+def test_if_none_match_gets_304(client):
+    response = client.get("/api/villages")
+    etag = response.headers["etag"].removeprefix("W/")
+    assert response.headers["cache-control"] == server.ROUTE_CACHE_CONTROL["villages"]
+
+    unchanged = client.get("/api/villages", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == etag
+    # The weak form (sent with compressed responses) and lists of ETags match too
+    assert client.get("/api/villages", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/api/villages", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_write_changes_etag(client):
+    etag = client.get("/api/villages").headers["etag"]
+    assert client.post("/api/villages", json=NEW_VILLAGE).status_code == 200
+
+    response = client.get("/api/villages", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert NEW_VILLAGE["name"] in [village["name"] for village in response.json()]
+
+
+def test_etag_differs_per_query_string(client):
+    etags = {
+        client.get("/api/villages", params=params).headers["etag"]
+        for params in ({}, {"limit": 2}, {"limit": 3}, {"limit": 2, "history_format": "columns"})
+    }
+    assert len(etags) == 4
+    # Parameter order does not matter
+    assert (client.get("/api/villages?limit=2&state=Goa").headers["etag"]
+            == client.get("/api/villages?state=Goa&limit=2").headers["etag"])
+
+
+@pytest.mark.skipif(not columnar.MSGPACK_AVAILABLE, reason="needs msgpack")
+def test_etag_differs_per_encoding(client):
+    as_json = client.get("/api/villages", params={"limit": 2})
+    as_msgpack = client.get("/api/villages", params={"limit": 2}, headers={"Accept": columnar.MSGPACK_MEDIA_TYPE})
+    assert as_msgpack.headers["content-type"] == columnar.MSGPACK_MEDIA_TYPE
+    assert as_json.headers["etag"] != as_msgpack.headers["etag"]
+    assert "Accept" in as_json.headers["vary"]
+
+    # A cached JSON body is not an answer to a MessagePack request
+    headers = {"Accept": columnar.MSGPACK_MEDIA_TYPE, "If-None-Match": as_json.headers["etag"]}
+    assert client.get("/api/villages", params={"limit": 2}, headers=headers).status_code == 200
+
+
+def test_cached_body_matches_etag_after_write_elsewhere(client):
+    # Another worker writes: the collection version moves on in storage,
+    # but this worker's cached village list is not invalidated
+    server.collection_versions.ttl_seconds = 0
+    before = client.get("/api/villages", params={"limit": 1000})
+
+    # Built the way POST /api/villages builds the documents it stores
+    created = server.VillageCreate(name="Written Elsewhere", district="Mandya", state="Karnataka",
+                                   crop="paddy", coords=[12.5, 76.9])
+    village = server.Village(id="zz-written-elsewhere", **created.dict()).dict()
+    client.portal.call(server.storage.villages.insert_many, [village])
+    client.portal.call(server.storage.bump_version, "villages")
+
+    after = client.get("/api/villages", params={"limit": 1000})
+    assert after.headers["etag"] != before.headers["etag"]
+    assert village["id"] in [doc["id"] for doc in after.json()]
@@ -0,0 +1,183 @@
+"""
+Tests of edge sync: POST /api/sync/batch on the central server, and an
+edge server's SQLite log replayed to it by EdgeSyncer.
+"""
+
+import gzip
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import orjson
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from edge_sync import EdgeLog, EdgeSyncer, encode_batch  # noqa: E402
+
+
+def reading(village_id, hour):
+    return {
+        "village_id": village_id, "day": "Day 1", "soil_moisture": 30.0, "temperature": 28.0,
+        "humidity": 60.0, "ph_level": 6.5, "timestamp": f"2024-06-01T{hour:02d}:00:00+00:00"
+    }
+
+
+def alert(village_id):
+    return {
+        "id": str(uuid.uuid4()), "village_id": village_id, "alert_type": "drought",
+        "message": "Buffered on the edge", "severity": "high"
+    }
+
+
+def batch(edge_id, entries):
+    return {"edge_id": edge_id, "entries": [{"seq": seq, "kind": kind, "data": data} for seq, kind, data in entries]}
+
+
+def alert_ids(client):
+    return [stored["id"] for stored in client.get("/api/alerts", params={"active_only": False}).json()]
+
+
+@pytest.fixture
+def village_id(client):
+    return client.get("/api/villages", params={"limit": 1}).json()[0]["id"]
+
+
+def test_replayed_batch_is_skipped(client, village_id):
+    buffered = alert(village_id)
+    body = batch("edge-a", [(1, "alert", buffered), (2, "reading", reading(village_id, 1)), (3, "reading", reading(village_id, 2))])
+
+    first = client.post("/api/sync/batch", json=body).json()
+    assert first["acked"] == 3
+    assert (first["skipped"], first["alerts_created"], first["readings_accepted"]) == (0, 1, 2)
+
+    # The response was lost, so the edge sends the same batch again
+    again = client.post("/api/sync/batch", json=body).json()
+    assert again["acked"] == 3
+    assert (again["skipped"], again["alerts_created"], again["readings_accepted"]) == (3, 0, 0)
+    assert alert_ids(client).count(buffered["id"]) == 1
+
+
+def test_partly_applied_batch_only_applies_new_entries(client, village_id):
+    client.post("/api/sync/batch", json=batch("edge-b", [(1, "reading", reading(village_id, 1))]))
+    result = client.post("/api/sync/batch", json=batch("edge-b", [
+        (1, "reading", reading(village_id, 1)), (2, "reading", reading(village_id, 2))
+    ])).json()
+    assert (result["acked"], result["skipped"], result["readings_accepted"]) == (2, 1, 1)
+
+    # Positions are kept per edge log
+    other = client.post("/api/sync/batch", json=batch("edge-c", [(1, "reading", reading(village_id, 3))])).json()
+    assert (other["skipped"], other["readings_accepted"]) == (0, 1)
+
+
+class SummariesDown(Exception):
+    pass
+
+
+def test_batch_failed_after_storing_readings_does_not_store_them_again(client, monkeypatch, village_id):
+    def stored_readings():
+        return len(client.get(f"/api/villages/{village_id}/readings", params={"limit": 10000}).json())
+
+    before = stored_readings()
+    buffered = alert(village_id)
+    body = batch("edge-retry", [(1, "alert", buffered), (2, "reading", reading(village_id, 1)), (3, "reading", reading(village_id, 2))])
+
+    # The readings are stored, then the village summaries cannot be updated
+    async def failing_push(*args, **kwargs):
+        raise SummariesDown("villages unavailable")
+
+    monkeypatch.setattr(server.storage.villages, "push_readings", failing_push)
+    with pytest.raises(SummariesDown):
+        client.post("/api/sync/batch", json=body)
+    monkeypatch.undo()
+    assert stored_readings() == before + 2
+
+    # Not acknowledged, so the edge sends the whole batch again
+    again = client.post("/api/sync/batch", json=body).json()
+    assert again["acked"] == 3
+    assert (again["skipped"], again["alerts_created"], again["readings_accepted"]) == (0, 0, 0)
+    assert stored_readings() == before + 2
+    assert alert_ids(client).count(buffered["id"]) == 1
+
+    # Later batches are applied as usual
+    later = client.post("/api/sync/batch", json=batch("edge-retry", [(4, "reading", reading(village_id, 3))])).json()
+    assert later["readings_accepted"] == 1
+    assert stored_readings() == before + 3
+
+
+def test_invalid_entries_are_rejected_and_acknowledged(client, village_id):
+    result = client.post("/api/sync/batch", json=batch("edge-d", [
+        (1, "alert", alert("no-such-village")), (2, "sound", {}), (3, "reading", reading(village_id, 1))
+    ])).json()
+    assert result["acked"] == 3
+    assert [(reject["seq"], reject["error"]) for reject in result["rejected"]] == [
+        (1, "Village not found"), (2, "Unknown entry kind")
+    ]
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip"])
+def test_body_over_limit_is_refused(client, monkeypatch, village_id, encoding):
+    raw = orjson.dumps(batch("edge-e", [(seq, "reading", reading(village_id, seq % 24)) for seq in range(1, 200)]))
+    body = gzip.compress(raw) if encoding == "gzip" else raw
+    headers = {"Content-Type": "application/json", "Content-Encoding": encoding}
+
+    # Over the limit as sent
+    monkeypatch.setattr(server, "SYNC_MAX_BODY_BYTES", len(body) - 1)
+    assert client.post("/api/sync/batch", content=body, headers=headers).status_code == 413
+
+    if encoding == "gzip":
+        # Small enough as sent, over the limit once decompressed
+        monkeypatch.setattr(server, "SYNC_MAX_BODY_BYTES", len(raw) - 1)
+        assert client.post("/api/sync/batch", content=body, headers=headers).status_code == 413
+
+    monkeypatch.setattr(server, "SYNC_MAX_BODY_BYTES", len(raw))
+    assert client.post("/api/sync/batch", content=body, headers=headers).status_code == 200
+
+
+def test_corrupt_gzip_body_is_rejected(client):
+    headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    assert client.post("/api/sync/batch", content=b"not gzip", headers=headers).status_code == 400
+
+
+def test_edge_log_replays_to_central_server(client, tmp_path, village_id):
+    readings = [reading(village_id, hour) for hour in range(24)]
+    alerts = [alert(village_id) for _ in range(3)]
+
+    async def replay():
+        log = EdgeLog(str(tmp_path / "edge.sqlite3"))
+        await log.open()
+        try:
+            assert await log.append_readings(readings) == 24
+            # A sensor resending a reading is buffered once
+            assert await log.append_readings(readings[:5]) == 0
+            await log.append_alerts(alerts)
+            buffered = await log.pending(100)
+
+            syncer = EdgeSyncer(log, "http://central", "edge-f", batch_size=10)
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://central") as central:
+                batches = []
+                while sent := await syncer.sync_once(central):
+                    batches.append(sent)
+
+                # Resending entries whose acknowledgement was lost duplicates nothing
+                resent = await central.post(
+                    "/api/sync/batch", content=encode_batch(syncer.stream_id, buffered),
+                    headers={"Content-Type": "application/json"}
+                )
+            return buffered, batches, await log.backlog(), await log.acked(), resent.json()
+        finally:
+            await log.close()
+
+    buffered, batches, backlog, acked, resent = client.portal.call(replay)
+    assert len(buffered) == 27
+    assert batches == [10, 10, 7]
+    assert (backlog, acked) == (0, buffered[-1][0])
+    assert (resent["skipped"], resent["alerts_created"], resent["readings_accepted"]) == (27, 0, 0)
+
+    stored = alert_ids(client)
+    assert all(stored.count(buffered["id"]) == 1 for buffered in alerts)
+    history = client.get(f"/api/villages/{village_id}/readings", params={"limit": 1000}).json()
+    assert {entry["timestamp"] for entry in readings} <= {entry["timestamp"] for entry in history}
@@ -0,0 +1,139 @@
+"""
+Tests of content negotiation: response compression and the columnar and
+MessagePack village encodings.
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import columnar  # noqa: E402
+from columnar import history_columns  # noqa: E402
+from compression import negotiate  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip", "gzip"),
+    ("br", "br"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiate_weighs_content_codings(header, expected):
+    assert negotiate(header, ["br", "gzip"], wildcard="*") == expected
+
+
+def vary(response):
+    return {value.strip().lower() for value in response.headers.get("vary", "").split(",")}
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/villages", params={"limit": 1, "fields": "id"}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200, response.text
+    assert len(response.content) < 1024
+    assert "content-encoding" not in response.headers
+    assert "accept-encoding" in vary(response)
+
+
+def test_large_responses_are_gzipped(client):
+    response = client.get("/api/villages", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert {"accept", "accept-encoding"} <= vary(response)
+    assert response.headers["etag"].startswith("W/")
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_brotli_is_preferred_when_accepted(client):
+    response = client.get("/api/villages", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == client.get("/api/villages", headers={"Accept-Encoding": "identity"}).json()
+
+
+def test_identity_responses_are_sent_as_they_are(client):
+    response = client.get("/api/villages", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert "accept-encoding" in vary(response)
+    assert not response.headers["etag"].startswith("W/")
+
+
+def test_gzip_body_decompresses_to_the_identity_body(client):
+    with client.stream("GET", "/api/villages", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == client.get("/api/villages", headers={"Accept-Encoding": "identity"}).content
+
+
+def test_history_columns_round_trip():
+    history = [
+        {"day": "Day 1", "soil_moisture": 30.5, "timestamp": "2024-01-01T10:00:00Z"},
+        {"day": "Day 2", "soil_moisture": 28.0, "timestamp": "2024-01-02T10:00:00Z"},
+    ]
+    columns = history_columns(history)
+    assert columns == {
+        "day": ["Day 1", "Day 2"],
+        "soil_moisture": [30.5, 28.0],
+        "timestamp": ["2024-01-01T10:00:00Z", "2024-01-02T10:00:00Z"],
+    }
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == history
+
+
+def test_columns_hold_the_same_readings_as_rows(client):
+    rows = client.get("/api/villages").json()
+    columns = client.get("/api/villages", params={"history_format": "columns"}).json()
+    assert [village["id"] for village in columns] == [village["id"] for village in rows]
+    for row, column in zip(rows, columns):
+        assert column["history"] == history_columns(row["history"])
+
+
+@pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+@pytest.mark.parametrize("history_format", ["rows", "columns"])
+def test_msgpack_holds_the_same_villages_as_json(client, history_format):
+    params = {"history_format": history_format}
+    json_body = client.get("/api/villages", params=params).json()
+    response = client.get("/api/villages", params=params, headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "accept" in vary(response)
+    assert msgpack.unpackb(response.content) == json_body
+
+    village_id = json_body[0]["id"]
+    single = client.get(f"/api/villages/{village_id}", params=params, headers={"Accept": "application/msgpack"})
+    assert msgpack.unpackb(single.content) == json_body[0]
+
+
+@pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+@pytest.mark.parametrize("accept,expected", [
+    ("application/msgpack", "application/msgpack"),
+    ("application/x-msgpack", "application/msgpack"),
+    ("application/json, application/msgpack;q=0.5", "application/json"),
+    ("*/*", "application/json"),
+])
+def test_accept_chooses_the_village_encoding(client, accept, expected):
+    response = client.get("/api/villages", headers={"Accept": accept})
+    assert response.headers["content-type"].startswith(expected)
+
+
+def test_json_is_sent_when_msgpack_is_not_installed(client, monkeypatch):
+    monkeypatch.setattr(columnar, "MSGPACK_AVAILABLE", False)
+    response = client.get("/api/villages", headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json() == client.get("/api/villages").json()
@@ -0,0 +1,116 @@
+"""
+Tests of alerts recorded by background jobs and sync batches being retried
+after failing part way, and of the job workers stopping.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from jobs import JobQueue  # noqa: E402
+from memory_storage import MemoryJobRepository  # noqa: E402
+
+
+class StatsDown(Exception):
+    pass
+
+
+async def failing_bump(*args, **kwargs):
+    raise StatsDown("statistics unavailable")
+
+
+def active_alerts(client):
+    return client.get("/api/dashboard/stats").json()["active_alerts"]
+
+
+def stored_count(client, alert_id):
+    return [alert["id"] for alert in client.get("/api/alerts").json()].count(alert_id)
+
+
+def pending(client, alert_id):
+    return client.portal.call(server.storage.alerts.pending_effects, [alert_id])
+
+
+@pytest.fixture
+def village(client):
+    return client.get("/api/villages", params={"limit": 1}).json()[0]
+
+
+def test_retried_alert_job_applies_effects_of_stored_alert(client, monkeypatch, village):
+    payload = {"alert": server.scenario_alert("drought", "high", village).dict()}
+    alert_id = payload["alert"]["id"]
+    before = active_alerts(client)
+
+    # The first attempt stores the alert, then fails before the statistics are updated
+    monkeypatch.setattr(server, "bump_dashboard_stats", failing_bump)
+    with pytest.raises(StatsDown):
+        client.portal.call(server.record_simulated_alert, payload)
+    assert pending(client, alert_id) == {alert_id}
+    monkeypatch.undo()
+
+    assert client.portal.call(server.record_simulated_alert, payload) == {"alert_id": alert_id}
+    assert pending(client, alert_id) == set()
+    assert active_alerts(client) == before + 1
+    assert stored_count(client, alert_id) == 1
+
+    # Once applied, a retry changes nothing
+    client.portal.call(server.record_simulated_alert, payload)
+    assert active_alerts(client) == before + 1
+    assert stored_count(client, alert_id) == 1
+
+
+def test_resent_sync_batch_applies_effects_of_stored_alert(client, monkeypatch, village):
+    alert = {"id": "edge-alert-1", "village_id": village["id"], "alert_type": "pest",
+             "message": "Buffered on the edge", "severity": "medium"}
+    body = {"edge_id": "edge-retry", "entries": [{"seq": 1, "kind": "alert", "data": alert}]}
+    before = active_alerts(client)
+
+    monkeypatch.setattr(server, "bump_dashboard_stats", failing_bump)
+    with pytest.raises(StatsDown):
+        client.post("/api/sync/batch", json=body)
+    monkeypatch.undo()
+
+    # The batch was not acknowledged, so the edge sends it again
+    result = client.post("/api/sync/batch", json=body).json()
+    assert (result["acked"], result["skipped"], result["alerts_created"]) == (1, 0, 0)
+    assert pending(client, alert["id"]) == set()
+    assert active_alerts(client) == before + 1
+    assert stored_count(client, alert["id"]) == 1
+
+
+def test_simulated_alert_is_recorded_by_job(client, village):
+    response = client.post("/api/simulate/trigger", json={"scenario": "flood", "village_id": village["id"], "severity": "low"})
+    job_id = response.json()["job_id"]
+    for _ in range(200):
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        client.portal.call(server.asyncio.sleep, 0.01)
+    assert job["status"] == "succeeded", job
+    assert stored_count(client, response.json()["alert"]["id"]) == 1
+    assert pending(client, response.json()["alert"]["id"]) == set()
+
+
+def test_workers_stop_when_cancelled_as_a_handler_returns():
+    async def scenario():
+        repository = MemoryJobRepository()
+        queue = JobQueue(lambda: repository, concurrency=1, poll_seconds=0.01)
+        running = []
+
+        @queue.handler("last")
+        async def last(payload):
+            # The worker is cancelled while this returns, which wait_for swallows
+            running[0].cancel()
+            return {}
+
+        await queue.enqueue("last", {})
+        running.append(asyncio.create_task(queue.run()))
+        done, _ = await asyncio.wait(running, timeout=5)
+        return running[0] in done and running[0].cancelled()
+
+    assert asyncio.run(scenario())
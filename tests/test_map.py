@@ -0,0 +1,47 @@
+"""
+Tests of the map routes' bounding boxes on the in-memory storage backend.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from geo import in_bbox, parse_bbox, within_bbox  # noqa: E402
+
+WORLD = "-180,-90,180,90"
+
+
+def test_within_bbox_is_a_flat_box_on_coords():
+    # coords are [latitude, longitude], so the corners are too
+    assert within_bbox((68.0, 6.0, 98.0, 36.0)) == {"coords": {"$geoWithin": {"$box": [[6.0, 68.0], [36.0, 98.0]]}}}
+
+
+@pytest.mark.parametrize("bbox", ["68,6,98", "98,6,68,36", "68,6,98,91", "a,b,c,d"])
+def test_parse_bbox_rejects_invalid_boxes(bbox):
+    with pytest.raises(ValueError):
+        parse_bbox(bbox)
+
+
+def test_box_edges_follow_parallels():
+    # On a great circle from (60N, 0E) to (60N, 90E) this point would be outside
+    assert in_bbox([60.0, 45.0], parse_bbox("0,50,90,60"))
+    assert not in_bbox([60.1, 45.0], parse_bbox("0,50,90,60"))
+
+
+def test_world_bbox_returns_every_village(client):
+    total = len(client.get("/api/villages").json())
+    markers = client.get("/api/map/villages", params={"bbox": WORLD})
+    assert markers.status_code == 200, markers.text
+    assert markers.json()["count"] == total
+    assert {"id", "name", "district", "state", "coords"} <= set(markers.json()["villages"][0])
+
+    clusters = client.get("/api/map/clusters", params={"bbox": WORLD, "zoom": 0})
+    assert clusters.status_code == 200, clusters.text
+    assert clusters.json()["villages"] == total
+
+
+def test_malformed_bbox_is_rejected(client):
+    assert client.get("/api/map/villages", params={"bbox": "98,6,68,36"}).status_code == 422
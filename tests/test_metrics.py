@@ -0,0 +1,58 @@
+"""
+Tests of the Prometheus metrics recorded by MetricsMiddleware and served
+at /metrics.
+"""
+
+from prometheus_client.parser import text_string_to_metric_families
+
+
+def scrape(client):
+    """{(sample name, sorted labels): value} of every sample /metrics exposes"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def labels(**values):
+    return tuple(sorted(values.items()))
+
+
+def increase(before, after, name, **values):
+    key = (name, labels(**values))
+    return after.get(key, 0) - before.get(key, 0)
+
+
+def test_requests_are_counted_by_route_template_and_status(client):
+    village_id = client.get("/api/villages", params={"limit": 1}).json()[0]["id"]
+    before = scrape(client)
+    for _ in range(3):
+        assert client.get(f"/api/villages/{village_id}").status_code == 200
+    assert client.get("/api/villages/no-such-village").status_code == 404
+    assert client.get("/api/no-such-route").status_code == 404
+    after = scrape(client)
+
+    route = "/api/villages/{village_id}"
+    histogram = "http_request_duration_seconds"
+    assert increase(before, after, f"{histogram}_count", method="GET", route=route, status="200") == 3
+    assert increase(before, after, f"{histogram}_count", method="GET", route=route, status="404") == 1
+    assert increase(before, after, f"{histogram}_count", method="GET", route="unmatched", status="404") == 1
+    assert increase(before, after, f"{histogram}_bucket", method="GET", route=route, status="200", le="+Inf") == 3
+    assert after[(f"{histogram}_sum", labels(method="GET", route=route, status="200"))] > 0
+    assert increase(before, after, "http_response_size_bytes_count", method="GET", route=route) == 4
+    assert after[("http_requests_in_progress", labels(method="GET", route=route))] == 0
+
+    # Raw paths never become label values, and scrapes are not recorded
+    routes = {dict(key[1]).get("route") for key in after if key[0].startswith(histogram)}
+    assert not any(village_id in route or "no-such" in route for route in routes if route)
+    assert "/metrics" not in routes
+
+
+def test_response_encoding_time_is_recorded(client):
+    before = scrape(client)
+    client.get("/api/villages")
+    after = scrape(client)
+    assert increase(before, after, "http_response_serialization_seconds_count", route="/api/villages") >= 1
@@ -0,0 +1,100 @@
+"""
+Tests of PoolMetrics, driven with synthetic pymongo connection pool events
+so that no MongoDB server is needed.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+from pymongo import monitoring
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pool_metrics as pool_metrics_module  # noqa: E402
+import server  # noqa: E402
+from pool_metrics import WAIT_BUCKETS, PoolMetrics  # noqa: E402
+
+ADDRESS = ("localhost", 27017)
+
+
+class Clock:
+    """Stands in for time.perf_counter so waits have exact lengths"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pool_metrics_module.time, "perf_counter", clock)
+    return clock
+
+
+def check_out(metrics, clock, wait, connection_id=1):
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    clock.now += wait
+    metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, connection_id))
+
+
+def fail_check_out(metrics, clock, wait, reason):
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    clock.now += wait
+    metrics.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, reason))
+
+
+def test_checkout_waits_and_failures(clock):
+    metrics = PoolMetrics()
+    for connection_id in (1, 2):
+        metrics.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, connection_id))
+    for wait in (0.0005, 0.002, 0.03, 0.7):
+        check_out(metrics, clock, wait)
+    fail_check_out(metrics, clock, 1.0, monitoring.ConnectionCheckOutFailedReason.TIMEOUT)
+    fail_check_out(metrics, clock, 1.0, monitoring.ConnectionCheckOutFailedReason.TIMEOUT)
+    fail_check_out(metrics, clock, 0.0, monitoring.ConnectionCheckOutFailedReason.POOL_CLOSED)
+    for connection_id in (1, 1, 2):
+        metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, connection_id))
+    metrics.connection_closed(monitoring.ConnectionClosedEvent(ADDRESS, 2, "stale"))
+
+    stats = metrics.stats()
+    assert stats["checkouts"] == 4
+    assert stats["checked_out"] == 1
+    assert (stats["connections_created"], stats["open_connections"]) == (2, 1)
+    assert stats["checkout_failures"] == {"timeout": 2, "poolClosed": 1}
+    assert stats["wait_seconds_max"] == pytest.approx(0.7)
+    assert stats["wait_seconds_total"] == pytest.approx(0.7325)
+    assert stats["wait_seconds_mean"] == pytest.approx(0.7325 / 4)
+    # Cumulative: each bucket counts the checkouts that waited at most its bound
+    assert stats["wait_histogram"] == {
+        "0.001": 1, "0.005": 2, "0.01": 2, "0.05": 3, "0.1": 3, "0.5": 3, "1.0": 4, "5.0": 4
+    }
+    assert list(stats["wait_histogram"]) == [str(bound) for bound in WAIT_BUCKETS]
+
+
+def test_no_checkouts(clock):
+    stats = PoolMetrics().stats()
+    assert (stats["checkouts"], stats["wait_seconds_mean"], stats["checkout_failures"]) == (0, 0.0, {})
+    assert set(stats["wait_histogram"].values()) == {0}
+
+
+def test_pool_stats_are_exported_at_metrics(client, clock, monkeypatch):
+    metrics = PoolMetrics()
+    check_out(metrics, clock, 0.02)
+    fail_check_out(metrics, clock, 1.0, monitoring.ConnectionCheckOutFailedReason.CONN_ERROR)
+    # Puts perf_counter back before the app handles requests
+    monkeypatch.undo()
+
+    monkeypatch.setattr(server.metrics_exporter.collector, "pool_metrics", metrics)
+    scraped = {
+        (sample.name, tuple(sample.labels.items())): sample.value
+        for family in text_string_to_metric_families(client.get("/metrics").text)
+        for sample in family.samples
+    }
+    assert scraped[("mongodb_pool_checkouts_total", ())] == 1
+    assert scraped[("mongodb_pool_checkout_wait_seconds_total", ())] == pytest.approx(0.02)
+    assert scraped[("mongodb_pool_checkout_failures_total", (("reason", "connectionError"),))] == 1
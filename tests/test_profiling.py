@@ -0,0 +1,60 @@
+"""
+Tests of request profiling: ProfilingMiddleware writing speedscope files
+for requests that carry the configured token, and nothing otherwise.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from profiling import ProfilingMiddleware  # noqa: E402
+
+TOKEN = "let-me-profile"
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        await asyncio.sleep(0.02)
+        return {"total": sum(range(200000))}
+
+    with TestClient(ProfilingMiddleware(app, str(tmp_path), token=TOKEN, interval=0.001)) as client:
+        yield client, tmp_path
+
+
+def test_token_profiles_request_to_speedscope_file(profiled):
+    client, directory = profiled
+    response = client.get("/work", headers={"X-Profile": TOKEN})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    [path] = directory.iterdir()
+    assert path.name.startswith(profile_id) and path.name.endswith(".speedscope.json")
+    document = json.loads(path.read_text())
+    assert document["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    [profile] = document["profiles"]
+    assert profile["type"] == "sampled" and profile["name"].startswith("GET /work")
+    assert profile["samples"] and len(profile["samples"]) == len(profile["weights"])
+    assert profile["endValue"] == pytest.approx(sum(profile["weights"]))
+    frames = document["shared"]["frames"]
+    assert all(0 <= index < len(frames) for stack in profile["samples"] for index in stack)
+    assert "work" in {frame["name"] for frame in frames}
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "wrong"}, {"X-Profile": ""}])
+def test_missing_or_wrong_token_records_nothing(profiled, headers):
+    client, directory = profiled
+    response = client.get("/work", headers=headers)
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert list(directory.iterdir()) == []
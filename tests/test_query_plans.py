@@ -0,0 +1,233 @@
+"""
+Query plan checks for the Digital Sarpanch API.
+
+Calls the MongoDB storage methods behind every API route against a local
+mongod, records the commands they send with a pymongo CommandListener and
+runs explain() on each one, failing if any of them is not served by an
+index. The target server is taken from MONGO_URL (default
+mongodb://localhost:27017); the tests are skipped when no server is
+reachable.
+"""
+
+import asyncio
+import copy
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from bson import SON
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from export import EXPORTS  # noqa: E402
+from mongo_storage import MotorStorage, collection_indexes  # noqa: E402
+from storage import VillageQuery  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+SINCE = datetime(2024, 1, 2, tzinfo=timezone.utc)
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+VILLAGE = "mandya-kirangur"
+OTHER_VILLAGE = "washim-manjari"
+ALERT_ID = str(uuid.UUID(int=1))
+INDIA = (68.0, 6.0, 98.0, 36.0)
+WORLD = (-180.0, -90.0, 180.0, 90.0)
+READING = {"day": "Day 8", "soil_moisture": 20.0, "temperature": 30.0, "humidity": 60.0, "ph_level": 6.5,
+           "timestamp": NOW.isoformat()}
+NEW_VILLAGE = {"id": "plan-village", "name": "Plan Village", "district": "Mandya", "state": "Karnataka",
+               "crop": "paddy", "coords": [12.5, 76.9]}
+
+# Commands that read or write existing documents, and so have a query plan
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# Driver fields that explain does not accept inside the explained command
+DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "readConcern", "writeConcern", "apiVersion"}
+
+# Stages that read through an index; a fast count only reads collection metadata
+INDEXED_STAGES = {
+    "IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_IDHACK", "COUNT_SCAN", "DISTINCT_SCAN",
+    "GEO_NEAR_2D", "GEO_NEAR_2DSPHERE", "RECORD_STORE_FAST_COUNT"
+}
+
+
+async def drain(docs):
+    return [doc async for doc in docs]
+
+
+# (route, call) where call issues the storage calls the route makes
+ROUTE_CALLS = [
+    ("GET /villages", lambda s: s.villages.find(VillageQuery(), None, 1000)),
+    ("GET /villages?fields", lambda s: s.villages.find(VillageQuery(), ["name", "crop"], 1000)),
+    ("GET /villages?after", lambda s: s.villages.find(VillageQuery(after="m"), None, 1000)),
+    ("GET /villages?state", lambda s: s.villages.find(VillageQuery(state="Karnataka"), None, 1000)),
+    ("GET /villages?state&district", lambda s: s.villages.find(VillageQuery(state="Karnataka", district="Mandya"), None, 1000)),
+    ("GET /villages?district", lambda s: s.villages.find(VillageQuery(district="Mandya"), None, 1000)),
+    ("GET /villages?crop", lambda s: s.villages.find(VillageQuery(crop="paddy"), None, 1000)),
+    ("GET /villages?severity", lambda s: s.villages.find(VillageQuery(severity="critical"), None, 1000)),
+    ("GET /villages/{id}", lambda s: s.villages.get(VILLAGE)),
+    ("POST /villages", lambda s: s.villages.insert_missing([NEW_VILLAGE])),
+    ("POST /villages/{id}/readings", lambda s: s.villages.push_reading(VILLAGE, READING, NOW, server.ALERT_VILLAGE_FIELDS)),
+    ("POST /readings/bulk villages", lambda s: s.villages.find(VillageQuery(ids=[VILLAGE, OTHER_VILLAGE]), server.ALERT_VILLAGE_FIELDS)),
+    ("POST /readings/bulk history", lambda s: s.villages.push_readings({VILLAGE: [READING], OTHER_VILLAGE: [READING]}, NOW)),
+    ("POST /readings/bulk rule alerts", lambda s: s.alerts.find_recent([VILLAGE, OTHER_VILLAGE], ["drought", "heat"], SINCE)),
+    ("GET /villages/{id}/readings", lambda s: s.readings.find(VILLAGE, (None, None), 1000)),
+    ("GET /villages/{id}/readings?since", lambda s: s.readings.find(VILLAGE, (SINCE, None), 1000)),
+    ("GET /villages/{id}/readings/aggregate", lambda s: s.readings.aggregate(VILLAGE, (SINCE, None), "1d", server.METRICS)),
+    ("POST /simulate/trigger village", lambda s: s.villages.find(VillageQuery(ids=[VILLAGE]), server.ALERT_VILLAGE_FIELDS, 1)),
+    ("job simulation.alert stored", lambda s: s.alerts.exists(ALERT_ID)),
+    ("record alerts villages", lambda s: s.villages.add_alerts({VILLAGE: ["test"]}, {VILLAGE: {"low": 1}}, NOW)),
+    ("record alerts critical villages", lambda s: s.villages.count_with_highest("critical")),
+    ("POST /sync/batch alerts", lambda s: s.alerts.existing_ids([ALERT_ID, "missing"])),
+    ("POST /sync/batch pending alerts", lambda s: s.alerts.pending_effects([ALERT_ID])),
+    ("POST /sync/batch readings", lambda s: s.readings.existing_keys([(VILLAGE, SINCE), (OTHER_VILLAGE, NOW)])),
+    ("record alerts applied", lambda s: s.alerts.effects_applied([ALERT_ID])),
+    ("job worker claim", lambda s: s.jobs.claim(NOW, NOW)),
+    ("job worker finish", lambda s: s.jobs.finish("missing", 1, {"status": "succeeded"})),
+    ("GET /jobs/{id}", lambda s: s.jobs.get("missing")),
+    ("POST /simulate/batch?district", lambda s: s.villages.find(VillageQuery(district="Mandya"), server.ALERT_VILLAGE_FIELDS, 5001)),
+    ("POST /simulate/batch?crop", lambda s: s.villages.find(VillageQuery(crop="paddy"), server.ALERT_VILLAGE_FIELDS, 5001)),
+    ("POST /simulate/batch?village_ids", lambda s: s.villages.find(
+        VillageQuery(ids=[VILLAGE, OTHER_VILLAGE], state="Karnataka"), server.ALERT_VILLAGE_FIELDS, 5001
+    )),
+    ("GET /alerts", lambda s: s.alerts.find(True, 100)),
+    ("GET /alerts?active_only=false", lambda s: s.alerts.find(False, 100)),
+    ("GET /alerts/{village_id}", lambda s: s.alerts.for_village(VILLAGE, 100)),
+    ("PATCH /alerts/{id}/dismiss", lambda s: s.alerts.deactivate("missing", NOW)),
+    ("PATCH /alerts/{id}/dismiss village", lambda s: s.villages.adjust_severity(VILLAGE, "low", -1)),
+    ("POST /alerts/archive expire", lambda s: s.alerts.active_before(SINCE, 1000)),
+    ("POST /alerts/archive move", lambda s: s.alerts.archive_dismissed(NOW, NOW, 1000)),
+    ("GET /dashboard/stats villages", lambda s: s.villages.count()),
+    ("POST /dashboard/stats/rebuild active", lambda s: s.alerts.count_active()),
+    ("POST /dashboard/stats/rebuild critical", lambda s: s.alerts.count_active("critical")),
+    ("POST /dashboard/stats/rebuild counts", lambda s: s.alerts.active_counts()),
+    ("POST /dashboard/stats/rebuild summaries", lambda s: s.villages.replace_severity_summaries(
+        {VILLAGE: server.SeveritySummary(counts={"critical": 1}, highest="critical").dict()}, server.SeveritySummary().dict()
+    )),
+    ("GET /map/villages", lambda s: s.villages.markers_in_bbox(INDIA, VillageQuery(), 2001)),
+    ("GET /map/villages?crop", lambda s: s.villages.markers_in_bbox(INDIA, VillageQuery(crop="paddy"), 2001)),
+    ("GET /map/villages?bbox=world", lambda s: s.villages.markers_in_bbox(WORLD, VillageQuery(), 2001)),
+    ("GET /map/villages/near", lambda s: s.villages.markers_near(12.5, 76.9, 50, VillageQuery(), 100)),
+    ("GET /map/clusters", lambda s: s.villages.clusters(INDIA, 5, VillageQuery())),
+    ("GET /map/clusters?bbox=world", lambda s: s.villages.clusters(WORLD, 0, VillageQuery())),
+    ("GET /export/villages", lambda s: drain(s.villages.export(EXPORTS["villages"], None, (None, None), ["m"], 100))),
+    ("GET /export/alerts", lambda s: drain(s.alerts.export(EXPORTS["alerts"], None, (SINCE, None), None, 100))),
+    ("GET /export/alerts?cursor", lambda s: drain(s.alerts.export(EXPORTS["alerts"], None, (None, None), [SINCE, "a"], 100))),
+    ("GET /export/alerts?village_id", lambda s: drain(s.alerts.export(
+        EXPORTS["alerts"], [VILLAGE, OTHER_VILLAGE], (None, None), None, 100
+    ))),
+    ("GET /export/readings", lambda s: drain(s.readings.export(EXPORTS["readings"], None, (None, None), None, 100))),
+    ("GET /export/readings?village_id&since", lambda s: drain(s.readings.export(
+        EXPORTS["readings"], [VILLAGE], (SINCE, None), None, 100
+    ))),
+    ("conditional GET versions", lambda s: s.read_versions(["villages", "alerts"])),
+    ("write version bump", lambda s: s.bump_version("villages")),
+]
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps the commands sent to one database"""
+
+    def __init__(self, database: str):
+        self.database = database
+        self.commands = []
+
+    def started(self, event):
+        if event.database_name == self.database and event.command_name in EXPLAINABLE:
+            self.commands.append(copy.deepcopy(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def explainable_commands(command):
+    """The command without driver fields, split into one command per write statement"""
+    command = SON((key, value) for key, value in command.items() if key not in DRIVER_FIELDS)
+    statements = {"update": "updates", "delete": "deletes"}.get(next(iter(command)))
+    if statements is None:
+        return [command]
+    return [SON([*command.items(), (statements, [statement])]) for statement in command[statements]]
+
+
+def winning_stages(explain):
+    """Collect the stage names of every winning plan in an explain document"""
+    stages = []
+
+    def walk(node, in_winning):
+        if isinstance(node, dict):
+            if in_winning and "stage" in node:
+                stages.append(node["stage"])
+            for key, value in node.items():
+                if key != "rejectedPlans":
+                    walk(value, in_winning or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_winning)
+
+    walk(explain, False)
+    return stages
+
+
+@pytest.fixture(scope="module")
+def database():
+    """A scratch database with the server's collections, indexes and sample data, and its recorded commands"""
+    sync_client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        sync_client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"No MongoDB reachable at {MONGO_URL}")
+
+    name = f"query_plans_{uuid.uuid4().hex[:8]}"
+    recorder = CommandRecorder(name)
+    loop = asyncio.new_event_loop()
+
+    async def bootstrap():
+        motor_client = server.AsyncIOMotorClient(MONGO_URL, event_listeners=[recorder])
+        storage = MotorStorage(motor_client[name], server.SEVERITIES, server.HISTORY_SUMMARY_SIZE, server.VILLAGE_ALERTS_SIZE)
+        server.storage = storage
+        try:
+            await storage.prepare()
+            await server.initialize_sample_data()
+        finally:
+            server.storage = None
+        await storage.alerts.insert_many([server.Alert(
+            id=ALERT_ID, village_id=VILLAGE, alert_type="drought", message="test", severity="critical"
+        ).dict()])
+        return storage
+
+    storage = loop.run_until_complete(bootstrap())
+    yield storage, recorder, sync_client[name], loop
+    loop.run_until_complete(storage.close())
+    loop.close()
+    sync_client.drop_database(name)
+    sync_client.close()
+
+
+def test_indexes_defined_for_every_collection():
+    storage = MotorStorage(None, server.SEVERITIES, server.HISTORY_SUMMARY_SIZE, server.VILLAGE_ALERTS_SIZE)
+    repositories = {storage.villages.name, storage.alerts.name, storage.readings.name, storage.jobs.name}
+    assert repositories <= set(collection_indexes(server.ALERT_ARCHIVE_TTL_DAYS))
+
+
+@pytest.mark.parametrize("route,call", ROUTE_CALLS, ids=[route for route, _ in ROUTE_CALLS])
+def test_route_query_uses_index(database, route, call):
+    storage, recorder, db, loop = database
+    recorder.commands.clear()
+    loop.run_until_complete(call(storage))
+    commands = [command for sent in recorder.commands for command in explainable_commands(sent)]
+    assert commands, f"{route}: sent no queries"
+
+    for command in commands:
+        stages = winning_stages(db.command("explain", command, verbosity="queryPlanner"))
+        summary = f"{route}: {dict(command)} ran as {' -> '.join(stages)}"
+        assert stages, f"{route}: no winning plan in explain output for {dict(command)}"
+        assert "COLLSCAN" not in stages, summary
+        assert INDEXED_STAGES & set(stages), summary